@@ -0,0 +1,97 @@
+"""
+Measure download throughput of AsyncHistoryDownloader against concurrency, using a stand-in price history API.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkAsyncDownloader --years 20 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from MarketData.AsyncDownloader import AsyncHistoryDownloader
+
+
+class StandInClient:
+    """
+    Stand-in for the asynchronous schwab-py client, answering from a local handler over a pooled httpx.AsyncClient.
+    Every request takes latency seconds and a fraction of them is rate limited (429) to exercise the retries.
+    """
+
+    def __init__(self, latency, failure_rate, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = np.random.default_rng(seed)
+        self.requests = 0
+        self.session = httpx.AsyncClient(transport=httpx.MockTransport(self._handle), base_url='http://stand-in')
+
+    async def _handle(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            return httpx.Response(429, headers={'Retry-After': str(self.latency)}, text='Too many requests')
+        start = int(request.url.params['startDate'])
+        end = int(request.url.params['endDate'])
+        day = 86400000
+        times = np.arange(-(-start // day) * day, end, day)
+        # Prices derived from the timestamp, so every chunking returns the same candles
+        close = 100 + 10 * np.sin(times / (50 * day))
+        candles = [{'open': c, 'high': c + 1, 'low': c - 1, 'close': c, 'volume': 1000, 'datetime': int(t)}
+                   for t, c in zip(times.tolist(), close.tolist())]
+        return httpx.Response(200, json={'candles': candles, 'symbol': request.url.params['symbol']})
+
+    async def get_price_history_every_day(self, symbol, start_datetime=None, end_datetime=None,
+                                          need_extended_hours_data=None, need_previous_close=None):
+        params = {'symbol': symbol,
+                  'startDate': int(pd.Timestamp(start_datetime).timestamp() * 1000),
+                  'endDate': int(pd.Timestamp(end_datetime).timestamp() * 1000)}
+        return await self.session.get('/pricehistory', params=params)
+
+    async def close(self):
+        await self.session.aclose()
+
+
+async def measure(concurrency, args, start, end):
+    client = StandInClient(args.latency, args.failure_rate)
+    downloader = AsyncHistoryDownloader(client, max_concurrency=concurrency, requests_per_second=args.rate,
+                                        chunk=timedelta(days=args.chunk_days), backoff=args.latency)
+    began = time.perf_counter()
+    frames = await downloader.fetch_many(args.symbols, start, end)
+    elapsed = time.perf_counter() - began
+    await client.close()
+    return elapsed, client.requests, downloader.retried, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--years', type=int, default=20, help='Years of daily history per symbol.')
+    parser.add_argument('--symbols', nargs='+', default=['TSLA', 'AAPL'], help='Symbols to download.')
+    parser.add_argument('--chunk-days', type=int, default=30, help='Days covered by one request.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the stand-in API takes per request.')
+    parser.add_argument('--failure-rate', type=float, default=0.02, help='Fraction of requests rate limited.')
+    parser.add_argument('--rate', type=float, default=None, help='Requests per second limit, default none.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                        help='Concurrency limits to measure.')
+    args = parser.parse_args()
+
+    end = datetime(2024, 1, 1)
+    start = end - timedelta(days=365 * args.years)
+    baseline = None
+    for concurrency in args.concurrency:
+        elapsed, requests, retried, frames = asyncio.run(measure(concurrency, args, start, end))
+        if baseline is None:
+            baseline = frames
+        for symbol in args.symbols:
+            pd.testing.assert_frame_equal(frames[symbol], baseline[symbol])
+        candles = sum(len(frame) for frame in frames.values())
+        print(f"concurrency {concurrency:3d}: {elapsed:7.3f}s  {requests / elapsed:7.1f} requests/s  "
+              f"{candles / elapsed:9.0f} candles/s  ({requests} requests, {retried} retried)")
+
+
+if __name__ == '__main__':
+    main()
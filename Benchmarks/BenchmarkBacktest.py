@@ -0,0 +1,74 @@
+"""
+Compare the batched backtest evaluator with a step-by-step TradingEnv rollout of the same policy.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkBacktest --rows 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from stable_baselines3 import PPO
+
+from Benchmarks.BenchmarkFeatureEngineering import make_candles
+from Preprocessing.CreateTensors import create_moving_windows
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from ReinforcementLearning.Backtest import backtest
+from ReinforcementLearning.ShortEnvironment import TradingEnv
+
+WINDOW_SIZE = 15
+
+
+def rollout(model, env):
+    """
+    Deterministic step-by-step episode, returning the actions and rewards.
+    """
+    observation = env.reset()
+    actions, rewards, done = [], [], False
+    while not done:
+        action, _ = model.predict(observation, deterministic=True)
+        observation, reward, done, _ = env.step(int(action))
+        actions.append(int(action))
+        rewards.append(reward)
+    return np.array(actions), np.array(rewards)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000, help='Number of minute candles to evaluate on.')
+    parser.add_argument('--train-steps', type=int, default=4096, help='PPO steps to train the evaluated policy.')
+    parser.add_argument('--hold-reward-scale', type=float, default=0.0,
+                        help='Share of the unrealized ROI rewarded on hold.')
+    args = parser.parse_args()
+
+    features = FeaturePipeline().transform_frame(make_candles(args.rows))
+    scaled = StandardScaler().fit_transform(features).astype(np.float32)
+    windows = create_moving_windows(scaled, WINDOW_SIZE)
+    env = TradingEnv(windows, features['close'], WINDOW_SIZE, 'float32', hold_reward_scale=args.hold_reward_scale)
+    model = PPO("MlpPolicy", env, verbose=0)
+    model.learn(args.train_steps)
+
+    start = time.perf_counter()
+    actions, rewards = rollout(model, env)
+    stepped = time.perf_counter() - start
+    ledger = env.get_ledger()
+
+    start = time.perf_counter()
+    result = backtest(model, windows, features['close'], WINDOW_SIZE, 'float32',
+                      hold_reward_scale=args.hold_reward_scale)
+    batched = time.perf_counter() - start
+
+    print(f"step-by-step rollout {stepped:8.3f}s")
+    print(f"batched backtest     {batched:8.3f}s   speedup {stepped / batched:6.1f}x")
+    if not (np.array_equal(result['actions'], actions) and np.array_equal(result['rewards'], rewards)
+            and np.array_equal(result['equity'], ledger.equity_curve)
+            and np.array_equal(result['trades'], ledger.trade_list)):
+        raise AssertionError("Backtest does not match the step-by-step rollout.")
+    for name in ['total_return', 'sharpe', 'max_drawdown', 'turnover', 'n_trades']:
+        print(f"{name:<14}{result[name]:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
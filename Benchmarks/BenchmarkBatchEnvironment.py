@@ -0,0 +1,88 @@
+"""
+Measure environment steps per second of BatchTradingEnv against a DummyVecEnv of N TradingEnvs.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkBatchEnvironment --rows 20000 --steps 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from ReinforcementLearning.BatchShortEnvironment import BatchTradingEnv
+from ReinforcementLearning.ShortEnvironment import TradingEnv
+
+WINDOW_SIZE = 15
+N_FEATURES = 10
+
+
+def step_looped(envs, actions):
+    """
+    Step independent environments one after the other, resetting finished ones, like DummyVecEnv.
+    """
+    rewards = np.empty((len(actions), len(envs)))
+    for t, step_actions in enumerate(actions):
+        for i, (env, action) in enumerate(zip(envs, step_actions)):
+            _, rewards[t, i], done, _ = env.step(action)
+            if done:
+                env.reset()
+    return rewards
+
+
+def step_vectorized(env, actions):
+    """
+    Step a vectorized environment through one row of actions per step, returning the rewards.
+    """
+    rewards = np.empty((len(actions), env.num_envs))
+    for t, step_actions in enumerate(actions):
+        env.step_async(step_actions)
+        _, rewards[t], _, _ = env.step_wait()
+    return rewards
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=20000, help='Number of time steps in the data.')
+    parser.add_argument('--steps', type=int, default=200, help='Number of vectorized steps to time.')
+    parser.add_argument('--max-looped', type=int, default=64,
+                        help='Largest N to also run with independent TradingEnvs.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, args.rows)))
+    data = rng.normal(size=(args.rows - WINDOW_SIZE + 1, WINDOW_SIZE * N_FEATURES)).astype(np.float32)
+
+    print(f"{'N':>5}{'batched steps/s':>18}{'DummyVecEnv steps/s':>22}{'speedup':>10}")
+    n = 1
+    while n <= 1024:
+        actions = rng.integers(0, 3, (args.steps, n))
+
+        env = BatchTradingEnv(data, prices, WINDOW_SIZE, n, 'float32')
+        env.reset()
+        start = time.perf_counter()
+        batched = step_vectorized(env, actions)
+        batched_rate = args.steps * n / (time.perf_counter() - start)
+
+        line = f"{n:>5}{batched_rate:>18,.0f}"
+        if n <= args.max_looped:
+            dummy = DummyVecEnv([lambda: TradingEnv(data, prices, WINDOW_SIZE, 'float32')] * n)
+            dummy.reset()
+            start = time.perf_counter()
+            step_vectorized(dummy, actions)
+            dummy_rate = args.steps * n / (time.perf_counter() - start)
+            line += f"{dummy_rate:>22,.0f}{batched_rate / dummy_rate:>9.1f}x"
+
+            # DummyVecEnv stores rewards in float32, so exactness is checked against the environments directly
+            envs = [TradingEnv(data, prices, WINDOW_SIZE, 'float32') for _ in range(n)]
+            for single in envs:
+                single.reset()
+            if not np.array_equal(batched, step_looped(envs, actions)):
+                raise AssertionError("Batched rewards do not match the independent environments.")
+        print(line)
+        n *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Show that chunked feature computation keeps peak memory constant as the history grows.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkChunkedFeatures --chunk-rows 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from Benchmarks.BenchmarkFeatureEngineering import make_candles
+from Preprocessing.ChunkedFeatures import ChunkedFeaturePipeline
+
+
+def generate_chunks(total_rows, chunk_rows):
+    """
+    Generate consecutive chunks of random minute candles without holding the whole history.
+    """
+    start = pd.Timestamp('2000-01-01')
+    for i, offset in enumerate(range(0, total_rows, chunk_rows)):
+        chunk = make_candles(min(chunk_rows, total_rows - offset), seed=i)
+        chunk.index = start + pd.to_timedelta(np.arange(offset, offset + len(chunk)), unit='min')
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chunk-rows', type=int, default=100000, help='Number of candles per chunk.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'features.npy')
+        for total_rows in [args.chunk_rows * n for n in (1, 4, 16, 64)]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            rows = ChunkedFeaturePipeline().run(generate_chunks(total_rows, args.chunk_rows), path)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{rows:>12} rows   {elapsed:8.3f}s   peak {peak / 1e6:8.1f} MB   "
+                  f"file {os.path.getsize(path) / 1e6:10.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
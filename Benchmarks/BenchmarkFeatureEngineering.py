@@ -0,0 +1,141 @@
+"""
+Benchmark the array-based indicator engine against the original pandas implementations.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkFeatureEngineering --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from Preprocessing.FeatureEngineering import calculate_macd, calculate_rsi, \
+    calculate_cci, calculate_adx, calculate_moving_velocity_acceleration
+
+FEATURE_COLUMNS = ['MACD', 'signal', 'rsi', 'cci', 'plus_di', 'minus_di', 'adx', 'velocity', 'acceleration']
+
+
+def make_candles(rows, seed=0):
+    """
+    Generate a random walk of minute candles with 'open', 'high', 'low', 'close' and 'volume' columns.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, rows))
+    spread = np.abs(rng.normal(0, 0.05, rows))
+    index = pd.date_range('2000-01-01', periods=rows, freq='min')
+    return pd.DataFrame({
+        'open': close + rng.normal(0, 0.02, rows),
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.integers(100, 10000, rows),
+    }, index=index)
+
+
+def legacy_macd(data, short_period=12, long_period=26, signal_period=9):
+    data = data.sort_index()
+    data['EMA_short'] = data['close'].ewm(span=short_period, adjust=False).mean()
+    data['EMA_long'] = data['close'].ewm(span=long_period, adjust=False).mean()
+    data['MACD'] = data['EMA_short'] - data['EMA_long']
+    data['signal'] = data['MACD'].ewm(span=signal_period, adjust=False).mean()
+    return data
+
+
+def legacy_rsi(data, period=14):
+    data = data.sort_index()
+    data['price_change'] = data['close'].diff()
+    data['gain'] = data['price_change'].clip(lower=0)
+    data['loss'] = -data['price_change'].clip(upper=0)
+    data['avg_gain'] = data['gain'].ewm(alpha=1/period, adjust=False).mean()
+    data['avg_loss'] = data['loss'].ewm(alpha=1/period, adjust=False).mean()
+    data['rs'] = data['avg_gain'] / data['avg_loss']
+    data['rsi'] = 100 - (100 / (1 + data['rs']))
+    return data
+
+
+def legacy_cci(data, period=14):
+    data = data.sort_index()
+    data['typical_price'] = (data['high'] + data['low'] + data['close']) / 3
+    data['sma'] = data['typical_price'].rolling(window=period, min_periods=1).mean()
+    data['mad'] = data['typical_price'].rolling(window=period, min_periods=1).apply(
+        lambda x: np.mean(np.abs(x - x.mean())), raw=False)
+    data['cci'] = (data['typical_price'] - data['sma']) / (0.015 * data['mad'])
+    data.drop(columns=['typical_price', 'sma', 'mad'], inplace=True)
+    return data
+
+
+def legacy_adx(data, period=14):
+    data = data.sort_index()
+    data['prev_close'] = data['close'].shift(1)
+    data['tr'] = data[['high', 'low', 'prev_close']].apply(
+        lambda x: max(x['high'] - x['low'], abs(x['high'] - x['prev_close']), abs(x['low'] - x['prev_close'])),
+        axis=1
+    )
+    data['dm_plus'] = np.where((data['high'] - data['high'].shift(1)) > (data['low'].shift(1) - data['low']),
+                               np.maximum(data['high'] - data['high'].shift(1), 0), 0)
+    data['dm_minus'] = np.where((data['low'].shift(1) - data['low']) > (data['high'] - data['high'].shift(1)),
+                                np.maximum(data['low'].shift(1) - data['low'], 0), 0)
+    data['smoothed_tr'] = data['tr'].ewm(alpha=1/period, adjust=False).mean()
+    data['smoothed_dm_plus'] = data['dm_plus'].ewm(alpha=1/period, adjust=False).mean()
+    data['smoothed_dm_minus'] = data['dm_minus'].ewm(alpha=1/period, adjust=False).mean()
+    data['plus_di'] = (data['smoothed_dm_plus'] / data['smoothed_tr']) * 100
+    data['minus_di'] = (data['smoothed_dm_minus'] / data['smoothed_tr']) * 100
+    data['dx'] = (abs(data['plus_di'] - data['minus_di']) / (data['plus_di'] + data['minus_di'])) * 100
+    data['adx'] = data['dx'].ewm(alpha=1/period, adjust=False).mean()
+    data.drop(columns=['prev_close', 'tr', 'dm_plus', 'dm_minus', 'smoothed_tr', 'smoothed_dm_plus',
+                       'smoothed_dm_minus', 'dx'], inplace=True)
+    return data
+
+
+def legacy_velocity_acceleration(data, period=20):
+    data = data.sort_index()
+    data['velocity'] = (data['close'] - data['close'].shift(period)) / period
+    data['acceleration'] = (data['velocity'] - data['velocity'].shift(period)) / period
+    return data
+
+
+def run_pipeline(data, steps):
+    """
+    Run the indicator functions in order and return the result along with per-step timings.
+    """
+    timings = {}
+    for step in steps:
+        start = time.perf_counter()
+        data = step(data)
+        timings[step.__name__] = time.perf_counter() - start
+    return data, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of minute candles to generate.')
+    args = parser.parse_args()
+
+    candles = make_candles(args.rows)
+    print(f"Computing indicators over {args.rows} rows")
+
+    engine, engine_timings = run_pipeline(candles, [calculate_macd, calculate_rsi, calculate_cci, calculate_adx,
+                                                    calculate_moving_velocity_acceleration])
+    legacy, legacy_timings = run_pipeline(candles, [legacy_macd, legacy_rsi, legacy_cci, legacy_adx,
+                                                    legacy_velocity_acceleration])
+
+    for (engine_name, engine_time), (legacy_name, legacy_time) in zip(engine_timings.items(), legacy_timings.items()):
+        print(f"{engine_name:<42} {engine_time:8.3f}s   legacy {legacy_time:8.3f}s   "
+              f"speedup {legacy_time / engine_time:8.1f}x")
+    engine_total, legacy_total = sum(engine_timings.values()), sum(legacy_timings.values())
+    print(f"{'total':<42} {engine_total:8.3f}s   legacy {legacy_total:8.3f}s   "
+          f"speedup {legacy_total / engine_total:8.1f}x")
+
+    for column in FEATURE_COLUMNS:
+        expected, actual = legacy[column].to_numpy(), engine[column].to_numpy()
+        error = np.nanmax(np.abs(actual - expected)) if np.isfinite(expected).any() else 0.0
+        same_gaps = np.array_equal(np.isnan(expected), np.isnan(actual))
+        print(f"{column:<14} max abs difference {error:.3e}   same NaN positions {same_gaps}")
+        if not same_gaps or not np.allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True):
+            raise AssertionError(f"Engine output for '{column}' does not match the pandas implementation.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the FeaturePipeline against chaining the calculate_* functions, in wall time and peak memory.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkFeaturePipeline --rows 1000000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from Benchmarks.BenchmarkFeatureEngineering import make_candles
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS, calculate_macd, calculate_rsi, \
+    calculate_cci, calculate_adx, calculate_moving_velocity_acceleration
+from Preprocessing.FeaturePipeline import FeaturePipeline
+
+
+def chained_features(data):
+    data = calculate_macd(data)
+    data = calculate_rsi(data)
+    data = calculate_cci(data)
+    data = calculate_adx(data)
+    data = calculate_moving_velocity_acceleration(data)
+    data = data.fillna(0)
+    return data[FEATURE_COLUMNS].to_numpy()
+
+
+def measure(function, *args):
+    """
+    Run the function and return its result, wall time and peak traced memory in bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of minute candles to generate.')
+    args = parser.parse_args()
+
+    candles = make_candles(args.rows)
+    pipeline = FeaturePipeline(FEATURE_COLUMNS)
+
+    chained, chained_time, chained_peak = measure(chained_features, candles)
+    (fused, _), fused_time, fused_peak = measure(pipeline.transform, candles)
+
+    print(f"{'calculate_* chain':<20} {chained_time:8.3f}s   peak {chained_peak / 1e6:10.1f} MB")
+    print(f"{'FeaturePipeline':<20} {fused_time:8.3f}s   peak {fused_peak / 1e6:10.1f} MB")
+
+    pipeline.transform(candles, report=True)
+    print(pipeline.format_report())
+
+    if not np.array_equal(chained, fused):
+        raise AssertionError("FeaturePipeline output does not match the calculate_* functions.")
+
+
+if __name__ == '__main__':
+    main()
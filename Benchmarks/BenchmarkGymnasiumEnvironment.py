@@ -0,0 +1,84 @@
+"""
+Compare step throughput of the native gymnasium environment with the legacy gym TradingEnv.
+
+Both are timed as single environments, the legacy one behind the Shimmy compatibility layer, and inside
+DummyVecEnv, whose per-step copy of the infos dominates there. The best of --repeats runs is reported,
+as single runs are noisy.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkGymnasiumEnvironment --rows 100000 --steps 50000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+from ReinforcementLearning.ShortEnvironment import TradingEnv
+
+WINDOW_SIZE = 15
+N_FEATURES = 10
+
+
+def steps_per_second(vec_env, actions, repeats):
+    best = 0
+    for _ in range(repeats):
+        vec_env.reset()
+        start = time.perf_counter()
+        for action in actions:
+            vec_env.step(action)
+        best = max(best, len(actions) / (time.perf_counter() - start))
+    return best
+
+
+def env_steps_per_second(env, actions, repeats):
+    """
+    Throughput of a single gymnasium environment, reset whenever an episode ends.
+    """
+    best = 0
+    for _ in range(repeats):
+        env.reset()
+        start = time.perf_counter()
+        for action in actions:
+            _, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                env.reset()
+        best = max(best, len(actions) / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000, help='Number of time steps in the data.')
+    parser.add_argument('--steps', type=int, default=50000, help='Number of steps to time.')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs, the fastest is reported.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, args.rows)))
+    data = rng.normal(size=(args.rows - WINDOW_SIZE + 1, WINDOW_SIZE * N_FEATURES)).astype(np.float32)
+    actions = rng.integers(0, 3, (args.steps, 1))
+
+    # Both as stable-baselines3 sees them: the legacy class is wrapped in the Shimmy compatibility layer
+    legacy = DummyVecEnv([lambda: TradingEnv(data, prices, WINDOW_SIZE, 'float32')])
+    native = DummyVecEnv([lambda: GymnasiumTradingEnv(data, prices, WINDOW_SIZE, 'float32')])
+    print(f"legacy env type: {type(legacy.envs[0].unwrapped).__name__}, "
+          f"native env type: {type(native.envs[0].unwrapped).__name__}")
+
+    legacy_rate = env_steps_per_second(legacy.envs[0], actions[:, 0], args.repeats)
+    native_rate = env_steps_per_second(native.envs[0], actions[:, 0], args.repeats)
+    print(f"{'single environment':<34}{'steps/s':>12}")
+    print(f"{'  legacy gym + shimmy':<34}{legacy_rate:>12,.0f}")
+    print(f"{'  native gymnasium':<34}{native_rate:>12,.0f}   speedup {native_rate / legacy_rate:5.2f}x")
+
+    legacy_rate = steps_per_second(legacy, actions, args.repeats)
+    native_rate = steps_per_second(native, actions, args.repeats)
+    print("DummyVecEnv")
+    print(f"{'  legacy gym + shimmy':<34}{legacy_rate:>12,.0f}")
+    print(f"{'  native gymnasium':<34}{native_rate:>12,.0f}   speedup {native_rate / legacy_rate:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Compare computing a grid of indicator periods with IndicatorGrid against one FeaturePipeline run per period.
+
+IndicatorGrid shares the inputs common to every period and still runs one recursion or sliding-window pass
+per period, so the gain comes from the shared work only.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkIndicatorGrid --rows 1000000 --periods 20
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from Benchmarks.BenchmarkFeatureEngineering import make_candles
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.IndicatorGrid import IndicatorGrid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of minute candles to generate.')
+    parser.add_argument('--periods', type=int, default=20, help='Number of periods per indicator.')
+    args = parser.parse_args()
+
+    candles = make_candles(args.rows)
+    periods = list(range(5, 5 + 2 * args.periods, 2))
+    macd_params = [(period, 2 * period + 2, 9) for period in periods]
+
+    start = time.perf_counter()
+    grid = IndicatorGrid(macd_params=macd_params, rsi_periods=periods, cci_periods=periods, adx_periods=periods,
+                         velocity_periods=periods).compute(candles)
+    grid_time = time.perf_counter() - start
+
+    features = ['MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration']
+    start = time.perf_counter()
+    for i, period in enumerate(periods):
+        short, long, signal = macd_params[i]
+        pipeline = FeaturePipeline(features, short_period=short, long_period=long, signal_period=signal,
+                                   rsi_period=period, cci_period=period, adx_period=period, velocity_period=period)
+        expected, _ = pipeline.transform(candles)
+        actual = grid.variant(MACD=macd_params[i], rsi=period, cci=period, adx=period, velocity=period)[features]
+        if not np.allclose(actual.to_numpy(), expected, rtol=1e-12, atol=1e-12):
+            raise AssertionError(f"Grid features for period {period} do not match the FeaturePipeline.")
+    loop_time = time.perf_counter() - start
+
+    print(f"{len(periods)} parameter sets over {args.rows} rows")
+    print(f"{'IndicatorGrid':<24} {grid_time:8.3f}s")
+    print(f"{'FeaturePipeline loop':<24} {loop_time:8.3f}s   speedup {loop_time / grid_time:6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
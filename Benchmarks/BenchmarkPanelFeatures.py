@@ -0,0 +1,45 @@
+"""
+Measure how panel feature computation scales with the number of worker processes.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkPanelFeatures --symbols 64 --rows 200000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from Benchmarks.BenchmarkFeatureEngineering import make_candles
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.PanelFeatures import compute_panel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--symbols', type=int, default=64, help='Number of symbols in the panel.')
+    parser.add_argument('--rows', type=int, default=200000, help='Number of minute candles per symbol.')
+    args = parser.parse_args()
+
+    frames = {f"SYM{i}": make_candles(args.rows, seed=i) for i in range(args.symbols)}
+    pipeline = FeaturePipeline()
+
+    start = time.perf_counter()
+    expected = np.stack([pipeline.transform(frames[symbol])[0] for symbol in frames])
+    baseline = time.perf_counter() - start
+    print(f"{'sequential':<12} {baseline:8.3f}s")
+
+    workers = 1
+    while workers <= os.cpu_count():
+        start = time.perf_counter()
+        panel, symbols, index = compute_panel(frames, pipeline, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>3} workers  {elapsed:8.3f}s   speedup {baseline / elapsed:6.2f}x")
+        if not np.array_equal(panel, expected):
+            raise AssertionError("Panel features do not match the sequential computation.")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare the float32 and float64 dtype policies on the same dataset: memory of the preprocessed arrays
+and the environment, and how far observations, rewards and balances drift between the two.
+Exits with status 1 if a drift exceeds its tolerance.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkPrecision --rows 200000
+"""
+
+import argparse
+import sys
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from Benchmarks.BenchmarkFeatureEngineering import make_candles
+from Preprocessing.CreateTensors import create_moving_windows
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.Precision import scale_features
+from ReinforcementLearning.ShortEnvironment import TradingEnv
+
+WINDOW_SIZE = 15
+
+
+def build(features, scaler, dtype):
+    """
+    Scale the features, materialize the windows and create the environment in the given dtype.
+    """
+    scaled = scale_features(scaler, features, dtype)
+    windows = create_moving_windows(scaled, WINDOW_SIZE, copy=True, dtype=dtype)
+    env = TradingEnv(windows, features['close'], WINDOW_SIZE, dtype)
+    memory = {'scaled features': scaled.nbytes, 'env observations': env.data.nbytes,
+              'env prices': env.prices.nbytes}
+    return env, memory
+
+
+def rollout(env, actions):
+    """
+    Step the environment through the actions, returning the rewards and the balance after each step.
+    """
+    env.reset()
+    rewards, balances = [], []
+    for action in actions:
+        _, reward, done, info = env.step(action)
+        rewards.append(reward)
+        balances.append(info['balance'])
+        if done:
+            break
+    return np.array(rewards), np.array(balances)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000, help='Number of minute candles to generate.')
+    parser.add_argument('--observation-tolerance', type=float, default=1e-5,
+                        help='Maximum relative observation difference, float32 rounding is about 6e-8.')
+    parser.add_argument('--reward-tolerance', type=float, default=1e-9, help='Maximum absolute reward difference.')
+    parser.add_argument('--balance-tolerance', type=float, default=1e-12, help='Maximum relative balance drift.')
+    args = parser.parse_args()
+
+    features = FeaturePipeline().transform_frame(make_candles(args.rows))
+    scaler = StandardScaler().fit(features)
+
+    env_64, memory_64 = build(features, scaler, 'float64')
+    env_32, memory_32 = build(features, scaler, 'float32')
+
+    print(f"{'array':<20}{'float64 MB':>12}{'float32 MB':>12}")
+    for name in memory_64:
+        print(f"{name:<20}{memory_64[name] / 1e6:>12.1f}{memory_32[name] / 1e6:>12.1f}")
+    print(f"{'total':<20}{sum(memory_64.values()) / 1e6:>12.1f}{sum(memory_32.values()) / 1e6:>12.1f}")
+
+    actions = np.random.default_rng(0).integers(0, 3, len(features))
+    rewards_64, balances_64 = rollout(env_64, actions)
+    rewards_32, balances_32 = rollout(env_32, actions)
+    drifts = {
+        'observation': (np.abs(env_32.data - env_64.data) / np.maximum(np.abs(env_64.data), 1)).max(),
+        'reward': np.abs(rewards_64 - rewards_32).max(),
+        'balance': np.abs(balances_64 / balances_32 - 1).max(),
+    }
+    tolerances = {'observation': args.observation_tolerance, 'reward': args.reward_tolerance,
+                  'balance': args.balance_tolerance}
+    print(f"final balance float64 {balances_64[-1]:.2f}   float32 {balances_32[-1]:.2f}")
+
+    failed = False
+    for name, drift in drifts.items():
+        within = drift <= tolerances[name]
+        failed |= not within
+        print(f"max {name + ' drift':<20}{drift:.3e}   tolerance {tolerances[name]:.0e}   "
+              f"{'ok' if within else 'EXCEEDED'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Measure the overhead of ProfilingCallback on PPO training and print the iterations it recorded.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkProfilingCallback --steps 50000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from stable_baselines3 import PPO
+from stable_baselines3.common.utils import set_random_seed
+
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+from ReinforcementLearning.ProfilingCallback import ProfilingCallback
+
+WINDOW_SIZE = 15
+N_FEATURES = 10
+
+
+def train(env, steps, callback=None):
+    set_random_seed(0)
+    model = PPO("MlpPolicy", env, verbose=0)
+    start = time.perf_counter()
+    model.learn(steps, callback=callback)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=50000, help='Number of time steps in the data.')
+    parser.add_argument('--steps', type=int, default=50000, help='PPO steps per training run.')
+    parser.add_argument('--repeats', type=int, default=3, help='Training runs with and without the callback.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, args.rows)))
+    data = rng.normal(size=(args.rows - WINDOW_SIZE + 1, WINDOW_SIZE * N_FEATURES)).astype(np.float32)
+    env = GymnasiumTradingEnv(data, prices, WINDOW_SIZE)
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, 'profile.jsonl')
+        # Alternate the runs so drifts in machine load affect both alike
+        plain, profiled = [], []
+        for _ in range(args.repeats):
+            plain.append(train(env, args.steps))
+            profiled.append(train(env, args.steps, ProfilingCallback(log_path)))
+
+        with open(log_path) as f:
+            records = [json.loads(line) for line in f]
+
+    print(f"without callback {min(plain):8.3f}s")
+    print(f"with callback    {min(profiled):8.3f}s   overhead {100 * (min(profiled) / min(plain) - 1):+.2f}%")
+    print("last recorded iteration:", records[-1])
+
+
+if __name__ == '__main__':
+    main()
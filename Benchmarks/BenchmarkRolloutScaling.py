@@ -0,0 +1,82 @@
+"""
+Measure rollout throughput and per-worker memory of shared-memory TradingEnv workers against worker count.
+
+Run from the repository root:
+    python -m Benchmarks.BenchmarkRolloutScaling --rows 1000000 --steps 2000
+"""
+
+import argparse
+import os
+import time
+from functools import partial
+
+import numpy as np
+import psutil
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+from Preprocessing.CreateTensors import create_moving_windows
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+from ReinforcementLearning.ParallelEnvironments import SharedMarketData, shard_bounds
+
+WINDOW_SIZE = 15
+N_FEATURES = 10
+
+
+def _make_copied_env(features, prices, window_size):
+    """
+    Worker for the baseline: the shard arrives pickled and the windows are built from the worker's own copy.
+    """
+    return GymnasiumTradingEnv(create_moving_windows(features, window_size), prices, window_size, features.dtype)
+
+
+def measure(vec_env, n_workers, steps, rng):
+    """
+    Step the workers with random actions, returning steps per second and the mean RSS and USS
+    (memory private to the process) of a worker in MB.
+    """
+    vec_env.reset()
+    actions = rng.integers(0, 3, (steps, n_workers))
+    start = time.perf_counter()
+    for step_actions in actions:
+        vec_env.step(step_actions)
+    rate = steps * n_workers / (time.perf_counter() - start)
+
+    memory = [psutil.Process(process.pid).memory_full_info() for process in vec_env.processes]
+    rss = np.mean([info.rss for info in memory]) / 1e6
+    uss = np.mean([info.uss for info in memory]) / 1e6
+    return rate, rss, uss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of time steps in the data.')
+    parser.add_argument('--steps', type=int, default=2000, help='Number of vectorized steps to time.')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count(), help='Largest worker count.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(args.rows, N_FEATURES)).astype(np.float32)
+    prices = (100 * np.exp(np.cumsum(rng.normal(0, 1e-3, args.rows)))).astype(np.float32)
+    print(f"features {features.nbytes / 1e6:.1f} MB, prices {prices.nbytes / 1e6:.1f} MB")
+
+    print(f"{'workers':>8}{'data':>10}{'steps/s':>12}{'RSS MB':>10}{'USS MB':>10}")
+    with SharedMarketData(features, prices, WINDOW_SIZE, 'float32') as shared:
+        n_workers = 1
+        while n_workers <= args.max_workers:
+            vec_env = shared.make_vec_env(n_workers)
+            rate, rss, uss = measure(vec_env, n_workers, args.steps, rng)
+            vec_env.close()
+            print(f"{n_workers:>8}{'shared':>10}{rate:>12,.0f}{rss:>10.1f}{uss:>10.1f}")
+
+            # Baseline: every worker is sent its shard pickled and keeps a private copy
+            env_fns = [partial(_make_copied_env, features[start:end], prices[start:end], WINDOW_SIZE)
+                       for start, end in shard_bounds(len(features), n_workers, WINDOW_SIZE)]
+            vec_env = SubprocVecEnv(env_fns)
+            rate, rss, uss = measure(vec_env, n_workers, args.steps, rng)
+            vec_env.close()
+            print(f"{n_workers:>8}{'pickled':>10}{rate:>12,.0f}{rss:>10.1f}{uss:>10.1f}")
+            n_workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import asyncio
+import random
+import time
+from datetime import timedelta
+
+import httpx
+import pandas as pd
+
+# Price history method of the schwab-py client for each candle frequency
+HISTORY_METHODS = {
+    'day': 'get_price_history_every_day',
+    'minute': 'get_price_history_every_minute',
+}
+
+# Range covered by one request for each frequency, small enough for the API to return it whole
+CHUNK_SIZES = {
+    'day': timedelta(days=365),
+    'minute': timedelta(days=10),
+}
+
+# Responses worth retrying: rate limited or a server side failure
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def chunk_ranges(start_datetime, end_datetime, chunk):
+    """
+    Split [start_datetime, end_datetime) into consecutive ranges of at most chunk.
+
+    :param chunk: timedelta covered by each range.
+    :return: List of (start, end) pairs.
+    """
+    if chunk <= timedelta(0):
+        raise ValueError(f"chunk must be positive, got {chunk}")
+    ranges = []
+    start = start_datetime
+    while start < end_datetime:
+        end = min(start + chunk, end_datetime)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def candles_to_frame(candles):
+    """
+    DataFrame of the candles of a price history response, indexed by 'datetime' like fetch_daily_data.
+    """
+    df = pd.DataFrame(candles, columns=['open', 'high', 'low', 'close', 'volume', 'datetime'])
+    df['datetime'] = pd.to_datetime(df['datetime'], unit='ms')
+    df.set_index('datetime', inplace=True)
+    return df
+
+
+class RateLimiter:
+    """
+    Token bucket: on average rate acquisitions per second, with bursts of up to burst at once.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncHistoryDownloader:
+    """
+    Downloads price history concurrently: the requested range is split into API-sized chunks, which are
+    fetched at the same time over the client's pooled connection and stitched into one sorted frame.
+
+    The number of requests in flight is bounded by a semaphore and their start rate by a token bucket.
+    Rate-limited, failed server and connection errors are retried with exponential backoff.
+
+    The client is the asynchronous schwab-py client, client_from_token_file(..., asyncio=True), which
+    sends every request over one httpx.AsyncClient. Any object with the same awaitable price history
+    methods returning httpx responses works, e.g. a stand-in for tests.
+    """
+
+    def __init__(self, client, max_concurrency=8, requests_per_second=2.0, burst=None, frequency='day',
+                 chunk=None, retries=4, backoff=0.5):
+        """
+        :param client: Asynchronous price history client.
+        :param max_concurrency: Maximum number of requests in flight.
+        :param requests_per_second: Average request rate, None for no rate limit.
+        :param burst: Number of requests that may start at once, default max_concurrency.
+        :param frequency: Candle frequency, 'day' or 'minute'.
+        :param chunk: timedelta covered by one request, default CHUNK_SIZES[frequency].
+        :param retries: Number of retries of a failed request before giving up.
+        :param backoff: Seconds waited before the first retry, doubled on every further retry.
+        """
+        if frequency not in HISTORY_METHODS:
+            raise ValueError(f"Unknown frequency {frequency!r}, expected one of {list(HISTORY_METHODS)}")
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = max_concurrency if burst is None else burst
+        self.frequency = frequency
+        self.chunk = CHUNK_SIZES[frequency] if chunk is None else chunk
+        self.retries = retries
+        self.backoff = backoff
+        self.retried = 0  # Number of retried requests, for monitoring
+
+    async def _fetch_chunk(self, symbol, start, end, semaphore, limiter):
+        method = getattr(self.client, HISTORY_METHODS[self.frequency])
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                if limiter is not None:
+                    await limiter.acquire()
+                try:
+                    resp = await method(symbol, start_datetime=start, end_datetime=end,
+                                        need_extended_hours_data=True, need_previous_close=False)
+                except httpx.TransportError as error:
+                    if attempt == self.retries:
+                        raise
+                    delay = None
+                    failure = error
+                else:
+                    if resp.status_code == httpx.codes.OK:
+                        return candles_to_frame(resp.json().get('candles', []))
+                    if resp.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                        raise Exception(f"Failed to fetch data for {symbol}: {resp.status_code} - {resp.text}")
+                    delay = resp.headers.get('Retry-After')
+                    failure = resp.status_code
+
+            # Backoff outside the semaphore, so waiting requests do not hold a slot
+            delay = float(delay) if delay is not None else self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            self.retried += 1
+            print(f"Retrying {symbol} {start} - {end} in {delay:.2f}s after {failure!r}")
+            await asyncio.sleep(delay)
+
+    async def _fetch(self, symbol, start_datetime, end_datetime, semaphore, limiter):
+        chunks = await asyncio.gather(*[
+            self._fetch_chunk(symbol, start, end, semaphore, limiter)
+            for start, end in chunk_ranges(start_datetime, end_datetime, self.chunk)
+        ])
+        chunks = [chunk for chunk in chunks if len(chunk)]
+        if not chunks:
+            raise Exception(f"No price data available for {symbol} for the given period.")
+        df = pd.concat(chunks)
+        # Chunk edges may return the same candle twice
+        df = df[~df.index.duplicated(keep='last')]
+        return df.sort_index()
+
+    def _limits(self):
+        limiter = None
+        if self.requests_per_second is not None:
+            limiter = RateLimiter(self.requests_per_second, self.burst)
+        return asyncio.Semaphore(self.max_concurrency), limiter
+
+    async def fetch(self, symbol, start_datetime, end_datetime):
+        """
+        Price history of one symbol from start_datetime to end_datetime.
+
+        :return: DataFrame of candles indexed by 'datetime', sorted and without duplicates.
+        """
+        return await self._fetch(symbol, start_datetime, end_datetime, *self._limits())
+
+    async def fetch_many(self, symbols, start_datetime, end_datetime):
+        """
+        Price history of several symbols, all chunks sharing the same concurrency and rate limits.
+
+        :return: Dict of symbol -> DataFrame of candles.
+        """
+        semaphore, limiter = self._limits()
+        frames = await asyncio.gather(*[
+            self._fetch(symbol, start_datetime, end_datetime, semaphore, limiter) for symbol in symbols
+        ])
+        return dict(zip(symbols, frames))
+
+    def download(self, symbol, start_datetime, end_datetime):
+        """
+        Blocking fetch for code outside an event loop, with the signature CandleStore.sync expects.
+        Connections of an httpx client belong to the event loop that opened them, so use a client
+        created for each call or call fetch from a running loop for repeated downloads.
+        """
+        return asyncio.run(self.fetch(symbol, start_datetime, end_datetime))
@@ -0,0 +1,224 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from Preprocessing.NpyWriter import AppendableNpy
+
+# Stored columns besides the timestamp
+CANDLE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def _to_milliseconds(times):
+    """
+    Convert timestamps (naive UTC, or timezone aware) to int64 milliseconds since the epoch.
+    """
+    index = pd.DatetimeIndex(times)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ms').asi8
+
+
+class CandleStore:
+    """
+    Local per-symbol store of candles, one .npy file per column sorted by timestamp.
+
+    Files are memory-mapped for reads, so range queries only touch the rows they return. New candles are
+    appended in place and overlapping downloads are deduplicated, a downloaded bar replacing the stored
+    bar of the same timestamp. Timestamps are stored as int64 milliseconds since the epoch, in UTC like
+    the API. The time ranges sync has downloaded are recorded, so gaps in the stored history are filled.
+    """
+
+    def __init__(self, directory='candle_store'):
+        self.directory = directory
+
+    def _path(self, symbol, column):
+        return os.path.join(self.directory, symbol, column + '.npy')
+
+    def _load(self, symbol):
+        """
+        Memory-map the columns of a symbol, trimmed to the rows every column has (a write interrupted
+        between columns leaves some longer). The timestamp column is written last.
+        """
+        if not os.path.exists(self._path(symbol, 'datetime')):
+            return None
+        columns = {column: np.load(self._path(symbol, column), mmap_mode='r')
+                   for column in ['datetime'] + CANDLE_COLUMNS}
+        rows = min(len(values) for values in columns.values())
+        return {column: values[:rows] for column, values in columns.items()}
+
+    def time_range(self, symbol):
+        """
+        First and last stored timestamps of a symbol, or (None, None) if nothing is stored.
+        """
+        columns = self._load(symbol)
+        if columns is None or len(columns['datetime']) == 0:
+            return None, None
+        return (pd.Timestamp(int(columns['datetime'][0]), unit='ms'),
+                pd.Timestamp(int(columns['datetime'][-1]), unit='ms'))
+
+    def append(self, symbol, data):
+        """
+        Add candles to the store.
+
+        :param data: DataFrame indexed by timestamp with CANDLE_COLUMNS, e.g. from fetch_daily_data.
+        :return: Number of new candles stored.
+        """
+        times = _to_milliseconds(data.index)
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        values = {column: np.asarray(data[column], dtype=np.float64)[order] for column in CANDLE_COLUMNS}
+        # The last of duplicated timestamps wins, as the most recently downloaded
+        keep = np.append(times[1:] != times[:-1], True) if len(times) else np.zeros(0, dtype=bool)
+        times = times[keep]
+        values = {column: column_values[keep] for column, column_values in values.items()}
+
+        stored = self._load(symbol)
+        rows = 0 if stored is None else len(stored['datetime'])
+        kept_rows = rows
+        if rows and len(times):
+            stored_times = stored['datetime']
+            older = times[times < stored_times[-1]]
+            positions = np.minimum(np.searchsorted(stored_times, older), rows - 1)
+            if len(older) and (older[0] < stored_times[0] or np.any(stored_times[positions] != older)):
+                # History earlier than the store or filling a gap in it: merge and rewrite the symbol
+                return self._rewrite(symbol, stored, times, values)
+            newer = times >= stored_times[-1]
+            times = times[newer]
+            values = {column: column_values[newer] for column, column_values in values.items()}
+            if len(times) and times[0] == stored_times[-1]:
+                # The last stored bar may have been stored before its close, it is overwritten
+                kept_rows = rows - 1
+        # Release the memory maps before the files are written
+        del stored
+        os.makedirs(os.path.join(self.directory, symbol), exist_ok=True)
+
+        for column in CANDLE_COLUMNS + ['datetime']:
+            dtype = np.int64 if column == 'datetime' else np.float64
+            with AppendableNpy(self._path(symbol, column), dtype=dtype, mode='a') as output:
+                # Drop rows beyond the common length left by an interrupted append
+                output.truncate(kept_rows)
+                output.append(times if column == 'datetime' else values[column])
+        return kept_rows + len(times) - rows
+
+    def _rewrite(self, symbol, stored, times, values):
+        merged_times = np.concatenate([stored['datetime'], times])
+        merged = {column: np.concatenate([stored[column], values[column]]) for column in CANDLE_COLUMNS}
+        # Downloaded candles come second, so on equal timestamps the stable sort puts them last and they are kept
+        order = np.argsort(merged_times, kind='stable')
+        merged_times = merged_times[order]
+        keep = np.append(merged_times[1:] != merged_times[:-1], True)
+        new_rows = int(keep.sum()) - len(stored['datetime'])
+        del stored
+
+        # Written to a new directory and swapped in, so the symbol is never half rewritten
+        directory = os.path.join(self.directory, symbol)
+        staging = directory + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for column in CANDLE_COLUMNS + ['datetime']:
+            column_values = merged_times if column == 'datetime' else merged[column][order]
+            dtype = np.int64 if column == 'datetime' else np.float64
+            with AppendableNpy(os.path.join(staging, column + '.npy'), dtype=dtype) as output:
+                output.append(column_values[keep])
+        if os.path.exists(self._path(symbol, 'coverage')):
+            shutil.copy(self._path(symbol, 'coverage'), os.path.join(staging, 'coverage.npy'))
+        shutil.rmtree(directory)
+        os.replace(staging, directory)
+        return new_rows
+
+    def arrays(self, symbol, start=None, end=None):
+        """
+        Candles of a symbol with start <= timestamp < end, as read-only memory-mapped arrays.
+
+        :param start: Optional first timestamp, naive UTC or timezone aware.
+        :param end: Optional end timestamp (exclusive).
+        :return: Dict of column -> array, with 'datetime' in milliseconds since the epoch, or None if
+                 nothing is stored for the symbol.
+        """
+        columns = self._load(symbol)
+        if columns is None:
+            return None
+        times = columns['datetime']
+        first = 0 if start is None else np.searchsorted(times, _to_milliseconds([start])[0], side='left')
+        last = len(times) if end is None else np.searchsorted(times, _to_milliseconds([end])[0], side='left')
+        return {column: values[first:last] for column, values in columns.items()}
+
+    def frame(self, symbol, start=None, end=None):
+        """
+        Candles of a symbol with start <= timestamp < end as a DataFrame indexed by 'datetime',
+        laid out like the frames returned by fetch_daily_data.
+        """
+        columns = self.arrays(symbol, start, end)
+        if columns is None:
+            return pd.DataFrame(columns=CANDLE_COLUMNS, index=pd.DatetimeIndex([], name='datetime'))
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(columns['datetime']), unit='ms'), name='datetime')
+        return pd.DataFrame({column: np.array(columns[column]) for column in CANDLE_COLUMNS}, index=index)
+
+    def coverage(self, symbol):
+        """
+        Time ranges sync has downloaded for a symbol, as sorted disjoint [start, end) rows of milliseconds.
+        """
+        path = self._path(symbol, 'coverage')
+        return np.load(path) if os.path.exists(path) else np.zeros((0, 2), dtype=np.int64)
+
+    def _save_coverage(self, symbol, ranges):
+        path = self._path(symbol, 'coverage')
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, _merge_ranges(ranges))
+        os.replace(path + '.tmp', path)
+
+    def sync(self, symbol, fetch, start, end):
+        """
+        Bring the store up to date for a range and return its candles, downloading only what is missing:
+        the parts of the range no earlier sync covered, and the last stored candle onwards since that bar
+        may have been downloaded before its close. The missing parts are fetched in one request spanning
+        them, overlaps with stored candles are deduplicated.
+
+        :param fetch: Function (symbol, start, end) -> DataFrame of candles, e.g. fetch_daily_data.
+        :return: DataFrame of the candles with start <= timestamp < end.
+        """
+        start_ms, end_ms = _to_milliseconds([start])[0], _to_milliseconds([end])[0]
+        covered = self.coverage(symbol)
+        _, last = self.time_range(symbol)
+        if last is not None:
+            # Nothing from the last stored candle on counts as covered
+            last_ms = _to_milliseconds([last])[0]
+            covered = np.minimum(covered, last_ms)
+        missing = _subtract_ranges(start_ms, end_ms, covered)
+        if missing:
+            fetch_start = pd.Timestamp(missing[0][0], unit='ms', tz='UTC').to_pydatetime()
+            fetch_end = pd.Timestamp(missing[-1][1], unit='ms', tz='UTC').to_pydatetime()
+            self.append(symbol, fetch(symbol, fetch_start, fetch_end))
+            self._save_coverage(symbol, np.vstack([self.coverage(symbol), [[start_ms, end_ms]]]))
+        return self.frame(symbol, start, end)
+
+
+def _merge_ranges(ranges):
+    """
+    Union of [start, end) ranges as sorted disjoint rows.
+    """
+    merged = []
+    for range_start, range_end in sorted(map(tuple, np.asarray(ranges, dtype=np.int64).reshape(-1, 2))):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return np.array(merged, dtype=np.int64).reshape(-1, 2)
+
+
+def _subtract_ranges(start, end, covered):
+    """
+    Parts of [start, end) outside the sorted disjoint covered ranges, as a list of (start, end).
+    """
+    missing = []
+    for range_start, range_end in covered:
+        if range_end <= start or range_start >= end:
+            continue
+        if range_start > start:
+            missing.append((start, range_start))
+        start = max(start, range_end)
+    if start < end:
+        missing.append((start, end))
+    return missing
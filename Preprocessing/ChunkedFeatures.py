@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS, _as_array, cci_from_deviation, di_from_smoothed, \
+    directional_movement, dx_from_di, ema_alpha, ewm_mean_with_state, gain_loss, rate_of_change, \
+    rolling_mean_abs_deviation, rsi_from_averages, shift, true_range, typical_price, wilder_alpha
+from Preprocessing.NpyWriter import AppendableNpy
+
+# Recursive means carried from chunk to chunk
+EWM_STATES = ['EMA_short', 'EMA_long', 'signal', 'avg_gain', 'avg_loss', 'smoothed_tr', 'smoothed_dm_plus',
+              'smoothed_dm_minus', 'adx']
+
+
+def iter_frame_chunks(data, chunk_rows):
+    """
+    Split a DataFrame into consecutive chunks of chunk_rows rows.
+    """
+    for start in range(0, len(data), chunk_rows):
+        yield data.iloc[start:start + chunk_rows]
+
+
+class ChunkedFeaturePipeline:
+    """
+    Computes FEATURE_COLUMNS over a candle history delivered in consecutive chunks, with memory bounded
+    by the chunk size instead of the history length.
+
+    EWM/Wilder means carry their state across chunk boundaries and the last rows of the previous chunk
+    are kept as a tail, so shifts, differences and rolling windows see the same history they would in
+    a single pass. The output equals FeaturePipeline(FEATURE_COLUMNS) run on the whole history.
+    """
+
+    def __init__(self, short_period=12, long_period=26, signal_period=9, rsi_period=14, cci_period=14,
+                 adx_period=14, velocity_period=20):
+        self.params = {'short_period': short_period, 'long_period': long_period, 'signal_period': signal_period,
+                       'rsi_period': rsi_period, 'cci_period': cci_period, 'adx_period': adx_period,
+                       'velocity_period': velocity_period}
+        self.features = list(FEATURE_COLUMNS)
+        # Rows of history needed before a chunk: the CCI window and two velocity lookbacks
+        self.tail_size = max(cci_period - 1, 2 * velocity_period, 1)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the carried state and start a new series.
+        """
+        self.ewm_states = {name: None for name in EWM_STATES}
+        self.tail = np.empty((0, 3))  # Last rows of (high, low, close)
+        self.last_index = None
+        self.rows = 0
+
+    def transform_chunk(self, chunk):
+        """
+        Compute the features of the next chunk of candles and update the carried state.
+
+        :param chunk: DataFrame with 'high', 'low', 'close' and 'volume' columns, later in time than the
+                      previous chunk.
+        :return: Array of shape (len(chunk), len(FEATURE_COLUMNS)) with NaN filled with 0.
+        """
+        chunk = chunk.sort_index()
+        if len(chunk) == 0:
+            return np.empty((0, len(self.features)))
+        if self.last_index is not None and chunk.index[0] <= self.last_index:
+            raise ValueError("Chunks must be consecutive and in time order.")
+
+        p = self.params
+        rows = np.column_stack([_as_array(chunk['high']), _as_array(chunk['low']), _as_array(chunk['close'])])
+        extended = np.concatenate([self.tail, rows])
+        high, low, close = extended[:, 0], extended[:, 1], extended[:, 2]
+        offset = len(self.tail)
+
+        output = np.empty((len(chunk), len(self.features)))
+        columns = {feature: output[:, i] for i, feature in enumerate(self.features)}
+        columns['close'][:] = rows[:, 2]
+        columns['high'][:] = rows[:, 0]
+        columns['low'][:] = rows[:, 1]
+        columns['volume'][:] = _as_array(chunk['volume'])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # MACD
+            ema_short = self._ewm('EMA_short', rows[:, 2], ema_alpha(p['short_period']))
+            ema_long = self._ewm('EMA_long', rows[:, 2], ema_alpha(p['long_period']))
+            macd = ema_short - ema_long
+            self._ewm('signal', macd, ema_alpha(p['signal_period']))
+            columns['MACD'][:] = macd
+
+            # RSI
+            gain, loss = gain_loss((close - shift(close))[offset:])
+            avg_gain = self._ewm('avg_gain', gain, wilder_alpha(p['rsi_period']))
+            avg_loss = self._ewm('avg_loss', loss, wilder_alpha(p['rsi_period']))
+            columns['rsi'][:] = rsi_from_averages(avg_gain, avg_loss)[1]
+
+            # CCI
+            prices = typical_price(high, low, close)
+            sma, mad = rolling_mean_abs_deviation(prices, p['cci_period'])
+            columns['cci'][:] = cci_from_deviation(prices, sma, mad)[offset:]
+
+            # ADX
+            tr = true_range(high, low, close)[offset:]
+            dm_plus, dm_minus = directional_movement(high, low)
+            alpha = wilder_alpha(p['adx_period'])
+            smoothed_tr = self._ewm('smoothed_tr', tr, alpha)
+            plus_di = di_from_smoothed(self._ewm('smoothed_dm_plus', dm_plus[offset:], alpha), smoothed_tr)
+            minus_di = di_from_smoothed(self._ewm('smoothed_dm_minus', dm_minus[offset:], alpha), smoothed_tr)
+            columns['adx'][:] = self._ewm('adx', dx_from_di(plus_di, minus_di), alpha)
+
+            # Velocity and acceleration
+            velocity = rate_of_change(close, shift(close, p['velocity_period']), p['velocity_period'])
+            acceleration = rate_of_change(velocity, shift(velocity, p['velocity_period']), p['velocity_period'])
+            columns['velocity'][:] = velocity[offset:]
+            columns['acceleration'][:] = acceleration[offset:]
+
+        output[np.isnan(output)] = 0
+
+        self.tail = extended[-self.tail_size:].copy()
+        self.last_index = chunk.index[-1]
+        self.rows += len(chunk)
+        return output
+
+    def _ewm(self, name, values, alpha):
+        smoothed, self.ewm_states[name] = ewm_mean_with_state(values, alpha, self.ewm_states[name])
+        return smoothed
+
+    def run(self, chunks, path, mode='w'):
+        """
+        Stream chunks of candles through the pipeline and write the features incrementally to a .npy file.
+
+        :param chunks: Iterable of DataFrames in time order, e.g. iter_frame_chunks(data, 100000)
+                       or pd.read_csv(..., chunksize=100000).
+        :param path: Output .npy path, readable with np.load(path, mmap_mode='r').
+        :param mode: 'w' to start a new file, 'a' to append to one written by a previous run with this state.
+        :return: Total number of feature rows in the file.
+        """
+        with AppendableNpy(path, (len(self.features),), mode=mode) as output:
+            for chunk in chunks:
+                output.append(self.transform_chunk(chunk))
+                output.flush()
+            return output.rows
+
+    def get_state(self):
+        """
+        Snapshot of the carried state as a dict of numpy arrays, e.g. for np.savez.
+        """
+        return {
+            'ewm_states': np.array([state if state is not None else (np.nan, 1.0)
+                                    for state in (self.ewm_states[name] for name in EWM_STATES)]),
+            'tail': self.tail,
+            'last_index': np.asarray(pd.Index([self.last_index] if self.last_index is not None else []).values),
+            'rows': np.array(self.rows),
+        }
+
+    def set_state(self, state):
+        """
+        Restore a snapshot from get_state, to continue a series in a later run.
+        """
+        self.ewm_states = {name: None if np.isnan(mean) else (float(mean), float(weight))
+                           for name, (mean, weight) in zip(EWM_STATES, state['ewm_states'])}
+        self.tail = np.array(state['tail'], dtype=np.float64).reshape(-1, 3)
+        self.last_index = state['last_index'][0] if len(state['last_index']) else None
+        self.rows = int(state['rows'])
@@ -1,37 +1,48 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 
-def create_moving_windows(data, window_size, stride=1):
+def _as_contiguous_rows(data, dtype=None):
+    """
+    Return the data (DataFrame or array) as a C-contiguous 2D array, one row per time step.
+    """
+    values = np.ascontiguousarray(np.asarray(data), dtype=dtype)
+    if values.ndim == 1:
+        values = values[:, None]
+    return values
+
+
+def create_moving_windows(data, window_size, stride=1, copy=False, dtype=None):
     """
     Create moving windows from the past data, ensuring only past data (e.g., the previous 15 minutes) is used.
 
+    The windows are a read-only strided view over one contiguous copy of the data: consecutive rows are
+    adjacent in memory, so each flattened window is a slice of the flat buffer and no window is copied.
+
     Parameters:
     - data: DataFrame containing the data
     - window_size: Size of each window (e.g., 15 for the past 15 minutes)
     - stride: Stride length for moving the window
+    - copy: If True, materialize the windows into a new writable array
+    - dtype: (Optional) Dtype of the windows, e.g. np.float32, default keeps the dtype of the data
 
     Returns:
     - windows_array: A numpy array containing the flattened windows of past data
     """
-    flattened_windows = []
+    values = _as_contiguous_rows(data, dtype)
+    n_rows, n_columns = values.shape
 
-    # Start from window_size to ensure we always have the past window_size data points
-    for start in range(0, len(data) - window_size + 1):
-        # Get the past 'window_size' rows (i.e., from start - window_size to start)
-        window = data.iloc[start: start + window_size]
+    if n_rows < window_size:
+        return np.empty((0, window_size * n_columns), dtype=values.dtype)
 
-        # Flatten the window DataFrame to a 1D array
-        flattened = window.values.flatten()
-        flattened_windows.append(flattened)
+    # Every window_size * n_columns run of the flat buffer, starting on a row boundary every stride rows
+    windows_array = sliding_window_view(values.reshape(-1), window_size * n_columns)[::stride * n_columns]
 
-    # Convert to numpy arrays
-    windows_array = np.array(flattened_windows)
+    return windows_array.copy() if copy else windows_array
 
-    return windows_array
 
 
-
-def create_most_recent_window(data, window_size, stride=1):
+def create_most_recent_window(data, window_size, stride=1, dtype=None):
     """
     Create the most recent moving window from the data.
 
@@ -39,6 +50,7 @@ def create_most_recent_window(data, window_size, stride=1):
     - data: DataFrame containing the data
     - window_size: Size of the window
     - stride: (Optional) Stride length for consistency, though it's not needed here.
+    - dtype: (Optional) Dtype of the window, default keeps the dtype of the data
 
     Returns:
     - window_array: A numpy array containing the most recent window, flattened if necessary.
@@ -53,10 +65,10 @@ def create_most_recent_window(data, window_size, stride=1):
     # Convert the window DataFrame to a NumPy array
     window_array = most_recent_window.values
 
-    return np.array(window_array).flatten()
+    return np.array(window_array, dtype=dtype).flatten()
 
 
-def create_labels(data, window_size, stride=1):
+def create_labels(data, window_size, stride=1, copy=False):
     """
     Create labels for each moving window.
 
@@ -64,20 +76,12 @@ def create_labels(data, window_size, stride=1):
     - data: DataFrame containing the data
     - window_size: Size of each window
     - stride: Stride length for moving the window
+    - copy: If True, return a new array instead of a view of the 'decision' column
 
     Returns:
     - labels_array: A numpy array containing the labels
     """
-    labels = []
-
-    for start in range(0, len(data) - window_size + 1, stride):
-        end = start + window_size
-        window = data.iloc[start:end]
-
-        # Use the label of the last time step in the window
-        labels.append(window['decision'].iloc[-1])
-
-    # Convert to numpy arrays
-    labels_array = np.array(labels)
+    # Use the label of the last time step in each window
+    labels_array = np.asarray(data['decision'])[window_size - 1::stride]
 
-    return labels_array
\ No newline at end of file
+    return labels_array.copy() if copy else labels_array
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import Preprocessing.FeatureEngineering
+import Preprocessing.FeaturePipeline
+import Preprocessing.StreamingFeatures
+
+
+def _code_version():
+    """
+    Digest of the feature code, so cached features are invalidated when the indicators change.
+    """
+    digest = hashlib.sha256()
+    for module in (Preprocessing.FeatureEngineering, Preprocessing.FeaturePipeline, Preprocessing.StreamingFeatures):
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+CODE_VERSION = _code_version()
+
+
+def data_digest(data, columns=('open', 'high', 'low', 'close', 'volume')):
+    """
+    Digest of the raw candles: the index and the given columns, in index order.
+    """
+    digest = hashlib.sha256()
+    index = np.asarray(data.index.values)
+    if index.dtype == object:
+        digest.update(repr(index.tolist()).encode())
+    else:
+        digest.update(np.ascontiguousarray(index).view(np.uint8))
+    for column in columns:
+        if column in data:
+            digest.update(column.encode())
+            digest.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)).view(np.uint8))
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Content addressed on-disk cache of computed feature matrices.
+
+    Entries are uncompressed .npz files named by a hash of (symbol, date range, raw data digest,
+    indicator parameters, code version), so they load in milliseconds and can never be stale.
+    The directory is kept under max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, directory='feature_cache', max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def make_key(self, symbol, data, params, start=None, end=None):
+        """
+        Build the cache key of features computed from the given candles.
+
+        :param symbol: Ticker symbol.
+        :param data: DataFrame of raw candles.
+        :param params: Dict describing how the features are computed (indicator periods, feature list, ...).
+        :param start: Optional start of the date range.
+        :param end: Optional end of the date range.
+        :return: Hex digest string.
+        """
+        parts = [symbol, str(start), str(end), data_digest(data), repr(sorted(params.items())), CODE_VERSION]
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key):
+        """
+        Load a cache entry.
+
+        :return: Dict of arrays, or None on a miss.
+        """
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        # Refresh the modification time, which orders entries for eviction
+        os.utime(path)
+        return arrays
+
+    def save(self, key, arrays):
+        """
+        Atomically write a cache entry, then evict old entries if the cache is over its size limit.
+
+        :param key: Cache key from make_key.
+        :param arrays: Dict of numpy arrays to store.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and name == f"{keep}.npz":
+                continue
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def get_or_compute(self, pipeline, data, symbol, start=None, end=None, verbose=False):
+        """
+        Return the pipeline features of the candles, computing and storing them on a miss.
+
+        :param pipeline: FeaturePipeline to compute the features with.
+        :param data: DataFrame of raw candles.
+        :param symbol: Ticker symbol.
+        :param start: Optional start of the date range, part of the key.
+        :param end: Optional end of the date range, part of the key.
+        :param verbose: Print whether the features came from the cache.
+        :return: DataFrame of features indexed like the sorted candles.
+        """
+        params = dict(pipeline.params, features=tuple(pipeline.features))
+        key = self.make_key(symbol, data, params, start, end)
+
+        load_start = time.perf_counter()
+        entry = self.load(key)
+        if entry is not None:
+            if verbose:
+                print(f"Loaded {symbol} features from cache in {time.perf_counter() - load_start:.3f}s")
+            return pd.DataFrame(entry['features'], index=entry['index'], columns=list(entry['columns']))
+
+        features, index = pipeline.transform(data)
+        self.save(key, {'features': features, 'index': np.asarray(index.values),
+                        'columns': np.array(pipeline.features)})
+        if verbose:
+            print(f"Computed {symbol} features and stored them in the cache")
+        return pd.DataFrame(features, index=index, columns=pipeline.features)
@@ -5,6 +5,343 @@ Created on
 """
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+
+# Columns fed to the scaler and the model, in order
+FEATURE_COLUMNS = ['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration']
+
+# Number of rolling windows reduced at once, bounds the temporary (block, period) buffers
+WINDOW_BLOCK_SIZE = 65536
+
+
+def _as_array(values):
+    """
+    Return the values as a contiguous float64 array, the layout every kernel below works on.
+    """
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def shift(values, periods=1):
+    """
+    Shift an array forward by the given number of periods, padding the start with NaN.
+    Equivalent to pandas' ``Series.shift(periods)``.
+
+    :param values: 1D array of values.
+    :param periods: Number of positions to shift by, default is 1.
+    :return: Shifted array with the same length as values.
+    """
+    values = _as_array(values)
+    shifted = np.full(values.shape, np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[:len(values) - periods]
+    return shifted
+
+
+def ewm_mean(values, alpha):
+    """
+    Recursive exponentially weighted mean, matching pandas' ``ewm(alpha=alpha, adjust=False).mean()``.
+
+    The recursion starts at the first non-NaN value. Gap-free series run through a single
+    ``lfilter`` call, series with NaN after the first observation fall back to pandas' weighting.
+
+    :param values: 1D array of values.
+    :param alpha: Smoothing factor, e.g. 2 / (span + 1) or 1 / period for Wilder's smoothing.
+    :return: Array of smoothed values.
+    """
+    return ewm_mean_with_state(values, alpha)[0]
+
+
+def ewm_mean_with_state(values, alpha, state=None):
+    """
+    ewm_mean that can continue from the end of a previous call, so a series processed in consecutive
+    chunks gives the same result as in one piece.
+
+    :param values: 1D array of values.
+    :param alpha: Smoothing factor.
+    :param state: (mean, weight of the mean) returned by the previous chunk, None to start a new series.
+    :return: Tuple of (array of smoothed values, state after the last value).
+    """
+    values = _as_array(values)
+    mean, old_weight = (np.nan, 1.0) if state is None else state
+    smoothed = np.full(values.shape, np.nan)
+    observed = ~np.isnan(values)
+
+    start = 0
+    if mean != mean:
+        # Not started yet, the first observation seeds the mean
+        if not observed.any():
+            return smoothed, (mean, old_weight)
+        start = int(np.argmax(observed))
+        mean = values[start]
+        old_weight = 1.0
+        smoothed[start] = mean
+        start += 1
+
+    tail = values[start:]
+    if len(tail) == 0:
+        return smoothed, (mean, old_weight)
+    if old_weight == 1.0 and observed[start:].all():
+        # y[t] = alpha * x[t] + (1 - alpha) * y[t - 1]
+        smoothed[start:], _ = lfilter([alpha], [1.0, alpha - 1.0], tail, zi=[(1.0 - alpha) * mean])
+        mean = smoothed[-1]
+    else:
+        smoothed[start:], mean, old_weight = _ewm_mean_with_gaps(tail, alpha, mean, old_weight)
+
+    return smoothed, (float(mean), float(old_weight))
+
+
+def _ewm_mean_with_gaps(values, alpha, weighted, old_weight):
+    """
+    Scalar EWM loop reproducing pandas' handling of NaN inside the series (ignore_na=False):
+    a gap keeps the previous mean and decays its weight before the next observation.
+    """
+    smoothed = np.empty(values.shape)
+    for i in range(len(values)):
+        current = values[i]
+        old_weight *= 1.0 - alpha
+        if current == current:
+            if weighted != current:
+                weighted = (old_weight * weighted + alpha * current) / (old_weight + alpha)
+            old_weight = 1.0
+        smoothed[i] = weighted
+    return smoothed, weighted, old_weight
+
+
+def rolling_mean_abs_deviation(values, period):
+    """
+    Rolling mean and mean absolute deviation over the trailing window, with pandas' ``min_periods=1``
+    semantics (the first period - 1 rows use the shorter window available so far).
+
+    :param values: 1D array of values.
+    :param period: Window length.
+    :return: Tuple of (rolling mean, rolling mean absolute deviation) arrays.
+    """
+    values = _as_array(values)
+    mean = np.empty(values.shape)
+    mad = np.empty(values.shape)
+
+    # Partial windows at the start of the series
+    for i in range(min(period - 1, len(values))):
+        window = values[:i + 1]
+        mean[i] = window.mean()
+        mad[i] = np.abs(window - mean[i]).mean()
+
+    # Full windows as a strided view, reduced block by block to bound temporary memory
+    if len(values) >= period:
+        windows = sliding_window_view(values, period)
+        for start in range(0, len(windows), WINDOW_BLOCK_SIZE):
+            block = windows[start:start + WINDOW_BLOCK_SIZE]
+            block_mean = block.mean(axis=1)
+            mean[start + period - 1:start + period - 1 + len(block)] = block_mean
+            mad[start + period - 1:start + period - 1 + len(block)] = \
+                np.abs(block - block_mean[:, None]).mean(axis=1)
+
+    return mean, mad
+
+
+# Per-intermediate formulas of the indicators. They take arrays or scalars, so the batch, chunked, grid and
+# streaming implementations share them instead of restating the arithmetic. Divisions follow numpy's rules
+# (x / 0 is +-inf, 0 / 0 is NaN), callers silence the warnings with np.errstate
+
+
+def ema_alpha(span):
+    """
+    Smoothing factor of an EMA over span periods.
+    """
+    return 2.0 / (span + 1)
+
+
+def wilder_alpha(period):
+    """
+    Smoothing factor of Wilder's smoothing over period periods.
+    """
+    return 1.0 / period
+
+
+def gain_loss(price_change):
+    """
+    Gain and loss parts of price changes, both non-negative. NaN stays NaN.
+    """
+    return np.clip(price_change, 0, None), -np.clip(price_change, None, 0)
+
+
+def rsi_from_averages(avg_gain, avg_loss):
+    """
+    RS and RSI from the smoothed gains and losses.
+
+    :return: Tuple of (rs, rsi).
+    """
+    rs = np.divide(avg_gain, avg_loss)
+    return rs, 100 - (100 / (1 + rs))
+
+
+def typical_price(high, low, close):
+    """
+    Typical price, the mean of high, low and close.
+    """
+    return (high + low + close) / 3
+
+
+def cci_from_deviation(typical_price, sma, mad):
+    """
+    CCI from the typical price and its rolling mean and mean absolute deviation.
+    """
+    return np.divide(typical_price - sma, 0.015 * mad)
+
+
+def true_range_from_previous(high, low, prev_close):
+    """
+    True range, the largest of high - low, |high - previous close| and |low - previous close|.
+    A NaN previous close (the first row) gives high - low.
+    """
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def directional_movement_from_moves(up_move, down_move):
+    """
+    Positive and negative directional movement (DM+ and DM-) from the up and down moves, 0 where a move is NaN.
+    """
+    dm_plus = np.where(up_move > down_move, np.maximum(up_move, 0), 0)
+    dm_minus = np.where(down_move > up_move, np.maximum(down_move, 0), 0)
+    return dm_plus, dm_minus
+
+
+def di_from_smoothed(smoothed_dm, smoothed_tr):
+    """
+    Directional indicator (DI+ or DI-) from the smoothed directional movement and true range.
+    """
+    return np.divide(smoothed_dm, smoothed_tr) * 100
+
+
+def dx_from_di(plus_di, minus_di):
+    """
+    Directional index DX from DI+ and DI-.
+    """
+    return np.divide(np.abs(plus_di - minus_di), plus_di + minus_di) * 100
+
+
+def rate_of_change(values, lagged, period):
+    """
+    Change per period from the value period rows earlier, the velocity of prices or the acceleration of
+    velocities.
+    """
+    return (values - lagged) / period
+
+
+def true_range(high, low, close):
+    """
+    True range of every row. The first row has no previous close and uses high - low.
+    """
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    return true_range_from_previous(high, low, shift(close))
+
+
+def directional_movement(high, low):
+    """
+    Positive and negative directional movement (DM+ and DM-). The first row is 0.
+    """
+    high, low = _as_array(high), _as_array(low)
+    return directional_movement_from_moves(high - shift(high), shift(low) - low)
+
+
+def compute_macd(close, short_period=12, long_period=26, signal_period=9):
+    """
+    Array version of the MACD indicator.
+
+    :param close: 1D array of close prices, sorted by time.
+    :param short_period: Short EMA period, default is 12.
+    :param long_period: Long EMA period, default is 26.
+    :param signal_period: Signal line EMA period, default is 9.
+    :return: Dict of 'EMA_short', 'EMA_long', 'MACD' and 'signal' arrays.
+    """
+    close = _as_array(close)
+    ema_short = ewm_mean(close, ema_alpha(short_period))
+    ema_long = ewm_mean(close, ema_alpha(long_period))
+    macd = ema_short - ema_long
+    signal = ewm_mean(macd, ema_alpha(signal_period))
+    return {'EMA_short': ema_short, 'EMA_long': ema_long, 'MACD': macd, 'signal': signal}
+
+
+def compute_rsi(close, period=14):
+    """
+    Array version of the RSI indicator with Wilder's smoothing.
+
+    :param close: 1D array of close prices, sorted by time.
+    :param period: Smoothing period, default is 14.
+    :return: Dict of 'price_change', 'gain', 'loss', 'avg_gain', 'avg_loss', 'rs' and 'rsi' arrays.
+    """
+    close = _as_array(close)
+    price_change = close - shift(close)
+    gain, loss = gain_loss(price_change)
+    avg_gain = ewm_mean(gain, wilder_alpha(period))
+    avg_loss = ewm_mean(loss, wilder_alpha(period))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs, rsi = rsi_from_averages(avg_gain, avg_loss)
+    return {'price_change': price_change, 'gain': gain, 'loss': loss, 'avg_gain': avg_gain,
+            'avg_loss': avg_loss, 'rs': rs, 'rsi': rsi}
+
+
+def compute_cci(high, low, close, period=14):
+    """
+    Array version of the CCI indicator.
+
+    :param high: 1D array of high prices, sorted by time.
+    :param low: 1D array of low prices, sorted by time.
+    :param close: 1D array of close prices, sorted by time.
+    :param period: Rolling window length, default is 14.
+    :return: Dict with the 'cci' array.
+    """
+    prices = typical_price(_as_array(high), _as_array(low), _as_array(close))
+    sma, mad = rolling_mean_abs_deviation(prices, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {'cci': cci_from_deviation(prices, sma, mad)}
+
+
+def compute_adx(high, low, close, period=14):
+    """
+    Array version of the ADX indicator with Wilder's smoothing.
+
+    :param high: 1D array of high prices, sorted by time.
+    :param low: 1D array of low prices, sorted by time.
+    :param close: 1D array of close prices, sorted by time.
+    :param period: Smoothing period, default is 14.
+    :return: Dict of 'plus_di', 'minus_di' and 'adx' arrays.
+    """
+    tr = true_range(high, low, close)
+    dm_plus, dm_minus = directional_movement(high, low)
+
+    smoothed_tr = ewm_mean(tr, wilder_alpha(period))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = di_from_smoothed(ewm_mean(dm_plus, wilder_alpha(period)), smoothed_tr)
+        minus_di = di_from_smoothed(ewm_mean(dm_minus, wilder_alpha(period)), smoothed_tr)
+        dx = dx_from_di(plus_di, minus_di)
+    adx = ewm_mean(dx, wilder_alpha(period))
+    return {'plus_di': plus_di, 'minus_di': minus_di, 'adx': adx}
+
+
+def compute_moving_velocity_acceleration(close, period=20):
+    """
+    Array version of the moving velocity and acceleration.
+
+    :param close: 1D array of close prices, sorted by time.
+    :param period: Lookback period, default is 20.
+    :return: Dict of 'velocity' and 'acceleration' arrays.
+    """
+    close = _as_array(close)
+    velocity = rate_of_change(close, shift(close, period), period)
+    acceleration = rate_of_change(velocity, shift(velocity, period), period)
+    return {'velocity': velocity, 'acceleration': acceleration}
+
+
+def _assign_columns(data, columns):
+    """
+    Write the computed arrays into the DataFrame as columns, in order.
+    """
+    for name, values in columns.items():
+        data[name] = values
+    return data
 
 
 def calculate_macd(data, short_period=12, long_period=26, signal_period=9):
@@ -20,15 +357,7 @@ def calculate_macd(data, short_period=12, long_period=26, signal_period=9):
     # Ensure that the index is sorted
     data = data.sort_index()
 
-    # Calculate EMA values
-    data['EMA_short'] = data['close'].ewm(span=short_period, adjust=False).mean()
-    data['EMA_long'] = data['close'].ewm(span=long_period, adjust=False).mean()
-
-    # Calculate MACD and signal line
-    data['MACD'] = data['EMA_short'] - data['EMA_long']
-    data['signal'] = data['MACD'].ewm(span=signal_period, adjust=False).mean()
-
-    return data
+    return _assign_columns(data, compute_macd(data['close'], short_period, long_period, signal_period))
 
 
 def calculate_rsi(data, period=14):
@@ -38,23 +367,7 @@ def calculate_rsi(data, period=14):
     """
     data = data.sort_index()
 
-    # Calculate price changes
-    data['price_change'] = data['close'].diff()
-
-    # Calculate gains and losses
-    data['gain'] = data['price_change'].clip(lower=0)
-    data['loss'] = -data['price_change'].clip(upper=0)
-
-    # Use Wilder's smoothing for gains and losses
-    data['avg_gain'] = data['gain'].ewm(alpha=1/period, adjust=False).mean()
-    data['avg_loss'] = data['loss'].ewm(alpha=1/period, adjust=False).mean()
-
-    # Calculate RS and RSI
-    data['rs'] = data['avg_gain'] / data['avg_loss']
-    data['rsi'] = 100 - (100 / (1 + data['rs']))
-
-    return data
-
+    return _assign_columns(data, compute_rsi(data['close'], period))
 
 
 def calculate_cci(data, period=14):
@@ -67,23 +380,7 @@ def calculate_cci(data, period=14):
     """
     data = data.sort_index()
 
-    # Calculate Typical Price
-    data['typical_price'] = (data['high'] + data['low'] + data['close']) / 3
-
-    # Calculate rolling mean of Typical Price
-    data['sma'] = data['typical_price'].rolling(window=period, min_periods=1).mean()
-
-    # Calculate Mean Absolute Deviation (MAD)
-    data['mad'] = data['typical_price'].rolling(window=period, min_periods=1).apply(
-        lambda x: np.mean(np.abs(x - x.mean())), raw=False)
-
-    # Calculate CCI
-    data['cci'] = (data['typical_price'] - data['sma']) / (0.015 * data['mad'])
-
-    # Drop intermediate columns
-    data.drop(columns=['typical_price', 'sma', 'mad'], inplace=True)
-
-    return data
+    return _assign_columns(data, compute_cci(data['high'], data['low'], data['close'], period))
 
 
 def calculate_adx(data, period=14):
@@ -93,37 +390,7 @@ def calculate_adx(data, period=14):
     """
     data = data.sort_index()
 
-    # Calculate True Range (TR)
-    data['prev_close'] = data['close'].shift(1)
-    data['tr'] = data[['high', 'low', 'prev_close']].apply(
-        lambda x: max(x['high'] - x['low'], abs(x['high'] - x['prev_close']), abs(x['low'] - x['prev_close'])),
-        axis=1
-    )
-
-    # Calculate Directional Movement (DM+ and DM-)
-    data['dm_plus'] = np.where((data['high'] - data['high'].shift(1)) > (data['low'].shift(1) - data['low']),
-                               np.maximum(data['high'] - data['high'].shift(1), 0), 0)
-    data['dm_minus'] = np.where((data['low'].shift(1) - data['low']) > (data['high'] - data['high'].shift(1)),
-                                np.maximum(data['low'].shift(1) - data['low'], 0), 0)
-
-    # Use Wilder's smoothing for TR, DM+, and DM-
-    data['smoothed_tr'] = data['tr'].ewm(alpha=1/period, adjust=False).mean()
-    data['smoothed_dm_plus'] = data['dm_plus'].ewm(alpha=1/period, adjust=False).mean()
-    data['smoothed_dm_minus'] = data['dm_minus'].ewm(alpha=1/period, adjust=False).mean()
-
-    # Calculate +DI and -DI
-    data['plus_di'] = (data['smoothed_dm_plus'] / data['smoothed_tr']) * 100
-    data['minus_di'] = (data['smoothed_dm_minus'] / data['smoothed_tr']) * 100
-
-    # Calculate DX and ADX
-    data['dx'] = (abs(data['plus_di'] - data['minus_di']) / (data['plus_di'] + data['minus_di'])) * 100
-    data['adx'] = data['dx'].ewm(alpha=1/period, adjust=False).mean()
-
-    # Drop intermediate columns
-    data.drop(columns=['prev_close', 'tr', 'dm_plus', 'dm_minus', 'smoothed_tr', 'smoothed_dm_plus',
-                       'smoothed_dm_minus', 'dx'], inplace=True)
-
-    return data
+    return _assign_columns(data, compute_adx(data['high'], data['low'], data['close'], period))
 
 
 def calculate_moving_velocity_acceleration(data, period=20):
@@ -136,11 +403,4 @@ def calculate_moving_velocity_acceleration(data, period=20):
     """
     data = data.sort_index()
 
-    # Calculate the velocity as the price difference over the period, using past data
-    data['velocity'] = (data['close'] - data['close'].shift(period)) / period
-
-    # Calculate the acceleration as the change in velocity over the period, using past data
-    data['acceleration'] = (data['velocity'] - data['velocity'].shift(period)) / period
-
-    return data
-
+    return _assign_columns(data, compute_moving_velocity_acceleration(data['close'], period))
@@ -0,0 +1,182 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS, cci_from_deviation, di_from_smoothed, \
+    directional_movement_from_moves, dx_from_di, ema_alpha, ewm_mean, gain_loss, rate_of_change, \
+    rolling_mean_abs_deviation, rsi_from_averages, shift, true_range, typical_price, wilder_alpha
+
+
+class FeaturePipeline:
+    """
+    Computes a chosen list of features in one pass over the candles.
+
+    Every indicator is broken into stages (e.g. 'EMA_short' -> 'MACD' -> 'signal'). Only the stages the
+    requested features depend on are run, the data is sorted once, intermediate arrays are released as
+    soon as their last consumer has run and the features are written into a single preallocated array.
+    The values are the same as the calculate_* functions followed by fillna(0).
+    """
+
+    def __init__(self, features=None, short_period=12, long_period=26, signal_period=9, rsi_period=14,
+                 cci_period=14, adx_period=14, velocity_period=20):
+        self.features = list(FEATURE_COLUMNS if features is None else features)
+        self.params = {'short_period': short_period, 'long_period': long_period, 'signal_period': signal_period,
+                       'rsi_period': rsi_period, 'cci_period': cci_period, 'adx_period': adx_period,
+                       'velocity_period': velocity_period}
+        self.stages = self._build_stages()
+
+        unknown = [feature for feature in self.features if feature not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown features {unknown}, available features are {sorted(self.stages)}.")
+
+        self.order = self._resolve_order()
+        self.report = []
+
+    def _build_stages(self):
+        """
+        Map every stage name to (dependencies, function of the dependency arrays).
+        """
+        p = self.params
+        return {
+            # Raw candle columns
+            'close': ((), None),
+            'high': ((), None),
+            'low': ((), None),
+            'volume': ((), None),
+
+            # MACD
+            'EMA_short': (('close',), lambda close: ewm_mean(close, ema_alpha(p['short_period']))),
+            'EMA_long': (('close',), lambda close: ewm_mean(close, ema_alpha(p['long_period']))),
+            'MACD': (('EMA_short', 'EMA_long'), lambda ema_short, ema_long: ema_short - ema_long),
+            'signal': (('MACD',), lambda macd: ewm_mean(macd, ema_alpha(p['signal_period']))),
+
+            # RSI
+            'price_change': (('close',), lambda close: close - shift(close)),
+            'gain': (('price_change',), lambda price_change: gain_loss(price_change)[0]),
+            'loss': (('price_change',), lambda price_change: gain_loss(price_change)[1]),
+            'avg_gain': (('gain',), lambda gain: ewm_mean(gain, wilder_alpha(p['rsi_period']))),
+            'avg_loss': (('loss',), lambda loss: ewm_mean(loss, wilder_alpha(p['rsi_period']))),
+            'rs': (('avg_gain', 'avg_loss'), lambda avg_gain, avg_loss: rsi_from_averages(avg_gain, avg_loss)[0]),
+            'rsi': (('avg_gain', 'avg_loss'), lambda avg_gain, avg_loss: rsi_from_averages(avg_gain, avg_loss)[1]),
+
+            # CCI
+            'typical_price': (('high', 'low', 'close'), typical_price),
+            'cci': (('typical_price',), lambda prices:
+                    cci_from_deviation(prices, *rolling_mean_abs_deviation(prices, p['cci_period']))),
+
+            # ADX
+            'tr': (('high', 'low', 'close'), true_range),
+            'up_move': (('high',), lambda high: high - shift(high)),
+            'down_move': (('low',), lambda low: shift(low) - low),
+            'dm_plus': (('up_move', 'down_move'), lambda up, down: directional_movement_from_moves(up, down)[0]),
+            'dm_minus': (('up_move', 'down_move'), lambda up, down: directional_movement_from_moves(up, down)[1]),
+            'smoothed_tr': (('tr',), lambda tr: ewm_mean(tr, wilder_alpha(p['adx_period']))),
+            'smoothed_dm_plus': (('dm_plus',), lambda dm_plus: ewm_mean(dm_plus, wilder_alpha(p['adx_period']))),
+            'smoothed_dm_minus': (('dm_minus',), lambda dm_minus: ewm_mean(dm_minus, wilder_alpha(p['adx_period']))),
+            'plus_di': (('smoothed_dm_plus', 'smoothed_tr'), di_from_smoothed),
+            'minus_di': (('smoothed_dm_minus', 'smoothed_tr'), di_from_smoothed),
+            'dx': (('plus_di', 'minus_di'), dx_from_di),
+            'adx': (('dx',), lambda dx: ewm_mean(dx, wilder_alpha(p['adx_period']))),
+
+            # Velocity and acceleration
+            'velocity': (('close',), lambda close:
+                         rate_of_change(close, shift(close, p['velocity_period']), p['velocity_period'])),
+            'acceleration': (('velocity',), lambda velocity:
+                             rate_of_change(velocity, shift(velocity, p['velocity_period']), p['velocity_period'])),
+        }
+
+    def _resolve_order(self):
+        """
+        Depth first walk of the dependency graph from the requested features, returning the needed
+        stages in an order where every stage comes after its dependencies.
+        """
+        order = []
+        visited = set()
+
+        def visit(name):
+            if name in visited:
+                return
+            visited.add(name)
+            for dependency in self.stages[name][0]:
+                visit(dependency)
+            order.append(name)
+
+        for feature in self.features:
+            visit(feature)
+        return order
+
+    def transform(self, data, report=False):
+        """
+        Compute the requested features.
+
+        :param data: DataFrame with the raw candle columns ('close', 'high', 'low', 'volume').
+        :param report: If True, record the time and bytes allocated by each stage in self.report.
+        :return: Tuple of (features array of shape (len(data), len(features)), sorted index).
+        """
+        if not data.index.is_monotonic_increasing:
+            data = data.sort_index()
+
+        # Number of stages still waiting on each array, so it can be released after its last use
+        consumers = {name: 0 for name in self.order}
+        for name in self.order:
+            for dependency in self.stages[name][0]:
+                consumers[dependency] += 1
+
+        output = np.empty((len(data), len(self.features)))
+        columns = {feature: i for i, feature in enumerate(self.features)}
+        arrays = {}
+        self.report = []
+
+        if report:
+            tracemalloc.start()
+        try:
+            for name in self.order:
+                start = time.perf_counter()
+                if report:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+
+                dependencies, function = self.stages[name]
+                if function is None:
+                    values = data[name].to_numpy(dtype=np.float64)
+                else:
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        values = function(*(arrays[dependency] for dependency in dependencies))
+
+                for dependency in dependencies:
+                    consumers[dependency] -= 1
+                    if consumers[dependency] == 0:
+                        del arrays[dependency]
+                if name in columns:
+                    column = output[:, columns[name]]
+                    column[:] = values
+                    column[np.isnan(column)] = 0
+                if consumers[name] > 0:
+                    arrays[name] = values
+
+                if report:
+                    self.report.append({'stage': name, 'seconds': time.perf_counter() - start,
+                                        'bytes': tracemalloc.get_traced_memory()[1] - before})
+        finally:
+            if report:
+                tracemalloc.stop()
+
+        return output, data.index
+
+    def transform_frame(self, data, report=False):
+        """
+        Compute the requested features as a DataFrame with the sorted index of the data.
+        """
+        output, index = self.transform(data, report)
+        return pd.DataFrame(output, index=index, columns=self.features)
+
+    def format_report(self):
+        """
+        Format the per stage report of the last transform(report=True) call.
+        """
+        lines = [f"{'stage':<20}{'seconds':>10}{'MB allocated':>16}"]
+        for stage in self.report:
+            lines.append(f"{stage['stage']:<20}{stage['seconds']:>10.4f}{stage['bytes'] / 1e6:>16.2f}")
+        return '\n'.join(lines)
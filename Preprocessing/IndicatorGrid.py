@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from Preprocessing.FeatureEngineering import _as_array, cci_from_deviation, di_from_smoothed, \
+    directional_movement, dx_from_di, ema_alpha, ewm_mean, gain_loss, rate_of_change, rolling_mean_abs_deviation, \
+    rsi_from_averages, shift, true_range, typical_price, wilder_alpha
+
+
+def ewm_grid(values, alphas):
+    """
+    Exponentially weighted means of one series for many smoothing factors, one ewm_mean recursion per factor.
+
+    :param values: 1D array of values.
+    :param alphas: Sequence of smoothing factors.
+    :return: Array of shape (len(values), len(alphas)).
+    """
+    values = _as_array(values)
+    grid = np.empty((len(alphas), len(values)))
+    for i, alpha in enumerate(alphas):
+        grid[i] = ewm_mean(values, alpha)
+    return grid.T
+
+
+class IndicatorGrid:
+    """
+    Indicators computed for a grid of periods.
+
+    Shared inputs (price changes, true range, directional movement, EMAs of the close) are computed once
+    and reused by every parameter value, then each period runs its own recursion (EWM smoothing) or
+    sliding-window pass (CCI). values[name] is an array of shape (time, n_params) whose columns
+    follow params[name], stored parameter-major so each series is contiguous.
+    """
+
+    def __init__(self, macd_params=((12, 26, 9),), rsi_periods=(14,), cci_periods=(14,), adx_periods=(14,),
+                 velocity_periods=(20,)):
+        self.params = {
+            'MACD': list(macd_params),
+            'signal': list(macd_params),
+            'rsi': list(rsi_periods),
+            'cci': list(cci_periods),
+            'adx': list(adx_periods),
+            'velocity': list(velocity_periods),
+            'acceleration': list(velocity_periods),
+        }
+        self.values = {}
+        self.index = None
+        self.base = None
+
+    def compute(self, data):
+        """
+        Compute every indicator of the grid.
+
+        :param data: DataFrame with 'high', 'low', 'close' and 'volume' columns.
+        :return: self
+        """
+        data = data.sort_index()
+        close = _as_array(data['close'])
+        high = _as_array(data['high'])
+        low = _as_array(data['low'])
+        self.index = data.index
+        self.base = data[['close', 'high', 'low', 'volume']]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.values = {}
+            self._compute_macd(close)
+            self._compute_rsi(close)
+            self._compute_cci(high, low, close)
+            self._compute_adx(high, low, close)
+            self._compute_velocity(close)
+        return self
+
+    def _compute_macd(self, close):
+        # Every distinct span is smoothed once and shared by the MACD combinations using it
+        spans = sorted({span for short, long, _ in self.params['MACD'] for span in (short, long)})
+        emas = dict(zip(spans, ewm_grid(close, [ema_alpha(span) for span in spans]).T))
+
+        macd = np.empty((len(self.params['MACD']), len(close)))
+        signal = np.empty_like(macd)
+        for i, (short, long, signal_period) in enumerate(self.params['MACD']):
+            macd[i] = emas[short] - emas[long]
+            signal[i] = ewm_mean(macd[i], ema_alpha(signal_period))
+        self.values['MACD'] = macd.T
+        self.values['signal'] = signal.T
+
+    def _compute_rsi(self, close):
+        gain, loss = gain_loss(close - shift(close))
+        alphas = [wilder_alpha(period) for period in self.params['rsi']]
+        self.values['rsi'] = rsi_from_averages(ewm_grid(gain, alphas), ewm_grid(loss, alphas))[1]
+
+    def _compute_cci(self, high, low, close):
+        # The mean absolute deviation needs every window anyway, so the rolling mean comes from the same
+        # pass rather than a cumulative sum, which would also lose the exact match with FeaturePipeline
+        prices = typical_price(high, low, close)
+        cci = np.empty((len(self.params['cci']), len(close)))
+        for i, period in enumerate(self.params['cci']):
+            sma, mad = rolling_mean_abs_deviation(prices, period)
+            cci[i] = cci_from_deviation(prices, sma, mad)
+        self.values['cci'] = cci.T
+
+    def _compute_adx(self, high, low, close):
+        tr = true_range(high, low, close)
+        dm_plus, dm_minus = directional_movement(high, low)
+        alphas = [wilder_alpha(period) for period in self.params['adx']]
+        smoothed_tr = ewm_grid(tr, alphas)
+        dx = dx_from_di(di_from_smoothed(ewm_grid(dm_plus, alphas), smoothed_tr),
+                        di_from_smoothed(ewm_grid(dm_minus, alphas), smoothed_tr))
+        adx = np.empty((len(alphas), len(close)))
+        for i, alpha in enumerate(alphas):
+            adx[i] = ewm_mean(dx[:, i], alpha)
+        self.values['adx'] = adx.T
+
+    def _compute_velocity(self, close):
+        periods = self.params['velocity']
+        velocity = np.empty((len(periods), len(close)))
+        acceleration = np.empty_like(velocity)
+        for i, period in enumerate(periods):
+            velocity[i] = rate_of_change(close, shift(close, period), period)
+            acceleration[i] = rate_of_change(velocity[i], shift(velocity[i], period), period)
+        self.values['velocity'] = velocity.T
+        self.values['acceleration'] = acceleration.T
+
+    def tensor(self, name):
+        """
+        Feature tensor of one indicator with NaN filled with 0, as a DataFrame with one column per parameter.
+        """
+        values = np.where(np.isnan(self.values[name]), 0, self.values[name])
+        return pd.DataFrame(values, index=self.index, columns=[str(param) for param in self.params[name]])
+
+    def variant(self, **choices):
+        """
+        Build a feature frame laid out like FEATURE_COLUMNS for one choice of parameters,
+        e.g. variant(MACD=(8, 21, 5), rsi=21). Indicators not given use their first grid value.
+
+        :return: DataFrame with 'close', 'high', 'low', 'volume' followed by the chosen indicators.
+        """
+        frame = self.base.copy()
+        for name in ['MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration']:
+            param = choices.get(name, self.params[name][0])
+            if name == 'acceleration' and 'acceleration' not in choices:
+                param = choices.get('velocity', param)
+            column = self.params[name].index(param)
+            frame[name] = self.values[name][:, column]
+        return frame.fillna(0)
@@ -0,0 +1,98 @@
+import os
+import struct
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+# Fixed size of the .npy header, leaves room for the row count to grow without moving the data
+HEADER_SIZE = 128
+
+
+class AppendableNpy:
+    """
+    A .npy file that rows are appended to incrementally. The data is streamed to disk as it arrives
+    and the header, which holds the row count, is rewritten in place on flush, so the file can be
+    read with np.load (including mmap_mode) at any time after a flush.
+    """
+
+    def __init__(self, path, row_shape=(), dtype=np.float64, mode='w'):
+        """
+        :param path: Path of the .npy file.
+        :param row_shape: Shape of a single row, e.g. (n_features,).
+        :param dtype: Dtype of the stored values.
+        :param mode: 'w' to create or truncate the file, 'a' to append to an existing file written by this class.
+        """
+        self.path = path
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+
+        if mode == 'a' and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            version = npy_format.read_magic(self.file)
+            if version != (1, 0):
+                raise ValueError(f"{path} was not written by AppendableNpy and cannot be appended to.")
+            shape, fortran_order, dtype = npy_format.read_array_header_1_0(self.file)
+            if self.file.tell() != HEADER_SIZE or fortran_order:
+                raise ValueError(f"{path} was not written by AppendableNpy and cannot be appended to.")
+            if tuple(shape[1:]) != self.row_shape or dtype != self.dtype:
+                raise ValueError(f"{path} holds rows of shape {tuple(shape[1:])} and dtype {dtype}, "
+                                 f"expected {self.row_shape} and {self.dtype}.")
+            self.rows = shape[0]
+            # Drop anything written after the last flush
+            self.file.seek(HEADER_SIZE + self.rows * self.dtype.itemsize * int(np.prod(self.row_shape)))
+            self.file.truncate()
+        elif mode in ('w', 'a'):
+            self.file = open(path, 'w+b')
+            self.file.write(self._header())
+        else:
+            raise ValueError(f"Unknown mode '{mode}', expected 'w' or 'a'.")
+
+    def _header(self):
+        header = repr({'descr': npy_format.dtype_to_descr(self.dtype), 'fortran_order': False,
+                       'shape': (self.rows,) + self.row_shape})
+        header = header.ljust(HEADER_SIZE - 11) + '\n'
+        return npy_format.MAGIC_PREFIX + b'\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+    def append(self, rows):
+        """
+        Append rows to the end of the file.
+
+        :param rows: Array of shape (n,) + row_shape.
+        """
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if rows.shape[1:] != self.row_shape:
+            raise ValueError(f"Expected rows of shape {self.row_shape}, got {rows.shape[1:]}.")
+        self.file.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def truncate(self, rows):
+        """
+        Drop every row after the first rows.
+        """
+        rows = min(rows, self.rows)
+        self.file.seek(HEADER_SIZE + rows * self.dtype.itemsize * int(np.prod(self.row_shape)))
+        self.file.truncate()
+        self.rows = rows
+
+    def flush(self):
+        """
+        Write the current row count into the header and flush to disk.
+        """
+        end = self.file.tell()
+        self.file.seek(0)
+        self.file.write(self._header())
+        self.file.seek(end)
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.SharedArray import SharedArray
+
+
+def _compute_symbol(spec, row, frame, positions, features, params):
+    """
+    Worker: compute one symbol's features and write them into its row of the shared panel.
+    """
+    panel = SharedArray.attach(spec)
+    try:
+        values, _ = FeaturePipeline(features, **params).transform(frame)
+        panel.array[row, positions] = values
+    finally:
+        panel.close()
+    return len(values)
+
+
+def compute_panel(frames, pipeline=None, max_workers=None, shared=False):
+    """
+    Compute the features of many symbols in parallel and stack them on a common time axis.
+
+    Symbols are sharded across a process pool. Each worker computes a symbol's features on its own
+    candles and writes them straight into a shared memory panel, so only the raw candles are pickled.
+
+    :param frames: Dict of symbol -> DataFrame of raw candles.
+    :param pipeline: FeaturePipeline to compute, default computes FEATURE_COLUMNS.
+    :param max_workers: Number of worker processes, default is the number of CPUs.
+    :param shared: If True, return the SharedArray holding the panel (the caller must close it)
+                   instead of a private copy, e.g. to hand it on to training workers.
+    :return: Tuple of (panel of shape (symbol, time, feature) with NaN where a symbol has no candle,
+             list of symbols, time index).
+    """
+    pipeline = FeaturePipeline(FEATURE_COLUMNS) if pipeline is None else pipeline
+    symbols = list(frames)
+    frames = [frames[symbol].sort_index() for symbol in symbols]
+    index = np.unique(np.concatenate([np.asarray(frame.index.values) for frame in frames]))
+
+    panel = SharedArray.create((len(symbols), len(index), len(pipeline.features)))
+    try:
+        panel.array[...] = np.nan
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_compute_symbol, panel.spec, row, frame,
+                                       np.searchsorted(index, np.asarray(frame.index.values)),
+                                       pipeline.features, pipeline.params)
+                       for row, frame in enumerate(frames)]
+            for future in futures:
+                future.result()
+    except BaseException:
+        panel.close()
+        raise
+
+    if shared:
+        return panel, symbols, pd.Index(index)
+    values = panel.array.copy()
+    panel.close()
+    return values, symbols, pd.Index(index)
+
+
+def fit_panel_scaler(panel, features=FEATURE_COLUMNS):
+    """
+    Fit a StandardScaler on every (symbol, time) row of the panel that has a candle.
+
+    :param panel: Array of shape (symbol, time, feature) from compute_panel.
+    :param features: Feature names, in panel order.
+    :return: Fitted StandardScaler.
+    """
+    rows = panel.reshape(-1, panel.shape[-1])
+    rows = rows[~np.isnan(rows).any(axis=1)]
+    scaler = StandardScaler()
+    scaler.fit(pd.DataFrame(rows, columns=features))
+    return scaler
@@ -0,0 +1,27 @@
+import numpy as np
+
+# Floating point dtypes the pipeline can store features, windows and observations in
+DTYPES = {'float32': np.dtype(np.float32), 'float64': np.dtype(np.float64)}
+# Close prices are a single column and always kept in float64, so share counts and trades do not depend on
+# the dtype policy
+PRICE_DTYPE = np.dtype(np.float64)
+
+
+def resolve_dtype(dtype=None, default=np.float64):
+    """
+    Resolve a dtype policy ('float32', 'float64', a numpy dtype or None for the default) to a numpy dtype.
+    Indicators are always computed in float64, the policy applies to the features stored and fed to the model.
+    """
+    if dtype is None:
+        dtype = default
+    dtype = np.dtype(dtype)
+    if dtype.name not in DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}', expected one of {list(DTYPES)}.")
+    return dtype
+
+
+def scale_features(scaler, features, dtype=None):
+    """
+    Scale features with a fitted scaler and return them in the chosen dtype.
+    """
+    return scaler.transform(features).astype(resolve_dtype(dtype), copy=False)
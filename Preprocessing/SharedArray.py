@@ -0,0 +1,68 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArray:
+    """
+    A numpy array living in a named shared memory block, so worker processes can read and write it
+    without the data being pickled. The creating process owns the block and unlinks it on close,
+    other processes attach to it with the picklable spec.
+    """
+
+    def __init__(self, shm, shape, dtype, owner):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = owner
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, dtype=np.float64):
+        """
+        Allocate a new shared block for an array of the given shape and dtype.
+        """
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        return cls(shared_memory.SharedMemory(create=True, size=size), shape, dtype, owner=True)
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        Copy an array into a new shared block.
+        """
+        array = np.asarray(array)
+        shared = cls.create(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Attach to a block created in another process from its spec.
+        """
+        name, shape, dtype = spec
+        return cls(shared_memory.SharedMemory(name=name), shape, dtype, owner=False)
+
+    @property
+    def spec(self):
+        """
+        Picklable (name, shape, dtype) tuple identifying the block.
+        """
+        return self.shm.name, self.shape, self.dtype.str
+
+    def close(self):
+        """
+        Release this process' mapping, and free the block if this process created it.
+        """
+        if self.array is None:
+            return
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
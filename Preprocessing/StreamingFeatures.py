@@ -0,0 +1,192 @@
+from collections import deque
+
+import numpy as np
+
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS, cci_from_deviation, di_from_smoothed, \
+    directional_movement_from_moves, dx_from_di, ema_alpha, gain_loss, rate_of_change, rsi_from_averages, \
+    true_range_from_previous, typical_price, wilder_alpha
+
+
+class ExponentialMean:
+    """
+    Running exponentially weighted mean with the same recursion as ``FeatureEngineering.ewm_mean``:
+    it starts at the first non-NaN value and a NaN keeps the previous mean while decaying its weight.
+    """
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = np.nan
+        self.old_weight = 1.0
+
+    def update(self, x):
+        if self.value != self.value:
+            # Not started yet, the first observation seeds the mean
+            if x == x:
+                self.value = x
+                self.old_weight = 1.0
+            return self.value
+
+        self.old_weight *= 1.0 - self.alpha
+        if x == x:
+            if self.old_weight == 1.0 - self.alpha:
+                self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+            elif self.value != x:
+                # Weighting after a gap, as pandas does
+                self.value = (self.old_weight * self.value + self.alpha * x) / (self.old_weight + self.alpha)
+            self.old_weight = 1.0
+        return self.value
+
+
+class StreamingIndicators:
+    """
+    Constant time per candle version of the FeatureEngineering indicators for live trading.
+
+    Each closed candle updates EMA/Wilder accumulators (MACD, RSI, ADX) and fixed length rings
+    (CCI, velocity and acceleration), and produces the same feature row the batch functions
+    produce for the last row of the full history.
+    """
+
+    def __init__(self, short_period=12, long_period=26, signal_period=9, rsi_period=14, cci_period=14,
+                 adx_period=14, velocity_period=20):
+        self.cci_period = cci_period
+        self.velocity_period = velocity_period
+
+        # MACD
+        self.ema_short = ExponentialMean(ema_alpha(short_period))
+        self.ema_long = ExponentialMean(ema_alpha(long_period))
+        self.signal = ExponentialMean(ema_alpha(signal_period))
+
+        # RSI
+        self.avg_gain = ExponentialMean(wilder_alpha(rsi_period))
+        self.avg_loss = ExponentialMean(wilder_alpha(rsi_period))
+
+        # ADX
+        self.smoothed_tr = ExponentialMean(wilder_alpha(adx_period))
+        self.smoothed_dm_plus = ExponentialMean(wilder_alpha(adx_period))
+        self.smoothed_dm_minus = ExponentialMean(wilder_alpha(adx_period))
+        self.adx = ExponentialMean(wilder_alpha(adx_period))
+
+        # Rings of the last typical prices, closes and velocities
+        self.typical_prices = deque(maxlen=cci_period)
+        self.closes = deque(maxlen=velocity_period + 1)
+        self.velocities = deque(maxlen=velocity_period + 1)
+
+        self.prev_high = np.nan
+        self.prev_low = np.nan
+        self.prev_close = np.nan
+
+    def update(self, high, low, close, volume):
+        """
+        Ingest one closed candle.
+
+        :param high: Candle high.
+        :param low: Candle low.
+        :param close: Candle close.
+        :param volume: Candle volume.
+        :return: Feature row as a numpy array ordered like FEATURE_COLUMNS, with NaN filled with 0.
+        """
+        high, low, close, volume = float(high), float(low), float(close), float(volume)
+        features = {'close': close, 'high': high, 'low': low, 'volume': volume}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # MACD
+            macd = self.ema_short.update(close) - self.ema_long.update(close)
+            self.signal.update(macd)
+            features['MACD'] = macd
+
+            # RSI
+            gain, loss = gain_loss(close - self.prev_close)
+            avg_gain = self.avg_gain.update(float(gain))
+            avg_loss = self.avg_loss.update(float(loss))
+            features['rsi'] = float(rsi_from_averages(avg_gain, avg_loss)[1])
+
+            # CCI
+            price = typical_price(high, low, close)
+            self.typical_prices.append(price)
+            window = np.array(self.typical_prices)
+            sma = window.mean()
+            mad = np.abs(window - sma).mean()
+            features['cci'] = float(cci_from_deviation(price, sma, mad))
+
+            # ADX
+            features['adx'] = self._update_adx(high, low, close)
+
+            # Velocity and acceleration
+            self.closes.append(close)
+            velocity = np.nan
+            if len(self.closes) > self.velocity_period:
+                velocity = rate_of_change(close, self.closes[0], self.velocity_period)
+            self.velocities.append(velocity)
+            acceleration = np.nan
+            if len(self.velocities) > self.velocity_period:
+                acceleration = rate_of_change(velocity, self.velocities[0], self.velocity_period)
+            features['velocity'] = velocity
+            features['acceleration'] = acceleration
+
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+        row = np.array([features[column] for column in FEATURE_COLUMNS])
+        row[np.isnan(row)] = 0
+        return row
+
+    def update_candle(self, candle):
+        """
+        Ingest a closed Candle object.
+        """
+        return self.update(candle.high, candle.low, candle.close, candle.volume)
+
+    def _update_adx(self, high, low, close):
+        # On the first candle the true range is high - low and the directional movement 0
+        tr = float(true_range_from_previous(high, low, self.prev_close))
+        dm_plus, dm_minus = directional_movement_from_moves(high - self.prev_high, self.prev_low - low)
+
+        smoothed_tr = self.smoothed_tr.update(tr)
+        plus_di = di_from_smoothed(self.smoothed_dm_plus.update(float(dm_plus)), smoothed_tr)
+        minus_di = di_from_smoothed(self.smoothed_dm_minus.update(float(dm_minus)), smoothed_tr)
+        return self.adx.update(float(dx_from_di(plus_di, minus_di)))
+
+    def _means(self):
+        return [self.ema_short, self.ema_long, self.signal, self.avg_gain, self.avg_loss, self.smoothed_tr,
+                self.smoothed_dm_plus, self.smoothed_dm_minus, self.adx]
+
+    def get_state(self):
+        """
+        Snapshot of the indicator state as a dict of numpy arrays, e.g. to store in a FeatureCache entry.
+        """
+        return {
+            'means': np.array([[mean.value, mean.old_weight] for mean in self._means()]),
+            'typical_prices': np.array(self.typical_prices, dtype=np.float64),
+            'closes': np.array(self.closes, dtype=np.float64),
+            'velocities': np.array(self.velocities, dtype=np.float64),
+            'previous': np.array([self.prev_high, self.prev_low, self.prev_close]),
+        }
+
+    def set_state(self, state):
+        """
+        Restore a snapshot from get_state. The indicator periods must be the same as when it was taken.
+        """
+        for mean, (value, old_weight) in zip(self._means(), state['means']):
+            mean.value, mean.old_weight = float(value), float(old_weight)
+        self.typical_prices.clear()
+        self.typical_prices.extend(state['typical_prices'].tolist())
+        self.closes.clear()
+        self.closes.extend(state['closes'].tolist())
+        self.velocities.clear()
+        self.velocities.extend(state['velocities'].tolist())
+        self.prev_high, self.prev_low, self.prev_close = state['previous'].tolist()
+
+    @classmethod
+    def from_history(cls, data, **kwargs):
+        """
+        Build the indicator state by replaying a DataFrame of candles with 'high', 'low', 'close'
+        and 'volume' columns, in index order.
+
+        :return: Tuple of (StreamingIndicators, array of the feature rows produced).
+        """
+        indicators = cls(**kwargs)
+        data = data.sort_index()
+        rows = [indicators.update(*candle) for candle in
+                zip(data['high'].to_numpy(), data['low'].to_numpy(), data['close'].to_numpy(),
+                    data['volume'].to_numpy())]
+        return indicators, np.array(rows).reshape(len(rows), len(FEATURE_COLUMNS))
+
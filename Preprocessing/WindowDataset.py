@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from Preprocessing.Precision import PRICE_DTYPE, resolve_dtype
+
+# Rows scaled and written at a time by build_window_dataset
+WRITE_CHUNK_ROWS = 100000
+
+
+def write_window_dataset(directory, features, prices, dtype=None):
+    """
+    Write scaled features and close prices once as .npy files that WindowDataset memory-maps.
+
+    :param directory: Directory to write 'features.npy' and 'prices.npy' into.
+    :param features: Array or DataFrame of scaled features, one row per time step.
+    :param prices: Close prices, one per time step.
+    :param dtype: Dtype of the stored features, 'float32' or 'float64' (default). Prices are stored in float64.
+    """
+    dtype = resolve_dtype(dtype)
+    os.makedirs(directory, exist_ok=True)
+    features = np.asarray(features)
+    stored = open_memmap(os.path.join(directory, 'features.npy'), mode='w+', dtype=dtype, shape=features.shape)
+    stored[:] = features
+    stored.flush()
+    del stored
+    np.save(os.path.join(directory, 'prices.npy'), np.asarray(prices, dtype=PRICE_DTYPE))
+
+
+def build_window_dataset(directory, data, pipeline, scaler, window_size, dtype=None):
+    """
+    Compute the features of raw candles, scale them chunk by chunk straight into the memory-mapped
+    feature file and return the dataset over it.
+
+    :param directory: Directory to write the dataset into.
+    :param data: DataFrame of raw candles.
+    :param pipeline: FeaturePipeline computing the scaler's features.
+    :param scaler: Fitted scaler.
+    :param window_size: Number of rows in each observation window.
+    :param dtype: Dtype of the stored features, 'float32' or 'float64' (default). Prices are stored in float64.
+    :return: WindowDataset over the written files.
+    """
+    dtype = resolve_dtype(dtype)
+    os.makedirs(directory, exist_ok=True)
+    features, _ = pipeline.transform(data)
+    stored = open_memmap(os.path.join(directory, 'features.npy'), mode='w+', dtype=dtype, shape=features.shape)
+    for start in range(0, len(features), WRITE_CHUNK_ROWS):
+        chunk = pd.DataFrame(features[start:start + WRITE_CHUNK_ROWS], columns=pipeline.features)
+        stored[start:start + len(chunk)] = scaler.transform(chunk)
+    stored.flush()
+    del stored
+    np.save(os.path.join(directory, 'prices.npy'), features[:, pipeline.features.index('close')].astype(PRICE_DTYPE))
+    return WindowDataset(directory, window_size)
+
+
+class WindowDataset:
+    """
+    Flattened observation windows over a memory-mapped feature file.
+
+    Window i is rows i to i + window_size - 1 of the features, flattened, exactly like
+    create_moving_windows(features)[i]. Rows are contiguous in the file, so every window is a view
+    of the mapping and only the pages actually read are loaded into memory. start and stop restrict
+    the dataset to a range of rows, e.g. to split one file into training and validation data.
+    """
+
+    def __init__(self, directory, window_size, mmap_mode='r', start=0, stop=None):
+        self.directory = directory
+        self.window_size = window_size
+        self.start = start
+        self.stop = stop
+        self.features = np.load(os.path.join(directory, 'features.npy'), mmap_mode=mmap_mode)[start:stop]
+        self.prices = np.load(os.path.join(directory, 'prices.npy'), mmap_mode=mmap_mode)[start:stop]
+        self.n_columns = self.features.shape[1]
+        self.observation_size = window_size * self.n_columns
+        self._flat = self.features.reshape(-1)
+
+    def __len__(self):
+        return max(len(self.features) - self.window_size + 1, 0)
+
+    @property
+    def shape(self):
+        return len(self), self.observation_size
+
+    @property
+    def dtype(self):
+        return self.features.dtype
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Window {i} out of range for {len(self)} windows.")
+        start = i * self.n_columns
+        return self._flat[start:start + self.observation_size]
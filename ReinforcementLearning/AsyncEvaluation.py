@@ -0,0 +1,187 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from Preprocessing.WindowDataset import WindowDataset
+from ReinforcementLearning.Backtest import backtest
+
+# Validation data of an evaluation worker process, set once by _init_evaluation_worker
+_validation = {}
+
+
+class RunningStats:
+    """
+    Running count, mean and variance of a stream of values in O(1) memory (Welford's algorithm).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        for value in np.ravel(values).tolist():
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count > 0 else 0.0
+
+    @property
+    def std(self):
+        return self.variance ** 0.5
+
+
+def _init_evaluation_worker(data, prices, window_size, dtype):
+    """
+    Worker: receive the validation data once. Window datasets are sent as their directory and row range and
+    memory-mapped again.
+    """
+    import torch
+    torch.set_num_threads(1)
+    if isinstance(data, tuple):
+        directory, start, stop = data
+        data = WindowDataset(directory, window_size, start=start, stop=stop)
+        prices = data.prices
+    _validation.update(data=data, prices=prices, window_size=window_size, dtype=dtype)
+
+
+def _evaluate_snapshot(algorithm, snapshot):
+    """
+    Worker: load a saved policy and backtest it on the validation data.
+    """
+    model = algorithm.load(io.BytesIO(snapshot), device='cpu')
+    result = backtest(model, _validation['data'], _validation['prices'], _validation['window_size'],
+                      _validation['dtype'])
+    return {name: result[name] for name in ['total_return', 'sharpe', 'max_drawdown', 'turnover', 'n_trades']}
+
+
+class AsyncEvaluationCallback(BaseCallback):
+    """
+    Evaluates the policy on held-out validation data in a background process and stops training when it
+    stops improving.
+
+    Every eval_freq steps the model is snapshotted to bytes and backtested by a worker process while
+    training continues. The best snapshot so far is saved to best_model_path, and training stops after
+    patience evaluation rounds without improvement of the metric. Training rewards are summarized with
+    running statistics instead of being stored.
+    """
+
+    def __init__(self, validation_data, validation_prices, window_size, dtype=None, eval_freq=10000,
+                 patience=10, metric='sharpe', min_delta=0.0, best_model_path='ppo_trading_model_short_best',
+                 mp_context=None, verbose=1):
+        """
+        :param validation_data: Validation observation windows, an array or a WindowDataset.
+        :param validation_prices: Validation close prices.
+        :param window_size: Number of rows in each observation window.
+        :param dtype: Dtype policy of the environment, 'float32' or 'float64' (default).
+        :param eval_freq: Number of callback calls (vectorized steps) between evaluations.
+        :param patience: Number of evaluation rounds without improvement before training stops.
+        :param metric: Backtest metric to maximize, e.g. 'sharpe' or 'total_return'.
+        :param min_delta: Minimum increase of the metric counted as an improvement.
+        :param best_model_path: Path the best snapshot is saved to, '.zip' is appended.
+        :param mp_context: multiprocessing context of the evaluation process, default is the platform's.
+        """
+        super(AsyncEvaluationCallback, self).__init__(verbose)
+        if isinstance(validation_data, WindowDataset):
+            # Only the directory and row range are pickled, the worker maps the files itself
+            validation_data = (validation_data.directory, validation_data.start, validation_data.stop)
+            validation_prices = None
+        self.worker_args = (validation_data, validation_prices, window_size, dtype)
+        self.eval_freq = eval_freq
+        self.patience = patience
+        self.metric = metric
+        self.min_delta = min_delta
+        self.best_model_path = best_model_path
+        self.mp_context = mp_context
+
+        self.reward_stats = RunningStats()  # Training rewards over the whole run
+        self.round_stats = RunningStats()  # Training rewards since the last evaluation
+        self.best_score = -np.inf
+        self.rounds_without_improvement = 0
+        self.evaluations = []  # (num_timesteps, metrics) of every finished evaluation
+        self.executor = None
+        self.pending = None  # (future, num_timesteps, snapshot) of the evaluation in progress
+        self.stop_training = False
+
+    def _on_training_start(self):
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=self.mp_context,
+                                            initializer=_init_evaluation_worker, initargs=self.worker_args)
+
+    def get_state(self):
+        """
+        Snapshot of the evaluation history for a training checkpoint. An evaluation still running is not kept.
+        """
+        return {'best_score': self.best_score, 'rounds_without_improvement': self.rounds_without_improvement,
+                'evaluations': list(self.evaluations), 'reward_stats': self.reward_stats,
+                'round_stats': self.round_stats}
+
+    def set_state(self, state):
+        self.best_score = state['best_score']
+        self.rounds_without_improvement = state['rounds_without_improvement']
+        self.evaluations = list(state['evaluations'])
+        self.reward_stats = state['reward_stats']
+        self.round_stats = state['round_stats']
+
+    def _on_step(self) -> bool:
+        rewards = self.locals.get('rewards')
+        if rewards is not None:
+            self.reward_stats.update(rewards)
+            self.round_stats.update(rewards)
+
+        if self.pending is not None and self.pending[0].done():
+            self._collect()
+
+        # At most one evaluation in flight, a round that comes due while one runs is skipped
+        if self.n_calls % self.eval_freq == 0 and self.pending is None:
+            buffer = io.BytesIO()
+            self.model.save(buffer)
+            snapshot = buffer.getvalue()
+            future = self.executor.submit(_evaluate_snapshot, type(self.model), snapshot)
+            self.pending = (future, self.num_timesteps, snapshot)
+
+        return not self.stop_training
+
+    def _collect(self):
+        future, timesteps, snapshot = self.pending
+        self.pending = None
+        metrics = future.result()
+        score = metrics[self.metric]
+        self.evaluations.append((timesteps, metrics))
+
+        self.logger.record('eval/' + self.metric, score)
+        self.logger.record('train/reward_mean', self.round_stats.mean)
+        self.logger.record('train/reward_std', self.round_stats.std)
+        self.round_stats = RunningStats()
+
+        if score > self.best_score + self.min_delta:
+            self.best_score = score
+            self.rounds_without_improvement = 0
+            # Written next to the target and renamed, so the best checkpoint is never half written
+            path = self.best_model_path + '.zip'
+            with open(path + '.tmp', 'wb') as f:
+                f.write(snapshot)
+            os.replace(path + '.tmp', path)
+        else:
+            self.rounds_without_improvement += 1
+
+        if self.verbose > 0:
+            print(f"Evaluation at {timesteps} steps: {self.metric} {score:.4f}, best {self.best_score:.4f}, "
+                  f"{self.rounds_without_improvement}/{self.patience} rounds without improvement")
+        if self.rounds_without_improvement >= self.patience:
+            if self.verbose > 0:
+                print(f"Early stopping triggered after {self.num_timesteps} steps")
+            self.stop_training = True
+
+    def _on_training_end(self):
+        # Wait for the last evaluation so its snapshot can still become the best checkpoint
+        if self.pending is not None:
+            self._collect()
+        self.executor.shutdown()
+        self.executor = None
@@ -0,0 +1,159 @@
+import numpy as np
+
+from Preprocessing.CreateTensors import create_moving_windows
+from Preprocessing.Precision import PRICE_DTYPE, resolve_dtype
+from Preprocessing.WindowDataset import WindowDataset
+from ReinforcementLearning.TradeLedger import BUY, COVER, SELL, SHORT, TradeLedger
+
+INITIAL_BALANCE = 25000
+
+
+def observation_steps(window_size, max_step):
+    """
+    Indices of the windows a TradingEnv episode from window_size to max_step observes before each step:
+    the reset observation, then the window of the previous step.
+    """
+    return np.concatenate(([window_size], np.arange(window_size, max_step - 1)))
+
+
+def policy_actions(model, windows, steps, batch_size=65536, deterministic=True):
+    """
+    Run the policy over the windows at the given steps in batches, gathering one batch at a time.
+
+    :param model: Trained stable-baselines3 model.
+    :param windows: Array of observation windows, e.g. from create_moving_windows.
+    :param steps: Indices of the windows to act on, in order.
+    :return: Integer array of len(steps) actions.
+    """
+    actions = np.empty(len(steps), dtype=np.int64)
+    for start in range(0, len(steps), batch_size):
+        batch = windows[steps[start:start + batch_size]]
+        actions[start:start + len(batch)], _ = model.predict(batch, deterministic=deterministic)
+    return actions
+
+
+def simulate_trades(actions, prices, start_step, initial_balance=INITIAL_BALANCE, hold_reward_scale=0.0):
+    """
+    Apply the buy/sell/short/cover/hold state machine of TradingEnv.step to a sequence of actions, the
+    first taken at start_step, liquidating the open position on the last step.
+
+    :param actions: Sequence of actions, 0: Buy, 1: Sell/Short, 2: Hold.
+    :param prices: Close prices indexed by step, as TradingEnv.prices.
+    :param hold_reward_scale: Share of the unrealized ROI rewarded on hold, as the TradingEnv argument.
+    :return: Tuple of (rewards array, TradeLedger with the equity curve and trades).
+    """
+    actions = np.asarray(actions).tolist()
+    prices = np.asarray(prices[start_step:start_step + len(actions)]).tolist()
+    rewards = np.zeros(len(actions))
+    ledger = TradeLedger(max(len(actions), 1))
+
+    # Same arithmetic as TradingEnv.step, on Python floats, so the results are identical
+    balance, stock_count, short_stock_count, buy_price, short_price = initial_balance, 0, 0, 0, 0
+    last = len(actions) - 1
+    for i, (action, current_price) in enumerate(zip(actions, prices)):
+        step = start_step + i
+        reward = 0
+        if action == 0:
+            if short_stock_count > 0:
+                balance -= short_stock_count * current_price
+                reward = (short_price - current_price) * short_stock_count / short_price
+                ledger.record_trade(step, current_price, COVER, short_stock_count)
+                short_stock_count = 0
+            elif stock_count == 0:
+                num_stocks = balance // current_price
+                if num_stocks > 0:
+                    stock_count = num_stocks
+                    balance -= stock_count * current_price
+                    buy_price = current_price
+                    ledger.record_trade(step, current_price, BUY, stock_count)
+        elif action == 1:
+            if stock_count > 0:
+                balance += stock_count * current_price
+                reward = (current_price - buy_price) * stock_count / buy_price
+                ledger.record_trade(step, current_price, SELL, stock_count)
+                stock_count = 0
+            elif short_stock_count == 0:
+                num_stocks = balance // current_price
+                if num_stocks > 0:
+                    short_stock_count = num_stocks
+                    balance += short_stock_count * current_price
+                    short_price = current_price
+                    ledger.record_trade(step, current_price, SHORT, short_stock_count)
+        elif action == 2:
+            if stock_count > 0:
+                reward = (current_price - buy_price) * stock_count / buy_price
+            elif short_stock_count > 0:
+                reward = (short_price - current_price) * short_stock_count / short_price
+            reward *= hold_reward_scale
+
+        if i == last:
+            if stock_count > 0:
+                balance += stock_count * current_price
+                reward += (current_price - buy_price) * stock_count / buy_price
+                ledger.record_trade(step, current_price, SELL, stock_count)
+                stock_count = 0
+            if short_stock_count > 0:
+                balance -= short_stock_count * current_price
+                reward += (short_price - current_price) * short_stock_count / short_price
+                ledger.record_trade(step, current_price, COVER, short_stock_count)
+                short_stock_count = 0
+
+        rewards[i] = reward
+        ledger.record_equity(balance + (stock_count * current_price) - (short_stock_count * current_price))
+    return rewards, ledger
+
+
+def performance_metrics(equity, trades, initial_balance=INITIAL_BALANCE, periods_per_year=252):
+    """
+    Summary statistics of an equity curve and its trades.
+
+    :param periods_per_year: Steps per year used to annualize the Sharpe ratio, 252 for daily candles.
+    :return: Dict with total_return, sharpe, max_drawdown, turnover and n_trades.
+    """
+    curve = np.concatenate(([initial_balance], equity))
+    returns = np.diff(curve) / curve[:-1]
+    volatility = returns.std()
+    peaks = np.maximum.accumulate(curve)
+    return {
+        'total_return': float(curve[-1] / initial_balance - 1),
+        'sharpe': float(returns.mean() / volatility * np.sqrt(periods_per_year)) if volatility > 0 else 0.0,
+        'max_drawdown': float(((peaks - curve) / peaks).max()),
+        # Traded value relative to the initial balance
+        'turnover': float((trades['price'] * trades['size']).sum() / initial_balance),
+        'n_trades': len(trades),
+    }
+
+
+def backtest(model, data, close_prices, window_size, dtype=None, batch_size=65536, periods_per_year=252,
+             hold_reward_scale=0.0):
+    """
+    Evaluate a trained model over a whole dataset without stepping an environment.
+
+    Observations do not depend on the actions, so the policy is run over the full observation sequence
+    of a TradingEnv episode in large batches, then the trades are simulated over the resulting actions.
+    The rewards, equity and trades equal a deterministic step-by-step rollout of TradingEnv.
+
+    :param model: Trained stable-baselines3 model.
+    :param data: Observation windows, an array or a WindowDataset, as passed to TradingEnv.
+    :param close_prices: Close prices, as passed to TradingEnv.
+    :param window_size: Number of rows in each observation window.
+    :param dtype: Dtype policy of the environment being reproduced, 'float32' or 'float64' (default).
+    :param hold_reward_scale: Hold reward of the environment being reproduced, it changes the rewards only.
+    :return: Dict with 'actions', 'rewards', 'equity', 'trades' and the performance_metrics.
+    """
+    # Observations and prices are converted exactly like TradingEnv converts them
+    dtype = resolve_dtype(dtype)
+    if isinstance(data, WindowDataset):
+        windows = create_moving_windows(data.features, window_size)
+    else:
+        windows = np.asarray(data, dtype=dtype)
+    prices = np.asarray(close_prices, dtype=PRICE_DTYPE)
+
+    steps = observation_steps(window_size, len(windows) - 1)
+    actions = policy_actions(model, windows, steps, batch_size)
+    rewards, ledger = simulate_trades(actions, prices, window_size, hold_reward_scale=hold_reward_scale)
+
+    result = {'actions': actions, 'rewards': rewards, 'equity': ledger.equity_curve,
+              'trades': ledger.trade_list}
+    result.update(performance_metrics(result['equity'], result['trades'], periods_per_year=periods_per_year))
+    return result
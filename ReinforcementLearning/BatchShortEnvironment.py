@@ -0,0 +1,180 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+from Preprocessing.Precision import PRICE_DTYPE, resolve_dtype
+from Preprocessing.WindowDataset import WindowDataset
+
+INITIAL_BALANCE = 25000
+
+
+class BatchTradingEnv(VecEnv):
+    """
+    N copies of TradingEnv stepped together as arrays.
+
+    Balances, long/short stock counts, entry prices and step indices are arrays of length num_envs and every
+    action (buy, sell, short, cover, hold) and the end-of-episode liquidation is applied to all environments
+    at once with masked NumPy operations. Each environment gives the same rewards as an independent
+    TradingEnv fed the same actions. Finished environments are reset automatically, as in DummyVecEnv,
+    with their last observation in info['terminal_observation'].
+    """
+
+    def __init__(self, data, close_prices, window_size, num_envs, dtype=None, sampler=None, hold_reward_scale=0.0):
+        # Observations and prices are stored exactly like TradingEnv stores them
+        self.dtype = resolve_dtype(dtype)
+        self.data = data if isinstance(data, WindowDataset) else np.asarray(data, dtype=self.dtype)
+        self.prices = np.asarray(close_prices, dtype=PRICE_DTYPE)
+        self.window_size = window_size
+        self.max_step = len(self.data) - 1
+        self.render_mode = None
+        # Optional EpisodeSampler, each environment draws its own episodes from it
+        self.sampler = sampler
+        # Share of the unrealized ROI rewarded on hold, 0 rewards only closed trades
+        self.hold_reward_scale = hold_reward_scale
+
+        # Per-environment trading variables
+        self.balance = np.full(num_envs, INITIAL_BALANCE, dtype=np.float64)
+        self.stock_count = np.zeros(num_envs)
+        self.short_stock_count = np.zeros(num_envs)
+        self.buy_price = np.zeros(num_envs)
+        self.short_price = np.zeros(num_envs)
+        self.current_step = np.full(num_envs, window_size, dtype=np.int64)
+        self.end_step = np.full(num_envs, self.max_step, dtype=np.int64)
+        self.actions = None
+
+        observation_space = spaces.Box(low=-1.0, high=1.0, shape=(self.data.shape[1],), dtype=np.float32)
+        super().__init__(num_envs, observation_space, spaces.Discrete(3))
+
+    def _reset_envs(self, mask):
+        self.balance[mask] = INITIAL_BALANCE
+        self.stock_count[mask] = 0
+        self.short_stock_count[mask] = 0
+        self.buy_price[mask] = 0
+        self.short_price[mask] = 0
+        if self.sampler is None:
+            self.current_step[mask] = self.window_size
+            return
+        for i in np.flatnonzero(mask):
+            self.current_step[i], self.end_step[i] = self.sampler.sample(self.window_size, self.max_step)
+
+    def _observations(self, rows):
+        if isinstance(self.data, WindowDataset):
+            return np.stack([self.data[row] for row in rows])
+        return self.data[rows]
+
+    def reset(self):
+        # Seeds set with seed() reseed the shared episode sampler, so the episodes that follow are reproducible.
+        # The seeds are consecutive, the first one gives the first environment the episode a GymnasiumTradingEnv
+        # reset with it would start
+        if self._seeds[0] is not None and self.sampler is not None:
+            self.sampler.rng = np.random.default_rng(self._seeds[0])
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        self._reset_seeds()
+        self._reset_options()
+        return self._observations(self.current_step)
+
+    def step_async(self, actions):
+        self.actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        actions = self.actions
+        # Current price is the price at each environment's current_step, balances are kept in float64
+        price = self.prices[self.current_step]
+        long = self.stock_count > 0
+        short = self.short_stock_count > 0
+
+        # Every branch is evaluated for all environments and selected with masks, divisions by the zero
+        # entry prices of environments without a position are discarded
+        with np.errstate(divide='ignore', invalid='ignore'):
+            num_stocks = self.balance // price
+            flat = ~long & ~short
+
+            # Buy: cover a short position, or open a long one when flat
+            cover = (actions == 0) & short
+            buy = (actions == 0) & flat & (num_stocks > 0)
+            # Sell/Short: sell a long position, or open a short one when flat
+            sell = (actions == 1) & long
+            open_short = (actions == 1) & flat & (num_stocks > 0)
+            # Hold is rewarded with a share of the unrealized ROI, none by default
+
+            short_value = self.short_stock_count * price
+            long_value = self.stock_count * price
+            short_return = (self.short_price - price) * self.short_stock_count / self.short_price
+            long_return = (price - self.buy_price) * self.stock_count / self.buy_price
+            reward = np.where(cover, short_return, np.where(sell, long_return, 0.0))
+            if self.hold_reward_scale != 0:
+                hold = actions == 2
+                reward = np.where(hold & long, long_return * self.hold_reward_scale,
+                                  np.where(hold & short, short_return * self.hold_reward_scale, reward))
+            self.balance = np.where(cover, self.balance - short_value, np.where(sell, self.balance + long_value,
+                                                                                self.balance))
+            self.short_stock_count = np.where(cover, 0.0, self.short_stock_count)
+            self.stock_count = np.where(sell, 0.0, self.stock_count)
+
+            self.stock_count = np.where(buy, num_stocks, self.stock_count)
+            self.balance = np.where(buy, self.balance - num_stocks * price, self.balance)
+            self.buy_price = np.where(buy, price, self.buy_price)
+            self.short_stock_count = np.where(open_short, num_stocks, self.short_stock_count)
+            self.balance = np.where(open_short, self.balance + num_stocks * price, self.balance)
+            self.short_price = np.where(open_short, price, self.short_price)
+
+            # Move to the next step and liquidate the environments reaching the end of their episode
+            self.current_step += 1
+            dones = self.current_step >= self.end_step
+            if dones.any():
+                liquidate_long = dones & (self.stock_count > 0)
+                liquidate_short = dones & (self.short_stock_count > 0)
+                long_return = (price - self.buy_price) * self.stock_count / self.buy_price
+                short_return = (self.short_price - price) * self.short_stock_count / self.short_price
+                self.balance = np.where(liquidate_long, self.balance + self.stock_count * price, self.balance)
+                reward = np.where(liquidate_long, reward + long_return, reward)
+                self.stock_count = np.where(liquidate_long, 0.0, self.stock_count)
+                self.balance = np.where(liquidate_short, self.balance - self.short_stock_count * price,
+                                        self.balance)
+                reward = np.where(liquidate_short, reward + short_return, reward)
+                self.short_stock_count = np.where(liquidate_short, 0.0, self.short_stock_count)
+
+        observations = self._observations(self.current_step - 1)
+        balances = self.balance + (self.stock_count * price) - (self.short_stock_count * price)
+        infos = [{"balance": balance} for balance in balances.tolist()]
+
+        # Reset finished environments, keeping their last observation like DummyVecEnv does
+        if dones.any():
+            for i in np.flatnonzero(dones):
+                infos[i]["terminal_observation"] = observations[i].copy()
+            self._reset_envs(dones)
+            observations[dones] = self._observations(self.current_step[dones])
+
+        return observations, reward, dones, infos
+
+    def close(self):
+        pass
+
+    def _indices(self, indices):
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name, indices=None):
+        # Attributes are shared by the batch, except the per-environment arrays which are indexed
+        value = getattr(self, attr_name)
+        if isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,):
+            return [value[i] for i in self._indices(indices)]
+        return [value for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        current = getattr(self, attr_name, None)
+        if isinstance(current, np.ndarray) and current.shape[:1] == (self.num_envs,):
+            for i in self._indices(indices):
+                current[i] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._indices(indices)]
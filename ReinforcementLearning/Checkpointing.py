@@ -0,0 +1,222 @@
+import glob
+import io
+import os
+import pickle
+import queue
+import random
+import threading
+
+import numpy as np
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+
+CHECKPOINT_PREFIX = 'checkpoint_'
+
+
+def _capture_rng():
+    return {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+
+
+def _restore_rng(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints to disk on a background thread, so saving does not stall training.
+
+    Each checkpoint is written next to its target and renamed once complete, so a crash never leaves a
+    half-written checkpoint under a checkpoint name. Only the keep_last newest checkpoints are kept.
+    """
+
+    def __init__(self, directory, keep_last=3, max_pending=2):
+        """
+        :param directory: Directory the checkpoints are written to.
+        :param keep_last: Number of checkpoints kept, older ones are deleted.
+        :param max_pending: Number of checkpoints waiting to be written before submit blocks.
+        """
+        self.directory = directory
+        self.keep_last = keep_last
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, timesteps, payload):
+        """
+        Queue the bytes of a checkpoint taken at timesteps for writing.
+        """
+        if self.error is not None:
+            raise self.error
+        self.queue.put((timesteps, payload))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except Exception as error:
+                self.error = error
+
+    def _write(self, timesteps, payload):
+        path = os.path.join(self.directory, f'{CHECKPOINT_PREFIX}{timesteps:012d}.pkl')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        for old_path in list_checkpoints(self.directory)[:-self.keep_last]:
+            os.remove(old_path)
+
+    def close(self):
+        """
+        Wait for the queued checkpoints to be written and stop the thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def list_checkpoints(directory):
+    """
+    Paths of the checkpoints in a directory, oldest first.
+    """
+    return sorted(glob.glob(os.path.join(directory, CHECKPOINT_PREFIX + '*.pkl')))
+
+
+def load_checkpoint(path):
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    missing = {'timesteps', 'total_timesteps', 'model', 'env_states', 'rng'} - set(checkpoint)
+    if missing:
+        raise ValueError(f"Checkpoint {path} is missing {sorted(missing)}.")
+    return checkpoint
+
+
+def latest_checkpoint(directory, verbose=1):
+    """
+    Newest checkpoint of a directory that loads, or None if there is none.
+    """
+    for path in reversed(list_checkpoints(directory)):
+        try:
+            return load_checkpoint(path)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError) as error:
+            if verbose > 0:
+                print(f"Skipping unreadable checkpoint {path}: {error}")
+    return None
+
+
+def load_checkpoint_model(algorithm, checkpoint, env, **kwargs):
+    """
+    The model of a checkpoint, with its optimizer state and timestep counter, attached to env.
+
+    :param algorithm: Algorithm class of the model, e.g. PPO.
+    """
+    return algorithm.load(io.BytesIO(checkpoint['model']), env=env, **kwargs)
+
+
+def remaining_timesteps(checkpoint):
+    """
+    Timesteps left of the run a checkpoint was taken in, to pass to learn with reset_num_timesteps=False.
+    """
+    return checkpoint['total_timesteps'] - checkpoint['timesteps']
+
+
+class TrainingCheckpointCallback(BaseCallback):
+    """
+    Saves periodic checkpoints from which training continues exactly as if it had not been interrupted.
+
+    A checkpoint holds the model with its optimizer state and timestep counter, the last observations,
+    the state of every environment (see TradingLogic.get_state), the Python, NumPy and torch random
+    states, the state of the given callbacks and any extra state such as the scaler. It is taken at the
+    start of a rollout, when the rollout buffer is empty and the update before it is done, serialized on
+    the training thread and written by a CheckpointWriter in the background.
+
+    To resume, load the model with load_checkpoint_model, create this callback with resume_from and the
+    same callbacks, and call learn(remaining_timesteps(checkpoint), reset_num_timesteps=False).
+    """
+
+    def __init__(self, directory='checkpoints', save_freq=100000, keep_last=3, callbacks=(), extra_state=None,
+                 resume_from=None, verbose=1):
+        """
+        :param directory: Directory the checkpoints are written to.
+        :param save_freq: Minimum number of timesteps between checkpoints.
+        :param keep_last: Number of checkpoints kept.
+        :param callbacks: Other callbacks of the run whose call counts, and get_state() if they have it,
+                          are checkpointed.
+        :param extra_state: Picklable object saved with every checkpoint, e.g. {'scaler': scaler}.
+        :param resume_from: Checkpoint restored when training starts.
+        """
+        super(TrainingCheckpointCallback, self).__init__(verbose)
+        self.directory = directory
+        self.save_freq = save_freq
+        self.keep_last = keep_last
+        self.callbacks = list(callbacks)
+        self.extra_state = extra_state
+        self.resume_from = resume_from
+        self.writer = None
+        self.last_saved = 0
+
+    def _on_training_start(self):
+        self.writer = CheckpointWriter(self.directory, self.keep_last)
+        self.last_saved = self.num_timesteps
+        if self.resume_from is not None:
+            self._restore(self.resume_from)
+            self.resume_from = None
+
+    def _on_rollout_start(self):
+        if self.num_timesteps - self.last_saved >= self.save_freq:
+            self._save()
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _save(self):
+        buffer = io.BytesIO()
+        self.model.save(buffer)
+        checkpoint = {
+            'timesteps': self.num_timesteps,
+            'total_timesteps': self.model._total_timesteps,
+            'model': buffer.getvalue(),
+            'last_obs': self.model._last_obs,
+            'last_episode_starts': self.model._last_episode_starts,
+            'env_states': self.training_env.env_method('get_state'),
+            'n_calls': self.n_calls,
+            'callbacks': [{'n_calls': callback.n_calls,
+                           'state': callback.get_state() if hasattr(callback, 'get_state') else None}
+                          for callback in self.callbacks],
+            'rng': _capture_rng(),
+            'extra_state': self.extra_state,
+        }
+        # Pickled here so later training cannot change the snapshot, the disk write happens in the background
+        self.writer.submit(self.num_timesteps, pickle.dumps(checkpoint))
+        self.last_saved = self.num_timesteps
+        if self.verbose > 0:
+            print(f"Checkpoint at {self.num_timesteps} steps queued")
+
+    def _restore(self, checkpoint):
+        # New environments (and their Monitor wrappers) must be reset once before their state is replaced
+        self.training_env.reset()
+        for index, state in enumerate(checkpoint['env_states']):
+            self.training_env.env_method('set_state', state, indices=[index])
+        self.model._last_obs = checkpoint['last_obs']
+        self.model._last_episode_starts = checkpoint['last_episode_starts']
+        self.n_calls = checkpoint['n_calls']
+        for callback, state in zip(self.callbacks, checkpoint['callbacks']):
+            callback.n_calls = state['n_calls']
+            if state['state'] is not None:
+                callback.set_state(state['state'])
+        self.last_saved = checkpoint['timesteps']
+        _restore_rng(checkpoint['rng'])
+        if self.verbose > 0:
+            print(f"Resumed from the checkpoint at {checkpoint['timesteps']} steps")
+
+    def _on_training_end(self):
+        self.writer.close()
+        self.writer = None
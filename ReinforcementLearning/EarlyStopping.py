@@ -9,6 +9,15 @@ class EarlyStoppingCallback(BaseCallback):
         self.counter = 0
         self.episode_rewards = []  # List to keep track of rewards
 
+    def get_state(self):
+        return {'best_mean_reward': self.best_mean_reward, 'counter': self.counter,
+                'episode_rewards': list(self.episode_rewards)}
+
+    def set_state(self, state):
+        self.best_mean_reward = state['best_mean_reward']
+        self.counter = state['counter']
+        self.episode_rewards = list(state['episode_rewards'])
+
     def _on_step(self) -> bool:
         # Append reward information to the list
         if self.locals.get('rewards') is not None:
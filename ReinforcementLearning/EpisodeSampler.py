@@ -0,0 +1,109 @@
+import numpy as np
+
+SAMPLING_MODES = ('full', 'random', 'stratified', 'regime', 'replay')
+
+
+def trend_regimes(prices, period=20, n_regimes=3):
+    """
+    Label every time step with a market regime from the trailing return over period steps, split into
+    n_regimes quantile buckets (e.g. falling, flat, rising for 3).
+
+    :param prices: Close prices, one per time step.
+    :return: Integer array of regime labels in [0, n_regimes), one per time step.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.zeros(len(prices))
+    returns[period:] = prices[period:] / prices[:-period] - 1
+    returns[:period] = returns[period] if len(prices) > period else 0
+    edges = np.quantile(returns, np.linspace(0, 1, n_regimes + 1)[1:-1])
+    return np.searchsorted(edges, returns, side='right')
+
+
+class EpisodeSampler:
+    """
+    Chooses where each TradingEnv episode starts and ends.
+
+    - 'full': every episode runs from window_size to the end of the data (the original behaviour).
+    - 'random': episodes of episode_length steps starting uniformly at random.
+    - 'stratified': the possible starts are split into strata of episode_length steps, and each cycle of
+      episodes visits every stratum once in random order, so rollouts cover the data evenly.
+    - 'regime': a regime is drawn uniformly first, then a start among the steps labelled with it,
+      so rare regimes are seen as often as common ones.
+    - 'replay': a recent_fraction of the episodes start among the last recent_steps possible starts, the
+      others uniformly over the whole history, so fine-tuning on new data keeps replaying the old.
+
+    The sampler owns its random generator, independent of any seed passed to the environment.
+    """
+
+    def __init__(self, mode='random', episode_length=1000, seed=None, regimes=None, recent_steps=None,
+                 recent_fraction=0.5):
+        """
+        :param mode: One of SAMPLING_MODES.
+        :param episode_length: Number of steps of an episode, ignored by 'full'.
+        :param seed: Seed of the sampler's random generator, or a numpy Generator.
+        :param regimes: Regime label of every time step, e.g. from trend_regimes, required by 'regime'.
+        :param recent_steps: Number of most recent starts counted as recent, required by 'replay'.
+        :param recent_fraction: Share of the episodes 'replay' starts among the recent steps.
+        """
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}', expected one of {list(SAMPLING_MODES)}.")
+        if mode == 'regime' and regimes is None:
+            raise ValueError("Regime sampling needs the regime label of every time step.")
+        if mode == 'replay' and recent_steps is None:
+            raise ValueError("Replay sampling needs the number of recent steps.")
+        self.mode = mode
+        self.episode_length = episode_length
+        self.rng = np.random.default_rng(seed)
+        self.regimes = None if regimes is None else np.asarray(regimes)
+        self.recent_steps = recent_steps
+        self.recent_fraction = recent_fraction
+        self._strata = []
+
+    def sample(self, first_step, last_step):
+        """
+        Draw the next episode within steps first_step to last_step.
+
+        :return: (start, end) where the episode starts at step start and is done once the step reaches end.
+        """
+        length = self.episode_length
+        if self.mode == 'full' or length >= last_step - first_step:
+            return first_step, last_step
+        n_starts = last_step - length - first_step + 1
+
+        if self.mode == 'random':
+            offset = self.rng.integers(n_starts)
+        elif self.mode == 'stratified':
+            if not self._strata:
+                self._strata = list(self.rng.permutation(-(-n_starts // length)))
+            stratum = self._strata.pop()
+            offset = self.rng.integers(stratum * length, min((stratum + 1) * length, n_starts))
+        elif self.mode == 'replay':
+            recent = self.rng.random() < self.recent_fraction
+            offset = self.rng.integers(max(n_starts - self.recent_steps, 0) if recent else 0, n_starts)
+        else:
+            labels = self.regimes[first_step:first_step + n_starts]
+            regime = self.rng.choice(np.unique(labels))
+            offset = self.rng.choice(np.flatnonzero(labels == regime))
+
+        start = first_step + int(offset)
+        return start, start + length
+
+    def get_state(self):
+        """
+        Snapshot of the random generator and the strata left in the current cycle.
+        """
+        return {'rng': self.rng.bit_generator.state, 'strata': list(self._strata)}
+
+    def set_state(self, state):
+        """
+        Restore a snapshot from get_state, so the sampler draws the same episodes it would have.
+        """
+        self.rng.bit_generator.state = state['rng']
+        self._strata = list(state['strata'])
+
+    def spawn(self, n):
+        """
+        n samplers with the same settings and independent random generators, e.g. one per worker.
+        """
+        return [EpisodeSampler(self.mode, self.episode_length, rng, self.regimes, self.recent_steps,
+                               self.recent_fraction) for rng in self.rng.spawn(n)]
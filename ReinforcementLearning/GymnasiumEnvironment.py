@@ -0,0 +1,48 @@
+import numpy as np
+import gymnasium
+from gymnasium import spaces
+
+from ReinforcementLearning.TradingLogic import TradingLogic
+
+
+class GymnasiumTradingEnv(TradingLogic, gymnasium.Env):
+    """
+    TradingEnv as a native gymnasium environment, so stable-baselines3 steps it without the
+    compatibility wrapper the legacy gym class needs.
+
+    Trading and rewards are the same as TradingEnv. reset takes a seed and returns (observation, info),
+    step returns (observation, reward, terminated, truncated, info): an episode is terminated at the end of
+    the data and truncated when an EpisodeSampler ends it earlier. Observations are returned in the
+    declared dtype of the observation space, float32 by default.
+    """
+
+    metadata = {"render_modes": []}
+
+    def __init__(self, data, close_prices, window_size, dtype='float32', sampler=None, hold_reward_scale=0.0):
+        super().__init__()
+        self._setup_trading(data, close_prices, window_size, dtype, sampler, hold_reward_scale)
+
+        # 0: Buy, 1: Sell/Short, 2: Hold
+        self.action_space = spaces.Discrete(3)
+        # Scaled features are unbounded, unlike the [-1, 1] box the legacy environment declares
+        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(self.data.shape[1],), dtype=self.dtype)
+
+    def _observation(self, index):
+        # Windows are read-only views of data already stored in self.dtype, returned without a copy. The data
+        # is never written, and vectorized environments copy observations into their own buffers
+        return np.asarray(self.data[index], dtype=self.dtype)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        # A seeded reset also reseeds the episode sampler, so the episodes that follow are reproducible
+        if seed is not None and self.sampler is not None:
+            self.sampler.rng = np.random.default_rng(seed)
+        self._reset_trading()
+        return self._observation(self.current_step), {}
+
+    def step(self, action):
+        reward, done, balance = self._trade(action)
+        # Episodes cut short by the sampler are truncated, reaching the end of the data terminates them
+        truncated = done and self.end_step < self.max_step
+        terminated = done and not truncated
+        return self._observation(self.current_step - 1), float(reward), terminated, truncated, {"balance": balance}
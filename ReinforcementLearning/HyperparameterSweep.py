@@ -0,0 +1,262 @@
+import csv
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from stable_baselines3 import PPO
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.utils import set_random_seed
+
+from Preprocessing.CreateTensors import create_moving_windows
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.Precision import PRICE_DTYPE, resolve_dtype
+from Preprocessing.SharedArray import SharedArray
+from ReinforcementLearning.Backtest import backtest
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+
+# Configuration keys read by the sweep, every other key is passed to PPO
+ENVIRONMENT_KEYS = ('window_size', 'features', 'hold_reward_scale')
+DEFAULT_CONFIGURATION = {'window_size': 15, 'features': tuple(FEATURE_COLUMNS), 'hold_reward_scale': 0.0}
+
+# Shared data of a sweep worker process, set once by _init_sweep_worker
+_worker = {}
+
+
+def grid_configurations(space):
+    """
+    Every combination of a search space.
+
+    :param space: Dict of configuration key -> list of values to try.
+    :return: List of configuration dicts.
+    """
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+
+
+def random_configurations(space, n_trials, seed=None):
+    """
+    n_trials configurations drawn uniformly from a search space.
+
+    :param space: Dict of configuration key -> list of values to try.
+    """
+    rng = np.random.default_rng(seed)
+    return [{key: values[rng.integers(len(values))] for key, values in space.items()} for _ in range(n_trials)]
+
+
+class MedianPruner:
+    """
+    Prunes a trial whose intermediate validation score is below the median of the other trials' scores
+    at the same evaluation round.
+    """
+
+    def __init__(self, n_startup_trials=3, n_warmup_rounds=1):
+        """
+        :param n_startup_trials: Number of other trials' scores needed at a round before pruning there.
+        :param n_warmup_rounds: Number of evaluation rounds of a trial that are never pruned.
+        """
+        self.n_startup_trials = n_startup_trials
+        self.n_warmup_rounds = n_warmup_rounds
+
+    def should_prune(self, round_index, score, other_scores):
+        if round_index < self.n_warmup_rounds or len(other_scores) < self.n_startup_trials:
+            return False
+        return score < np.median(other_scores)
+
+
+class _PruningCallback(BaseCallback):
+    """
+    Backtests the policy on the validation data every eval_freq steps, reports the score to the other
+    trials and stops training when the pruner decides the trial is unpromising.
+    """
+
+    def __init__(self, trial, evaluate, eval_freq, pruner, reports, verbose=0):
+        super(_PruningCallback, self).__init__(verbose)
+        self.trial = trial
+        self.evaluate = evaluate
+        self.eval_freq = eval_freq
+        self.pruner = pruner
+        self.reports = reports  # Shared list of (trial, round, score) of every trial
+        self.scores = []
+        self.pruned = False
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.eval_freq != 0:
+            return True
+        round_index = len(self.scores)
+        score = self.evaluate(self.model)
+        self.scores.append(score)
+        other_scores = [other_score for trial, other_round, other_score in list(self.reports)
+                        if other_round == round_index and trial != self.trial]
+        self.reports.append((self.trial, round_index, score))
+        if self.pruner is not None and self.pruner.should_prune(round_index, score, other_scores):
+            self.pruned = True
+            return False
+        return True
+
+
+def _init_sweep_worker(features_spec, prices_spec, n_training_rows, feature_names, reports, cpu_slots, dtype):
+    """
+    Worker: attach to the shared features, and pin the process to its own CPUs and torch to as many threads.
+    """
+    import torch
+    cpus = cpu_slots.get()
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(len(cpus))
+    _worker.update(features=SharedArray.attach(features_spec), prices=SharedArray.attach(prices_spec),
+                   n_training_rows=n_training_rows, feature_names=feature_names, reports=reports, dtype=dtype)
+
+
+def _run_trial(trial, configuration, total_timesteps, eval_freq, metric, pruner, seed):
+    """
+    Worker: train and validate one configuration on the shared features.
+
+    :return: Result row of the trial.
+    """
+    start = time.perf_counter()
+    configuration = dict(DEFAULT_CONFIGURATION, **configuration)
+    window_size = configuration['window_size']
+    columns = [_worker['feature_names'].index(feature) for feature in configuration['features']]
+    ppo_kwargs = {key: value for key, value in configuration.items() if key not in ENVIRONMENT_KEYS}
+    dtype = _worker['dtype']
+
+    # Only this trial's columns are copied out of the shared features, the windows are views of the copy
+    split = _worker['n_training_rows']
+    features = _worker['features'].array[:, columns]
+    prices = _worker['prices'].array
+    training_env = GymnasiumTradingEnv(create_moving_windows(features[:split], window_size), prices[:split],
+                                       window_size, dtype, hold_reward_scale=configuration['hold_reward_scale'])
+    validation_windows = create_moving_windows(features[split:], window_size)
+
+    def evaluate(model):
+        return float(backtest(model, validation_windows, prices[split:], window_size, dtype,
+                              hold_reward_scale=configuration['hold_reward_scale'])[metric])
+
+    set_random_seed(seed + trial)
+    model = PPO("MlpPolicy", training_env, verbose=0, **ppo_kwargs)
+    callback = _PruningCallback(trial, evaluate, eval_freq, pruner, _worker['reports'])
+    model.learn(total_timesteps=total_timesteps, callback=callback)
+    score = callback.scores[-1] if callback.pruned else evaluate(model)
+
+    return {'trial': trial, 'status': 'pruned' if callback.pruned else 'complete', 'score': score,
+            'timesteps': model.num_timesteps, 'runtime_s': round(time.perf_counter() - start, 3),
+            **{key: '|'.join(value) if key == 'features' else value for key, value in configuration.items()}}
+
+
+class HyperparameterSweep:
+    """
+    Trains PPO on TradingEnv for a list of configurations in parallel worker processes and records the
+    validation score and runtime of every trial.
+
+    A configuration sets PPO keyword arguments (e.g. learning_rate, n_steps, gamma, ent_coef) and
+    window_size, the features observed (the indicator set) and hold_reward_scale (the reward variant),
+    anything left out keeps the TrainShortBot default. The union of the features of all configurations
+    is computed once, scaled on the training data and placed in shared memory, every trial reads its
+    columns from there. Each worker is pinned to its own CPUs. Trials whose intermediate validation
+    score falls below the median of the others are pruned.
+    """
+
+    def __init__(self, training_data, validation_data, configurations, dtype='float32'):
+        """
+        :param training_data: DataFrame of raw training candles.
+        :param validation_data: DataFrame of raw validation candles, following the training candles.
+        :param configurations: List of configuration dicts, e.g. from grid_configurations.
+        :param dtype: Dtype of the shared features and the environments, 'float32' or 'float64'.
+        """
+        self.configurations = [dict(configuration) for configuration in configurations]
+        self.dtype = resolve_dtype(dtype)
+        self.feature_names = []
+        for configuration in self.configurations:
+            for feature in configuration.get('features', DEFAULT_CONFIGURATION['features']):
+                if feature not in self.feature_names:
+                    self.feature_names.append(feature)
+
+        # The scaler is fitted per column, so scaling the union once equals scaling each subset
+        pipeline = FeaturePipeline(self.feature_names)
+        training_features, _ = pipeline.transform(training_data)
+        validation_features, _ = pipeline.transform(validation_data)
+        scaler = StandardScaler().fit(training_features)
+        self.n_training_rows = len(training_features)
+        features = np.concatenate([scaler.transform(training_features), scaler.transform(validation_features)])
+        prices = np.concatenate([np.asarray(training_data.sort_index()['close']),
+                                 np.asarray(validation_data.sort_index()['close'])])
+        self.features = SharedArray.from_array(features.astype(self.dtype))
+        self.prices = SharedArray.from_array(prices.astype(PRICE_DTYPE))
+
+    def run(self, total_timesteps=100000, eval_freq=10000, n_workers=None, threads_per_trial=1, metric='sharpe',
+            pruner=None, results_path='sweep_results.csv', seed=0, mp_context=None, verbose=1):
+        """
+        Run every configuration, at most n_workers at a time.
+
+        :param total_timesteps: Training steps of a trial that is not pruned.
+        :param eval_freq: Number of steps between intermediate validation scores.
+        :param n_workers: Number of trials run at once, default as many as the CPUs allow.
+        :param threads_per_trial: Number of CPUs, and torch threads, of each worker.
+        :param metric: Backtest metric to maximize, e.g. 'sharpe' or 'total_return'.
+        :param pruner: Pruner deciding on the intermediate scores, default MedianPruner(), False for none.
+        :param results_path: CSV file written anew, with a row added as each trial finishes.
+        :param seed: Seed of the first trial, trial i uses seed + i.
+        :param mp_context: multiprocessing context of the workers, default is the platform's.
+        :return: DataFrame of the results, best score first.
+        """
+        pruner = MedianPruner() if pruner is None else pruner or None
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+        if n_workers is None:
+            n_workers = max(len(cpus) // threads_per_trial, 1)
+        mp_context = mp_context or multiprocessing.get_context()
+
+        # One slot of CPUs per worker, taken by the worker as it starts. More workers than CPUs share them
+        cpu_slots = mp_context.Queue()
+        for worker in range(n_workers):
+            cpu_slots.put([cpus[(worker * threads_per_trial + i) % len(cpus)] for i in range(threads_per_trial)])
+
+        # Columns of the results table: the outcome, then every configuration key of any trial
+        fieldnames = ['trial', 'status', 'score', 'timesteps', 'runtime_s']
+        for configuration in self.configurations:
+            for key in dict(DEFAULT_CONFIGURATION, **configuration):
+                if key not in fieldnames:
+                    fieldnames.append(key)
+        if os.path.dirname(results_path):
+            os.makedirs(os.path.dirname(results_path), exist_ok=True)
+
+        results = []
+        with open(results_path, 'w', newline='') as results_file, mp_context.Manager() as manager:
+            writer = csv.DictWriter(results_file, fieldnames=fieldnames)
+            writer.writeheader()
+            reports = manager.list()
+            initargs = (self.features.spec, self.prices.spec, self.n_training_rows, self.feature_names, reports,
+                        cpu_slots, self.dtype.name)
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context, initializer=_init_sweep_worker,
+                                     initargs=initargs) as executor:
+                futures = {executor.submit(_run_trial, trial, configuration, total_timesteps, eval_freq, metric,
+                                           pruner, seed): trial
+                           for trial, configuration in enumerate(self.configurations)}
+                for future in as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+                    writer.writerow(result)
+                    results_file.flush()
+                    if verbose > 0:
+                        print(f"Trial {result['trial']} {result['status']}: {metric} {result['score']:.4f} "
+                              f"after {result['timesteps']} steps in {result['runtime_s']:.1f}s")
+
+        return pd.DataFrame(results).sort_values('score', ascending=False, ignore_index=True)
+
+    def close(self):
+        """
+        Free the shared features.
+        """
+        self.features.close()
+        self.prices.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,215 @@
+import os
+
+import numpy as np
+import pandas as pd
+from stable_baselines3 import PPO
+
+from Preprocessing.ChunkedFeatures import ChunkedFeaturePipeline, iter_frame_chunks
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS
+from Preprocessing.NpyWriter import AppendableNpy
+from Preprocessing.Precision import PRICE_DTYPE, resolve_dtype, scale_features
+from Preprocessing.WindowDataset import WindowDataset
+from ReinforcementLearning.Backtest import backtest
+from ReinforcementLearning.EpisodeSampler import EpisodeSampler
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+
+# Candles run through the pipeline at a time when the store is built from the whole history
+BOOTSTRAP_CHUNK_ROWS = 100000
+
+
+class IncrementalFeatureStore:
+    """
+    Scaled features and close prices of the whole history, kept as a window dataset directory that only
+    the features of new candles are appended to.
+
+    The indicator state of ChunkedFeaturePipeline is saved after every update, so new candles continue
+    the series exactly as if the history had been computed in one pass. The scaler is fixed: if a
+    different one is given, for example after a full retrain, the store is rebuilt from the history.
+
+    trained_rows counts the rows the saved model has been trained on: when the store is built, the rows of
+    candles before trained_until, then advanced by incremental_retrain. The rows after them are pending_rows.
+    """
+
+    def __init__(self, directory, scaler, dtype=None, trained_until=None):
+        """
+        :param directory: Directory of 'features.npy', 'prices.npy' and the pipeline state.
+        :param scaler: Fitted scaler of FEATURE_COLUMNS the model was trained with.
+        :param trained_until: Timestamp, naive UTC like the candles, ending the data the saved model was
+                              trained on. Used when the store is built, default counts every row as trained.
+        :param dtype: Dtype of the stored features, 'float32' or 'float64' (default). Prices are stored in float64.
+        """
+        self.directory = directory
+        self.scaler = scaler
+        self.dtype = resolve_dtype(dtype)
+        self.trained_until = trained_until
+        self.pipeline = ChunkedFeaturePipeline()
+        self.state_path = os.path.join(directory, 'pipeline_state.npz')
+        self.rows = 0
+        self.trained_rows = 0
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + '.npy')
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        state = np.load(self.state_path, allow_pickle=False)
+        if not (np.array_equal(state['scaler_mean'], self.scaler.mean_)
+                and np.array_equal(state['scaler_scale'], self.scaler.scale_)):
+            print("Scaler changed since the features were stored, rebuilding them")
+            return
+        if np.load(self._path('prices'), mmap_mode='r').dtype != PRICE_DTYPE:
+            print("Prices were stored in a lower precision, rebuilding the store")
+            return
+        self.pipeline.set_state(state)
+        self.rows = self.pipeline.rows
+        self.trained_rows = int(state['trained_rows']) if 'trained_rows' in state else self.rows
+        # Rows appended after the last saved state belong to an interrupted update
+        for name in ['features', 'prices']:
+            with AppendableNpy(self._path(name), self._row_shape(name), self._dtype(name), mode='a') as output:
+                output.truncate(self.rows)
+
+    def _row_shape(self, name):
+        return (len(FEATURE_COLUMNS),) if name == 'features' else ()
+
+    def _dtype(self, name):
+        return self.dtype if name == 'features' else PRICE_DTYPE
+
+    @property
+    def pending_rows(self):
+        """
+        Number of rows appended since the saved model was last trained.
+        """
+        return self.rows - self.trained_rows
+
+    @property
+    def last_timestamp(self):
+        """
+        Timestamp of the last stored candle, or None if the store is empty.
+        """
+        return pd.Timestamp(self.pipeline.last_index) if self.pipeline.last_index is not None else None
+
+    def update(self, candles):
+        """
+        Append the features of the candles later than the last stored one, computing only those.
+
+        :param candles: DataFrame of raw candles, may overlap the stored history.
+        :return: Number of new rows.
+        """
+        candles = candles.sort_index()
+        mode = 'a'
+        bootstrap = self.rows == 0
+        if bootstrap:
+            # Nothing usable stored, the whole history is computed once
+            self.pipeline.reset()
+            mode = 'w'
+            chunks = iter_frame_chunks(candles, BOOTSTRAP_CHUNK_ROWS)
+        else:
+            chunks = [candles[candles.index > self.last_timestamp]]
+
+        os.makedirs(self.directory, exist_ok=True)
+        new_rows = 0
+        with AppendableNpy(self._path('features'), self._row_shape('features'), self.dtype, mode=mode) as features, \
+                AppendableNpy(self._path('prices'), (), PRICE_DTYPE, mode=mode) as prices:
+            for chunk in chunks:
+                rows = self.pipeline.transform_chunk(chunk)
+                if len(rows) == 0:
+                    continue
+                features.append(scale_features(self.scaler, pd.DataFrame(rows, columns=FEATURE_COLUMNS), self.dtype))
+                prices.append(rows[:, FEATURE_COLUMNS.index('close')])
+                new_rows += len(rows)
+
+        # The state is saved after the rows, so a crash in between is undone by the truncation on the next load
+        self.rows = self.pipeline.rows
+        if bootstrap:
+            # Candles after the end of the saved model's training data, e.g. those that arrived since the last
+            # full retrain, are left pending. One row is stored per candle
+            self.trained_rows = self.rows if self.trained_until is None else \
+                int((candles.index < pd.Timestamp(self.trained_until)).sum())
+        self._save_state()
+        return new_rows
+
+    def mark_trained(self, rows):
+        """
+        Record that the saved model has now been trained on the first rows rows.
+        """
+        self.trained_rows = rows
+        self._save_state()
+
+    def _save_state(self):
+        state = dict(self.pipeline.get_state(), scaler_mean=self.scaler.mean_, scaler_scale=self.scaler.scale_,
+                     trained_rows=self.trained_rows)
+        with open(self.state_path + '.tmp', 'wb') as f:
+            np.savez(f, **state)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def dataset(self, window_size, start=0, stop=None):
+        """
+        WindowDataset over a row range of the stored features.
+        """
+        return WindowDataset(self.directory, window_size, start=start, stop=stop)
+
+
+def incremental_retrain(store, model_path='ppo_trading_model_short', window_size=15, algorithm=PPO,
+                        validation_rows=100, min_validation_rows=20, episode_length=100, recent_fraction=0.5,
+                        budget=20000, metric='sharpe', min_delta=0.0, seed=None, verbose=1):
+    """
+    Fine-tune the saved model on the rows it has not been trained on, for a bounded budget, and replace
+    it only if it does better out of sample.
+
+    The pending rows of the store are split in two: the later half, at most validation_rows rows, is held
+    out and the earlier part is trained on. Training episodes of episode_length steps are replayed from
+    every row before the held-out ones, a recent_fraction of them starting on the new rows trained on and
+    the others anywhere in the history. Both the saved model and the fine-tuned one are backtested on the
+    held-out rows, which neither has seen, and the fine-tuned model overwrites the saved one only if it
+    beats it by min_delta. The held-out rows stay pending, so they are trained on by the next run.
+
+    Until the held-out half would reach min_validation_rows nothing is trained and the new rows keep
+    accumulating, e.g. with daily candles the first fine-tune happens after 2 * min_validation_rows days.
+    The cost depends on the budget and the held-out rows, not on the length of the history.
+
+    :param store: IncrementalFeatureStore, updated with the new candles.
+    :param model_path: Path of the saved model, without '.zip'.
+    :param budget: Number of fine-tuning steps.
+    :param metric: Backtest metric compared, e.g. 'sharpe' or 'total_return'.
+    :return: Dict with the old and new score, whether the new model was promoted, the steps trained and the
+             rows trained on and held out, or with 'skipped' if there are too few pending rows.
+    """
+    new_rows = store.pending_rows
+    held_out = min(validation_rows, new_rows // 2)
+    if held_out < min_validation_rows:
+        if verbose > 0:
+            print(f"{new_rows} pending rows, waiting for {2 * min_validation_rows} before fine-tuning")
+        return {'skipped': True, 'pending_rows': new_rows}
+    split = store.rows - held_out
+    if split < 2 * window_size + 2:
+        raise ValueError(f"{store.rows} stored rows are too few to hold out {held_out} rows.")
+    training_dataset = store.dataset(window_size, stop=split)
+    # The first window is taken from the rows before the held-out ones, so every held-out row is traded
+    validation_dataset = store.dataset(window_size, start=split - window_size)
+
+    sampler = EpisodeSampler('replay', episode_length, seed, recent_steps=new_rows - held_out,
+                             recent_fraction=recent_fraction)
+    env = GymnasiumTradingEnv(training_dataset, training_dataset.prices, window_size, store.dtype, sampler)
+    model = algorithm.load(model_path, env=env)
+
+    def score(model):
+        result = backtest(model, validation_dataset, validation_dataset.prices, window_size, store.dtype)
+        return float(result[metric])
+
+    old_score = score(model)
+    model.learn(total_timesteps=budget, reset_num_timesteps=False)
+    new_score = score(model)
+
+    promoted = new_score > old_score + min_delta
+    if promoted:
+        # Saved next to the model and renamed, so the model is never half written
+        model.save(model_path + '_candidate')
+        os.replace(model_path + '_candidate.zip', model_path + '.zip')
+        store.mark_trained(split)
+    if verbose > 0:
+        print(f"Validation {metric} over {held_out} held-out rows: saved model {old_score:.4f}, "
+              f"fine-tuned {new_score:.4f}, {'promoted' if promoted else 'kept the saved model'}")
+    return {'old_score': old_score, 'new_score': new_score, 'promoted': promoted, 'timesteps': budget,
+            'trained_new_rows': new_rows - held_out, 'held_out_rows': held_out}
@@ -0,0 +1,99 @@
+from functools import partial
+
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+from Preprocessing.CreateTensors import create_moving_windows
+from Preprocessing.Precision import PRICE_DTYPE, resolve_dtype
+from Preprocessing.SharedArray import SharedArray
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+
+
+def shard_bounds(n_rows, n_shards, window_size):
+    """
+    Split a series of n_rows feature rows into n_shards contiguous shards of about equal length.
+    Consecutive shards overlap by window_size - 1 rows so every window of the series belongs to one shard.
+
+    :return: List of (start, end) row ranges.
+    """
+    n_windows = n_rows - window_size + 1
+    edges = np.linspace(0, n_windows, n_shards + 1).astype(int)
+    bounds = [(int(start), int(end) + window_size - 1) for start, end in zip(edges[:-1], edges[1:])]
+    # TradingEnv starts at window_size and needs at least one step before the end of its data
+    shortest = min(end - start for start, end in bounds) - window_size + 1
+    if shortest < window_size + 2:
+        raise ValueError(f"{n_rows} rows are too few for {n_shards} shards of windows of {window_size} rows.")
+    return bounds
+
+
+def _make_shard_env(features_spec, prices_spec, start, end, window_size, dtype, sampler=None):
+    """
+    Worker: build a GymnasiumTradingEnv over rows start to end of the shared features and prices.
+    """
+    features = SharedArray.attach(features_spec)
+    prices = SharedArray.attach(prices_spec)
+    windows = create_moving_windows(features.array[start:end], window_size)
+    env = GymnasiumTradingEnv(windows, prices.array[start:end], window_size, dtype, sampler)
+    # The windows are views of the shared blocks, keep the mappings open for the life of the environment
+    env.shared_arrays = (features, prices)
+    return env
+
+
+class SharedMarketData:
+    """
+    Scaled features and close prices placed once in shared memory, for TradingEnv workers in other processes.
+
+    Each worker attaches to the shared blocks and builds its windows as views of them, so the market data
+    is neither pickled into the workers nor copied per process. The series is split into date shards,
+    one per worker. The process creating this object owns the blocks and frees them on close.
+    """
+
+    def __init__(self, features, prices, window_size, dtype=None):
+        """
+        :param features: Array or DataFrame of scaled features, one row per time step.
+        :param prices: Close prices, one per time step.
+        :param window_size: Number of rows in each observation window.
+        :param dtype: Dtype of the shared features, 'float32' or 'float64' (default). Prices stay in float64.
+        """
+        self.dtype = resolve_dtype(dtype)
+        self.window_size = window_size
+        self.features = SharedArray.from_array(np.ascontiguousarray(features, dtype=self.dtype))
+        self.prices = SharedArray.from_array(np.asarray(prices, dtype=PRICE_DTYPE))
+
+    def env_fns(self, n_workers, sampler=None):
+        """
+        Picklable environment factories, one per date shard, e.g. for SubprocVecEnv.
+
+        :param sampler: Optional EpisodeSampler, every worker gets an independent copy for its shard.
+        """
+        bounds = shard_bounds(len(self.features.array), n_workers, self.window_size)
+        samplers = [None] * n_workers if sampler is None else sampler.spawn(n_workers)
+        for shard_sampler, (start, end) in zip(samplers, bounds):
+            if shard_sampler is not None and shard_sampler.regimes is not None:
+                shard_sampler.regimes = shard_sampler.regimes[start:end]
+        return [partial(_make_shard_env, self.features.spec, self.prices.spec, start, end, self.window_size,
+                        self.dtype.name, shard_sampler)
+                for shard_sampler, (start, end) in zip(samplers, bounds)]
+
+    def make_vec_env(self, n_workers, start_method=None, sampler=None):
+        """
+        Start n_workers processes, each stepping a TradingEnv over its own date shard.
+
+        :param sampler: Optional EpisodeSampler, every worker gets an independent copy for its shard.
+        :param start_method: multiprocessing start method, default is SubprocVecEnv's ('forkserver' where
+                             available). Scripts that run at import and have no __main__ guard need 'fork'.
+        """
+        return SubprocVecEnv(self.env_fns(n_workers, sampler), start_method=start_method)
+
+    def close(self):
+        """
+        Free the shared blocks. Close the vectorized environments using them first.
+        """
+        self.features.close()
+        self.prices.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,110 @@
+import cProfile
+import json
+import os
+import time
+
+import psutil
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+class ProfilingCallback(BaseCallback):
+    """
+    Records where training time goes, one JSON line per rollout/update iteration:
+
+    - timesteps, elapsed: total environment steps and wall-clock seconds since training started
+    - rollout_s, steps_per_sec: time spent collecting the rollout and its environment steps per second
+    - update_s: time of the gradient update that followed the rollout
+    - rss_mb, cpu_percent: resident memory and CPU utilization of the process over the iteration
+
+    Measurements are taken at rollout boundaries only, so the per-step cost is a single method call.
+    Optionally a cProfile dump is written for a window of timesteps.
+    """
+
+    def __init__(self, log_path='logs/training_profile.jsonl', profile_window=None,
+                 profile_path='logs/training_profile.prof', verbose=0):
+        """
+        :param log_path: JSON lines file the iterations are appended to.
+        :param profile_window: Optional (start, end) timesteps between which cProfile runs.
+        :param profile_path: Path of the cProfile dump, readable with pstats or snakeviz.
+        """
+        super(ProfilingCallback, self).__init__(verbose)
+        self.log_path = log_path
+        self.profile_window = profile_window
+        self.profile_path = profile_path
+        self.profiler = None
+        self.profiled = False
+        self.log_file = None
+        self.process = psutil.Process()
+
+    def _on_training_start(self):
+        if os.path.dirname(self.log_path):
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self.log_file = open(self.log_path, 'a')
+        self.training_start = time.perf_counter()
+        self.iteration_start = self.training_start
+        self.iteration_cpu = sum(self.process.cpu_times()[:2])
+        self.rollout_start = None
+        self.rollout_end = None
+        self.rollout_timesteps = self.num_timesteps
+
+    def _on_rollout_start(self):
+        now = time.perf_counter()
+        # The gap since the last rollout ended is the update that followed it
+        if self.rollout_end is not None:
+            self._write(now)
+        self.rollout_start = now
+        self.rollout_timesteps = self.num_timesteps
+
+    def _on_rollout_end(self):
+        self.rollout_end = time.perf_counter()
+        self.rollout_steps = self.num_timesteps - self.rollout_timesteps
+
+    def _on_step(self) -> bool:
+        if self.profile_window is not None and not self.profiled:
+            self._update_profiler()
+        return True
+
+    def _update_profiler(self):
+        start, end = self.profile_window
+        if self.profiler is None and start <= self.num_timesteps < end:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profiler is not None and self.num_timesteps >= end:
+            self._dump_profile()
+
+    def _dump_profile(self):
+        self.profiler.disable()
+        if os.path.dirname(self.profile_path):
+            os.makedirs(os.path.dirname(self.profile_path), exist_ok=True)
+        self.profiler.dump_stats(self.profile_path)
+        self.profiler = None
+        self.profiled = True
+
+    def _write(self, now):
+        rollout_s = self.rollout_end - self.rollout_start
+        cpu = sum(self.process.cpu_times()[:2])
+        record = {
+            'timesteps': self.num_timesteps,
+            'elapsed': round(now - self.training_start, 4),
+            'rollout_s': round(rollout_s, 4),
+            'update_s': round(now - self.rollout_end, 4),
+            'steps_per_sec': round(self.rollout_steps / rollout_s, 1) if rollout_s > 0 else None,
+            'rss_mb': round(self.process.memory_info().rss / 1e6, 1),
+            'cpu_percent': round(100 * (cpu - self.iteration_cpu) / (now - self.iteration_start), 1),
+        }
+        self.log_file.write(json.dumps(record) + '\n')
+        self.log_file.flush()
+        self.iteration_start, self.iteration_cpu = now, cpu
+
+        for name in ['rollout_s', 'update_s', 'steps_per_sec', 'rss_mb', 'cpu_percent']:
+            self.logger.record('profile/' + name, record[name])
+        if self.verbose > 0:
+            print(json.dumps(record))
+
+    def _on_training_end(self):
+        if self.rollout_end is not None:
+            self._write(time.perf_counter())
+            self.rollout_end = None
+        if self.profiler is not None:
+            self._dump_profile()
+        self.log_file.close()
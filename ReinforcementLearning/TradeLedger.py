@@ -0,0 +1,86 @@
+import numpy as np
+
+# Trade sides
+BUY, SELL, SHORT, COVER = 0, 1, 2, 3
+SIDE_NAMES = {BUY: 'buy', SELL: 'sell', SHORT: 'short', COVER: 'cover'}
+
+# One record per trade: time step, execution price, side and number of stocks
+TRADE_DTYPE = np.dtype([('step', np.int64), ('price', np.float64), ('side', np.int8), ('size', np.float64)])
+
+
+class TradeLedger:
+    """
+    Fixed-capacity record of one episode: the equity after every step and every trade made.
+
+    Both arrays are allocated once, sized from the longest possible episode, and reset() only rewinds
+    the counters, so recording a step allocates nothing and the memory of an episode is known upfront.
+    """
+
+    def __init__(self, capacity):
+        """
+        :param capacity: Maximum number of steps in an episode.
+        """
+        self.capacity = capacity
+        self.equity = np.zeros(capacity)
+        # At most one trade per step, plus the liquidation on the last step
+        self.trades = np.zeros(capacity + 1, dtype=TRADE_DTYPE)
+        self.n_steps = 0
+        self.n_trades = 0
+
+    def reset(self):
+        self.n_steps = 0
+        self.n_trades = 0
+
+    def record_equity(self, value):
+        if self.n_steps >= self.capacity:
+            raise ValueError(f"Ledger capacity of {self.capacity} steps exceeded.")
+        self.equity[self.n_steps] = value
+        self.n_steps += 1
+
+    def record_trade(self, step, price, side, size):
+        if self.n_trades >= len(self.trades):
+            raise ValueError(f"Ledger capacity of {len(self.trades)} trades exceeded.")
+        self.trades[self.n_trades] = (step, price, side, size)
+        self.n_trades += 1
+
+    @property
+    def equity_curve(self):
+        """
+        Equity after each step of the episode so far, a view of the ledger.
+        """
+        return self.equity[:self.n_steps]
+
+    @property
+    def trade_list(self):
+        """
+        Trades of the episode so far, a structured view of the ledger with fields step, price, side and size.
+        """
+        return self.trades[:self.n_trades]
+
+    def trades_of(self, side):
+        """
+        (step, price) tuples of the trades on one side, in the layout of the old TradingEnv *_indices lists.
+        """
+        trades = self.trade_list[self.trade_list['side'] == side]
+        return list(zip(trades['step'].tolist(), trades['price'].tolist()))
+
+    def copy(self):
+        """
+        Copy of the recorded part of the ledger, e.g. to keep it past the next reset.
+        """
+        ledger = TradeLedger(self.n_steps)
+        ledger.equity[:] = self.equity_curve
+        ledger.trades = self.trade_list.copy()
+        ledger.n_steps = self.n_steps
+        ledger.n_trades = self.n_trades
+        return ledger
+
+    def load(self, ledger):
+        """
+        Replace the recorded steps and trades with another ledger's, e.g. a copy kept in a checkpoint.
+        """
+        self.reset()
+        for value in ledger.equity_curve.tolist():
+            self.record_equity(value)
+        self.trades[:ledger.n_trades] = ledger.trade_list
+        self.n_trades = ledger.n_trades
@@ -0,0 +1,183 @@
+import numpy as np
+
+from Preprocessing.Precision import PRICE_DTYPE, resolve_dtype
+from Preprocessing.WindowDataset import WindowDataset
+from ReinforcementLearning.TradeLedger import BUY, COVER, SELL, SHORT, TradeLedger
+
+
+class TradingLogic:
+    """
+    Long/short trading state machine shared by the legacy gym TradingEnv and the gymnasium
+    GymnasiumTradingEnv, which only differ in their reset/step signatures and observation handling.
+    """
+
+    def _setup_trading(self, data, close_prices, window_size, dtype=None, sampler=None, hold_reward_scale=0.0):
+        # Storage dtype of observations, 'float32' halves the memory of float64 (default)
+        self.dtype = resolve_dtype(dtype)
+        # Window datasets are indexed lazily, anything else is stored as an array. Prices stay in float64,
+        # float64 memory-mapped prices are viewed without a copy
+        self.data = data if isinstance(data, WindowDataset) else np.asarray(data, dtype=self.dtype)
+        self.prices = np.asarray(close_prices, dtype=PRICE_DTYPE)
+        self.window_size = window_size
+        self.current_step = window_size  # Start at window_size to have enough data for the first window
+        self.max_step = len(self.data) - 1
+        # Optional EpisodeSampler choosing the start and end of each episode, default runs over all the data
+        self.sampler = sampler
+        self.end_step = self.max_step
+        # Share of the unrealized ROI rewarded on hold, 0 rewards only closed trades
+        self.hold_reward_scale = hold_reward_scale
+
+        # Initialize trading variables
+        self.balance = 25000  # Initial balance
+        self.stock_count = 0  # Number of stocks held (positive for long, 0 for no position)
+        self.short_stock_count = 0  # Number of stocks held short (negative for short positions)
+        self.buy_price = 0  # Price at which stock was bought
+        self.short_price = 0  # Price at which stock was shorted
+        # Equity curve and trades of the current episode, preallocated for the longest possible episode.
+        # At the end of an episode the ledgers are swapped, so the finished one stays readable until the next
+        self.ledger = TradeLedger(max(self.max_step - window_size, 1))
+        self.last_episode_ledger = TradeLedger(self.ledger.capacity)
+
+    def _reset_trading(self):
+        if self.sampler is not None:
+            self.current_step, self.end_step = self.sampler.sample(self.window_size, self.max_step)
+        else:
+            self.current_step, self.end_step = self.window_size, self.max_step
+        self.balance = 25000
+        self.stock_count = 0
+        self.short_stock_count = 0
+        self.buy_price = 0
+        self.short_price = 0
+        if self.ledger.n_steps > 0:
+            self.ledger, self.last_episode_ledger = self.last_episode_ledger, self.ledger
+        self.ledger.reset()
+
+    def _trade(self, action):
+        """
+        Apply an action at the current step and move to the next one.
+
+        :return: Tuple of (reward, done, equity after the step).
+        """
+        done = False
+        reward = 0
+
+        # Current price is the price at the current_step, balances are always kept as Python floats
+        current_price = float(self.prices[self.current_step])
+
+        # Implement action logic
+        if action == 0:  # Buy
+            if self.short_stock_count > 0:  # Cover short position if currently short
+                self.balance -= self.short_stock_count * current_price
+                profit = (self.short_price - current_price) * self.short_stock_count
+                reward = profit / self.short_price  # Normalized profit from covering
+                self.ledger.record_trade(self.current_step, current_price, COVER, self.short_stock_count)
+                self.short_stock_count = 0
+            elif self.stock_count == 0:  # Only buy if not holding any stock
+                num_stocks = self.balance // current_price
+                if num_stocks > 0:
+                    self.stock_count = num_stocks
+                    self.balance -= self.stock_count * current_price
+                    self.buy_price = current_price
+                    self.ledger.record_trade(self.current_step, current_price, BUY, self.stock_count)
+
+        elif action == 1:  # Sell/Short
+            if self.stock_count > 0:  # Sell if holding long stock
+                self.balance += self.stock_count * current_price
+                profit = (current_price - self.buy_price) * self.stock_count
+                reward = profit / self.buy_price  # Normalized ROI from selling
+                self.ledger.record_trade(self.current_step, current_price, SELL, self.stock_count)
+                self.stock_count = 0
+            elif self.stock_count == 0 and self.short_stock_count == 0:  # Short if not holding any stock
+                num_stocks = self.balance // current_price
+                if num_stocks > 0:
+                    self.short_stock_count = num_stocks
+                    self.balance += self.short_stock_count * current_price
+                    self.short_price = current_price
+                    self.ledger.record_trade(self.current_step, current_price, SHORT, self.short_stock_count)
+
+        elif action == 2:  # Hold
+            if self.stock_count > 0:
+                unrealized_gain = (current_price - self.buy_price) * self.stock_count
+                reward = unrealized_gain / self.buy_price  # Normalized unrealized ROI
+            elif self.short_stock_count > 0:
+                unrealized_loss = (self.short_price - current_price) * self.short_stock_count
+                reward = unrealized_loss / self.short_price  # Normalized unrealized short ROI
+            reward *= self.hold_reward_scale  # No reward on the hold by default
+
+        # Move to the next step
+        self.current_step += 1
+
+        # Check if we've reached the end of the episode
+        if self.current_step >= self.end_step:
+            done = True
+            if self.stock_count > 0:  # Sell any remaining long stocks
+                self.balance += self.stock_count * current_price
+                profit = (current_price - self.buy_price) * self.stock_count
+                reward += profit / self.buy_price  # Final normalized ROI
+                self.ledger.record_trade(self.current_step - 1, current_price, SELL, self.stock_count)
+                self.stock_count = 0
+            if self.short_stock_count > 0:  # Cover any remaining short stocks
+                self.balance -= self.short_stock_count * current_price
+                profit = (self.short_price - current_price) * self.short_stock_count
+                reward += profit / self.short_price  # Final normalized short ROI
+                self.ledger.record_trade(self.current_step - 1, current_price, COVER, self.short_stock_count)
+                self.short_stock_count = 0
+
+        # Record the equity in the ledger
+        balance = self.balance + (self.stock_count * current_price) - (self.short_stock_count * current_price)
+        self.ledger.record_equity(balance)
+
+        return reward, done, balance
+
+    def get_state(self):
+        """
+        Snapshot of the episode in progress, e.g. for a training checkpoint.
+        """
+        return {
+            'current_step': self.current_step, 'end_step': self.end_step, 'balance': self.balance,
+            'stock_count': self.stock_count, 'short_stock_count': self.short_stock_count,
+            'buy_price': self.buy_price, 'short_price': self.short_price,
+            'ledger': self.ledger.copy(), 'last_episode_ledger': self.last_episode_ledger.copy(),
+            'sampler': self.sampler.get_state() if self.sampler is not None else None,
+        }
+
+    def set_state(self, state):
+        """
+        Restore a snapshot from get_state, so the episode continues where it was taken.
+        """
+        for name in ['current_step', 'end_step', 'balance', 'stock_count', 'short_stock_count', 'buy_price',
+                     'short_price']:
+            setattr(self, name, state[name])
+        self.ledger.load(state['ledger'])
+        self.last_episode_ledger.load(state['last_episode_ledger'])
+        if self.sampler is not None:
+            self.sampler.set_state(state['sampler'])
+
+    def get_ledger(self):
+        """
+        Ledger of the last finished episode, or of the current one if none has finished yet.
+        """
+        if self.current_step >= self.end_step or self.last_episode_ledger.n_steps == 0:
+            return self.ledger
+        return self.last_episode_ledger
+
+    # Read-only views of the ledger in the layout of the old per-step lists
+    @property
+    def balance_history(self):
+        return self.ledger.equity_curve
+
+    @property
+    def buy_indices(self):
+        return self.ledger.trades_of(BUY)
+
+    @property
+    def sell_indices(self):
+        return self.ledger.trades_of(SELL)
+
+    @property
+    def short_sell_indices(self):
+        return self.ledger.trades_of(SHORT)
+
+    @property
+    def short_cover_indices(self):
+        return self.ledger.trades_of(COVER)
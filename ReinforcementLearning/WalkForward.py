@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from stable_baselines3 import PPO
+from stable_baselines3.common.utils import set_random_seed
+
+from Preprocessing.CreateTensors import create_moving_windows
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.Precision import resolve_dtype, scale_features
+from Preprocessing.SharedArray import SharedArray
+from ReinforcementLearning.Backtest import backtest
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+
+# Shared features of a fold worker process, set once by _init_fold_worker
+_worker = {}
+
+
+def walk_forward_folds(n_rows, train_size, test_size, step=None, expanding=False):
+    """
+    Rolling train/test splits of a series, every test window directly following its training window.
+
+    :param n_rows: Number of rows of the series.
+    :param train_size: Number of training rows, the first fold's with expanding=True.
+    :param test_size: Number of out-of-sample test rows of each fold.
+    :param step: Number of rows between the starts of consecutive folds, default test_size so test
+                 windows do not overlap.
+    :param expanding: If True every training window starts at row 0 instead of rolling forward.
+    :return: List of (train_start, train_end, test_start, test_end) row ranges.
+    """
+    step = test_size if step is None else step
+    if train_size <= 0 or test_size <= 0 or step <= 0:
+        raise ValueError("train_size, test_size and step must be positive.")
+    folds = []
+    train_start = 0
+    while train_start + train_size + test_size <= n_rows:
+        train_end = train_start + train_size
+        folds.append((0 if expanding else train_start, train_end, train_end, train_end + test_size))
+        train_start += step
+    if not folds:
+        raise ValueError(f"{n_rows} rows are too few for a fold of {train_size} training and {test_size} test rows.")
+    return folds
+
+
+def _init_fold_worker(features_spec, cpu_slots):
+    """
+    Worker: attach to the shared features and pin the process, and torch, to one CPU.
+    """
+    import torch
+    cpu = cpu_slots.get()
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, [cpu])
+    torch.set_num_threads(1)
+    _worker['features'] = SharedArray.attach(features_spec)
+
+
+def _run_fold(fold, bounds, close_column, window_size, dtype, total_timesteps, ppo_kwargs, seed):
+    """
+    Worker: fit the scaler and the model on a fold's training rows and backtest on its test rows.
+
+    :return: Metrics row of the fold.
+    """
+    start = time.perf_counter()
+    train_start, train_end, test_start, test_end = bounds
+    features = _worker['features'].array
+    training_features = features[train_start:train_end]
+    test_features = features[test_start:test_end]
+
+    # The scaler only sees the fold's training rows
+    scaler = StandardScaler().fit(training_features)
+    training_scaled = scale_features(scaler, training_features, dtype)
+    test_scaled = scale_features(scaler, test_features, dtype)
+
+    set_random_seed(seed + fold)
+    training_env = GymnasiumTradingEnv(create_moving_windows(training_scaled, window_size),
+                                       training_features[:, close_column], window_size, dtype)
+    model = PPO("MlpPolicy", training_env, verbose=0, **ppo_kwargs)
+    model.learn(total_timesteps=total_timesteps)
+    training_s = time.perf_counter() - start
+
+    result = backtest(model, create_moving_windows(test_scaled, window_size), test_features[:, close_column],
+                      window_size, dtype)
+    return {'fold': fold, 'train_start': train_start, 'train_end': train_end, 'test_start': test_start,
+            'test_end': test_end,
+            **{name: result[name] for name in ['total_return', 'sharpe', 'max_drawdown', 'turnover', 'n_trades']},
+            'training_s': round(training_s, 3), 'fold_s': round(time.perf_counter() - start, 3)}
+
+
+def walk_forward(data, folds, window_size=15, dtype='float32', total_timesteps=10000, n_workers=None, seed=0,
+                 mp_context=None, verbose=1, **ppo_kwargs):
+    """
+    Walk-forward cross-validation of the PPO trading bot: for every fold the scaler and the model are fitted
+    on the training rows and the model is backtested out-of-sample on the test rows that follow.
+
+    The features of the whole history are computed once and placed in shared memory. The indicators only
+    look back, so no fold sees rows after its own, but a fold's slice is warmed up by the history before it:
+    its EWM-based indicators (MACD, RSI, CCI, ADX) differ from those computed on the slice alone, the same
+    way they would in live trading with the full history. Folds run concurrently, one per worker process
+    pinned to its own CPU.
+
+    :param data: DataFrame of raw candles of the whole history.
+    :param folds: List of (train_start, train_end, test_start, test_end) row ranges, e.g. walk_forward_folds.
+    :param window_size: Number of rows in each observation window.
+    :param dtype: Dtype of the scaled features and the environments, 'float32' or 'float64'.
+    :param total_timesteps: Training steps of each fold.
+    :param n_workers: Number of folds run at once, default one per CPU.
+    :param seed: Seed of the first fold, fold i uses seed + i.
+    :param mp_context: multiprocessing context of the workers, default is the platform's.
+    :param ppo_kwargs: Keyword arguments of PPO, e.g. learning_rate.
+    :return: Tuple of (DataFrame of per-fold metrics, total wall time in seconds).
+    """
+    start = time.perf_counter()
+    dtype = resolve_dtype(dtype)
+    features, _ = FeaturePipeline(FEATURE_COLUMNS).transform(data)
+    feature_seconds = time.perf_counter() - start
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    n_workers = min(len(cpus) if n_workers is None else n_workers, len(folds))
+    mp_context = mp_context or multiprocessing.get_context()
+    # One CPU per worker, taken by the worker as it starts. More workers than CPUs share them
+    cpu_slots = mp_context.Queue()
+    for worker in range(n_workers):
+        cpu_slots.put(cpus[worker % len(cpus)])
+
+    with SharedArray.from_array(features) as shared_features:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context, initializer=_init_fold_worker,
+                                 initargs=(shared_features.spec, cpu_slots)) as executor:
+            futures = [executor.submit(_run_fold, fold, bounds, FEATURE_COLUMNS.index('close'), window_size,
+                                       dtype.name, total_timesteps, ppo_kwargs, seed)
+                       for fold, bounds in enumerate(folds)]
+            results = []
+            for future in futures:
+                results.append(future.result())
+                if verbose > 0:
+                    row = results[-1]
+                    print(f"Fold {row['fold']} test rows {row['test_start']}-{row['test_end']}: "
+                          f"return {row['total_return']:.4f}, sharpe {row['sharpe']:.4f}, "
+                          f"max drawdown {row['max_drawdown']:.4f} in {row['fold_s']:.1f}s")
+
+    wall_time = time.perf_counter() - start
+    if verbose > 0:
+        print(f"{len(folds)} folds in {wall_time:.1f}s ({feature_seconds:.2f}s computing features) on {n_workers} "
+              f"workers, mean out-of-sample sharpe {np.mean([row['sharpe'] for row in results]):.4f}")
+    return pd.DataFrame(results), wall_time
@@ -1,7 +1,11 @@
+import argparse
 import asyncio
+import json
 import os
+import signal
 import smtplib
 import sys
+import time as timer
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
@@ -15,6 +19,7 @@ import Strategies
 import pandas as pd
 import httpx
 from Strategies.ShortReinforcement import ShortReinforcementStrategy
+from MarketData.CandleStore import CandleStore
 script_dir = os.path.dirname(os.path.realpath(__file__))
 os.chdir(script_dir)
 
@@ -29,16 +34,17 @@ email_user = os.getenv("email_user")
 email_password = os.getenv("email_password")
 starting_balance = os.getenv("balance")
 
-# Initialize the Schwab client
-client = client_from_token_file(token_path, api_key, app_secret)
-
-# Initialize your strategy
-strategy_1 = ShortReinforcementStrategy(verbose=True)
+# Schwab client and local candle store, created once by main. Only candles newer than the last stored
+# one are downloaded
+client = None
+candle_store = None
 
 trades_1 = []
 portfolio_value_1 = float(starting_balance)
 previous_volume = 0
 eastern = pytz.timezone('US/Eastern')
+# Length of the candles fetch_daily_data requests, in seconds
+CANDLE_PERIOD = 86400
 
 
 # Function to fetch historical data (latest minute)
@@ -78,8 +84,8 @@ def process_latest_data(symbol):
     start_time = datetime.now(eastern) - timedelta(days=30)
     end_time = datetime.now(eastern)
 
-    # Fetch the most recent minute's price data
-    data = fetch_daily_data(symbol, start_time, end_time)
+    # Fetch the most recent minute's price data, from the store when it already has them
+    data = candle_store.sync(symbol, fetch_daily_data, start_time, end_time)
     # Use the latest row from the fetched data
     latest_data = data.iloc[-15:]
 
@@ -111,20 +117,172 @@ def send_email(subject, body):
 
 
 # Function to get the latest price and run the strategy
-async def run_trading_strategy():
+async def run_trading_strategy(strategy):
     symbol = 'TSLA'  # Replace with the desired stock symbol
     bid_price, volume, time = process_latest_data(symbol)
     # Run the strategy
-    decision = strategy_1.run(bid_price, volume, time)
+    decision = strategy.run(bid_price, volume, time)
     send_email('Johnny Decision', f'{decision} {symbol} at {bid_price[-1]}: {datetime.fromtimestamp(time[-1])}')
     sys.exit(1)
 
 
-# Main function
-async def main():
-    await asyncio.gather(
-        run_trading_strategy(),
-    )
+def seconds_until_close(now, period, close_offset):
+    """
+    Seconds from now to the next candle close, closes falling every period seconds from close_offset
+    seconds after midnight, in the timezone of now.
+    """
+    elapsed = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+    next_close = ((elapsed - close_offset) // period + 1) * period + close_offset
+    return next_close - elapsed
+
+
+class HealthReporter:
+    """
+    Status of the daemon as a JSON file, rewritten atomically on every change and heartbeat so a
+    monitor can read it at any time and alert when heartbeat_at goes stale.
+    """
+
+    def __init__(self, path, **fields):
+        self.path = path
+        self.status = dict(fields, pid=os.getpid(), started_at=datetime.now(eastern).isoformat())
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def update(self, **fields):
+        self.status.update(fields, heartbeat_at=datetime.now(eastern).isoformat())
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.status, f, indent=2, default=str)
+        os.replace(self.path + '.tmp', self.path)
+
+
+class TradingDaemon:
+    """
+    Long-running RunBot: the model, scaler, client and indicator state are loaded once, then the daemon
+    sleeps until each daily candle close and decides on the new candles with a single streaming update,
+    instead of paying the imports, model load and history refetch of a cold start every time.
+
+    SIGTERM and SIGINT stop it after the candle being processed. Its status, latest decision and
+    decision latency are reported through a HealthReporter.
+    """
+
+    def __init__(self, strategy, symbol='TSLA', close_offset=16 * 3600, settle=60, history_days=365, heartbeat=30,
+                 health_path='logs/runbot_health.json'):
+        """
+        :param strategy: ShortReinforcementStrategy making the decisions.
+        :param close_offset: Seconds after midnight Eastern time of the daily close, e.g. 16:00.
+        :param settle: Seconds waited after a close for the candle to be served by the API.
+        :param history_days: Days of candles the indicators are warmed up with.
+        :param heartbeat: Seconds between health file updates while waiting.
+        :param health_path: Path of the JSON health file.
+        """
+        self.strategy = strategy
+        self.symbol = symbol
+        self.close_offset = close_offset
+        self.settle = settle
+        self.history_days = history_days
+        self.heartbeat = heartbeat
+        self.health = HealthReporter(health_path, symbol=symbol, decisions=0, errors=0)
+        self.last_candle = None
+
+    def last_close(self):
+        """
+        Time of the latest close that has passed, as a naive UTC timestamp like the candle index. Candles
+        starting before it are closed.
+        """
+        now = datetime.now(eastern)
+        since_close = CANDLE_PERIOD - seconds_until_close(now, CANDLE_PERIOD, self.close_offset)
+        return pd.Timestamp(now - timedelta(seconds=since_close)).tz_convert('UTC').tz_localize(None)
+
+    def warm_up(self):
+        now = datetime.now(eastern)
+        history = candle_store.sync(self.symbol, fetch_daily_data, now - timedelta(days=self.history_days), now)
+        # Started during trading hours the candle of the day is still open, it is decided on at the close
+        history = history[history.index < self.last_close()]
+        self.strategy.warm_up(history)
+        self.last_candle = history.index[-1]
+        self.health.update(status='warmed up', warm_up_candles=len(history), last_candle=self.last_candle)
+
+    def process_new_candles(self):
+        """
+        Download the candles closed since the last one processed and decide on each of them.
+        """
+        start = timer.perf_counter()
+        data = candle_store.sync(self.symbol, fetch_daily_data, self.last_candle.tz_localize('UTC'),
+                                 datetime.now(eastern))
+        fetch_ms = 1000 * (timer.perf_counter() - start)
+        closed = data[(data.index > self.last_candle) & (data.index < self.last_close())]
+        for candle_time, candle in closed.iterrows():
+            start = timer.perf_counter()
+            decision = self.strategy.on_candle_close(candle['high'], candle['low'], candle['close'], candle['volume'])
+            latency_ms = 1000 * (timer.perf_counter() - start)
+            self.last_candle = candle_time
+            self.health.update(last_candle=candle_time, last_decision=decision,
+                               last_decision_at=datetime.now(eastern).isoformat(),
+                               decision_latency_ms=round(latency_ms, 3), fetch_ms=round(fetch_ms, 1),
+                               decisions=self.health.status['decisions'] + 1)
+            if decision:
+                send_email('Johnny Decision', f'{decision} {self.symbol} at {candle["close"]}: {candle_time}')
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signal_number, stop.set)
+
+        self.warm_up()
+        while not stop.is_set():
+            wait = seconds_until_close(datetime.now(eastern), CANDLE_PERIOD, self.close_offset) + self.settle
+            self.health.update(status='waiting',
+                               next_wake_at=(datetime.now(eastern) + timedelta(seconds=wait)).isoformat())
+            # Sleep in heartbeat steps, so the health file stays fresh and a signal ends the wait at once
+            deadline = loop.time() + wait
+            while not stop.is_set() and loop.time() < deadline:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=min(self.heartbeat, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    self.health.update()
+            if stop.is_set():
+                break
+
+            self.health.update(status='processing')
+            try:
+                self.process_new_candles()
+            except Exception as e:
+                # A failed download is retried at the next close, the daemon keeps running
+                print(f"Failed to process candles: {e}")
+                self.health.update(errors=self.health.status['errors'] + 1, last_error=repr(e))
+
+        self.health.update(status='stopped')
+        print("RunBot daemon stopped")
+
+
+def main():
+    global client, candle_store
+    parser = argparse.ArgumentParser(description='Run the short trading bot once, or as a daemon with --daemon.')
+    parser.add_argument('--daemon', action='store_true', help='Keep running and decide at every candle close.')
+    parser.add_argument('--symbol', default='TSLA', help='Symbol traded by the daemon.')
+    parser.add_argument('--close-time', default='16:00', help='Eastern time of the daily close, HH:MM.')
+    parser.add_argument('--settle', type=float, default=60, help='Seconds waited after a close for the candle.')
+    parser.add_argument('--heartbeat', type=float, default=30, help='Seconds between health file updates.')
+    parser.add_argument('--health-path', default='logs/runbot_health.json', help='Path of the JSON health file.')
+    args = parser.parse_args()
+
+    # Initialize the Schwab client
+    client = client_from_token_file(token_path, api_key, app_secret)
+    candle_store = CandleStore('candle_store')
+
+    # Initialize your strategy
+    strategy_1 = ShortReinforcementStrategy(verbose=True)
+
+    if args.daemon:
+        hours, minutes = map(int, args.close_time.split(':'))
+        daemon = TradingDaemon(strategy_1, args.symbol, hours * 3600 + minutes * 60, args.settle,
+                               heartbeat=args.heartbeat, health_path=args.health_path)
+        asyncio.run(daemon.run())
+    else:
+        # Run the event loop
+        asyncio.run(run_trading_strategy(strategy_1))
+
 
-# Run the event loop
-asyncio.run(main())
+if __name__ == '__main__':
+    main()
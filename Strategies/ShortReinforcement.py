@@ -1,16 +1,16 @@
+from collections import deque
+
 from Strategies.TradingStrategy import TradingStrategy
 from Candle import Candle
+import numpy as np
 import pandas as pd
 import pickle
-from Preprocessing.FeatureEngineering import calculate_macd, calculate_rsi, \
-    calculate_cci, calculate_adx, calculate_moving_velocity_acceleration
-from Preprocessing.CreateTensors import create_most_recent_window
-
-from stable_baselines3 import PPO, A2C
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.Precision import resolve_dtype, scale_features
+from Preprocessing.StreamingFeatures import StreamingIndicators
 
-def create_tensors(data, window_size):
-    tensors = create_most_recent_window(data, window_size)
-    return tensors
+from stable_baselines3 import PPO
 
 
 class ShortReinforcementStrategy(TradingStrategy):
@@ -19,14 +19,18 @@ class ShortReinforcementStrategy(TradingStrategy):
     This strategy executes buy, sell, short, or hold actions based on the RL model's predictions.
     """
 
-    def __init__(self, initial_balance=25000, verbose=True):
+    def __init__(self, initial_balance=25000, verbose=True, dtype='float32'):
         super().__init__(initial_balance)
         self.candle_history = []
         self.current_candle = None
         self.model = PPO.load('ppo_trading_model_short')
         self.scaler = self.load_scaler()
         self.window_size = 15
-        self.data = pd.DataFrame()
+        self.pipeline = FeaturePipeline(FEATURE_COLUMNS)  # Indicator parameters, part of the warm-up cache key
+        self.indicators = StreamingIndicators()  # Indicator state updated once per closed candle
+        self.feature_window = deque(maxlen=self.window_size)  # Scaled feature rows of the latest candles
+        self.candle_count = 0
+        self.dtype = resolve_dtype(dtype)  # Dtype of the observations fed to the model
         self.verbose = verbose
         self.short_stock_count = 0  # Track number of stocks sold short
         self.short_price = 0  # Track the price at which short positions are opened
@@ -88,6 +92,7 @@ class ShortReinforcementStrategy(TradingStrategy):
         return decision
     def run(self, price, volume, time):
         """Run the strategy for each incoming price tick."""
+        decision = ''
         # Initialize the first candle if none exists
         if self.current_candle is None:
             self.start(price, volume, time)
@@ -107,12 +112,9 @@ class ShortReinforcementStrategy(TradingStrategy):
         print(time[-1] > self.current_candle.close_time)
 
         if time[-1] > self.current_candle.close_time:
-            data = self.current_candle.to_dataframe()
-            self.data = pd.concat([self.data, data], ignore_index=True)
-            if len(self.data) > self.window_size:
-                processed_data = self.process_data(self.data)
-                scaled_data = self.scale_data(processed_data)
-                tensors = create_tensors(scaled_data, self.window_size)
+            self.add_candle(self.current_candle)
+            if self.candle_count > self.window_size:
+                tensors = np.concatenate(self.feature_window)
                 # Make a decision before starting a new candle
                 # if self.verbose:
                 print(f"Making Decision")
@@ -133,30 +135,70 @@ class ShortReinforcementStrategy(TradingStrategy):
     def start(self, price, volume, time):
         """Initialize the first candle and start tracking."""
 
-        for i in range(15):
-            c = Candle(price[-i], volume[-i], time[-i]).to_dataframe()
-            self.data = pd.concat([self.data, c], ignore_index=True)
+        # Seed the indicators with the given candles unless warm_up already did
+        if self.candle_count == 0:
+            for i in range(15):
+                self.add_candle(Candle(price[-i], volume[-i], time[-i]))
         self.current_candle = Candle(price[-1], volume[-1], time[-1])
         self.current_candle.update_candle(price[-1], volume[-1], time[-1])
 
 
-    def process_data(self, data):
-        data = calculate_macd(data)
-        data = calculate_rsi(data)
-        data = calculate_cci(data)
-        data = calculate_adx(data)
-        data = calculate_moving_velocity_acceleration(data)
-        data = data.fillna(0)
+    def warm_up(self, data, cache=None, symbol='TSLA'):
+        """
+        Prime the indicators and the feature window from a history of candles before trading,
+        so the first decisions see the same features as training.
 
-        return data
+        :param data: DataFrame with 'high', 'low', 'close' and 'volume' columns.
+        :param cache: Optional FeatureCache, the features and indicator state are loaded from it on a hit.
+        :param symbol: Ticker symbol, part of the cache key.
+        """
+        entry = None
+        if cache is not None:
+            key = cache.make_key(symbol, data, dict(self.pipeline.params, state='streaming'))
+            entry = cache.load(key)
+
+        if entry is None:
+            self.indicators, features = StreamingIndicators.from_history(data)
+            entry = {'features': features}
+            entry.update({f"state_{name}": values for name, values in self.indicators.get_state().items()})
+            if cache is not None:
+                cache.save(key, entry)
+        else:
+            self.indicators = StreamingIndicators()
+            self.indicators.set_state({name[len('state_'):]: values for name, values in entry.items()
+                                       if name.startswith('state_')})
+
+        for features in entry['features'][-self.window_size:]:
+            self.feature_window.append(self.scale_row(features))
+        self.candle_count = len(entry['features'])
+
+    def add_candle(self, candle):
+        """
+        Update the indicators with a closed candle and push its scaled feature row into the window.
+        This costs the same no matter how many candles have been seen.
+        """
+        features = self.indicators.update_candle(candle)
+        self.feature_window.append(self.scale_row(features))
+        self.candle_count += 1
 
-    def scale_data(self, data):
-        # Handle missing values and scale features
-        data = self.scaler.transform(
-            data[['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration']])
-        data = pd.DataFrame(data, columns=['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration'])
+    def on_candle_close(self, high, low, close, volume):
+        """
+        Update the indicators with a closed candle and decide on it, for callers receiving whole candles
+        such as the RunBot daemon. Costs one streaming indicator update and one policy forward pass.
 
-        return data
+        :return: The decision, '' while the feature window is still filling.
+        """
+        features = self.indicators.update(high, low, close, volume)
+        self.feature_window.append(self.scale_row(features))
+        self.candle_count += 1
+        if len(self.feature_window) < self.window_size:
+            return ''
+        return self.make_decision(np.concatenate(self.feature_window), close)
+
+    def scale_row(self, features):
+        """Scale a single feature row ordered like FEATURE_COLUMNS."""
+        row = pd.DataFrame([features], columns=FEATURE_COLUMNS)
+        return scale_features(self.scaler, row, self.dtype)[0]
 
     def load_scaler(self):
         """Load the scaler once when initializing the strategy."""
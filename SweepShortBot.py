@@ -0,0 +1,74 @@
+import argparse
+import datetime
+import os
+
+from dotenv import load_dotenv
+from schwab.auth import client_from_token_file
+
+from MarketData.CandleStore import CandleStore
+from ReinforcementLearning.HyperparameterSweep import HyperparameterSweep, MedianPruner, grid_configurations, \
+    random_configurations
+from TrainShortBot import fetch_daily_data
+
+# Alternatives tried for the TrainShortBot defaults, every key left out keeps its default
+SEARCH_SPACE = {
+    'learning_rate': [3e-4, 1e-4],
+    'n_steps': [1024, 2048],
+    'gamma': [0.99, 0.95],
+    'ent_coef': [0.0, 0.01],
+    'window_size': [15, 30],
+    'features': [
+        ('close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration'),
+        ('close', 'volume', 'MACD', 'rsi'),
+    ],
+    'hold_reward_scale': [0.0, 0.1],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep PPO hyperparameters, window size, indicator set and '
+                                                 'reward variant of the short trading bot.')
+    parser.add_argument('--trials', type=int, default=None,
+                        help='Number of random configurations, default every combination of the search space.')
+    parser.add_argument('--timesteps', type=int, default=100000, help='Training steps of a trial.')
+    parser.add_argument('--eval-freq', type=int, default=10000, help='Steps between intermediate validation scores.')
+    parser.add_argument('--workers', type=int, default=None, help='Trials run at once, default one per CPU slot.')
+    parser.add_argument('--threads', type=int, default=1, help='CPUs and torch threads of each trial.')
+    parser.add_argument('--metric', default='sharpe', help='Backtest metric to maximize.')
+    parser.add_argument('--no-pruning', action='store_true', help='Train every trial for the full budget.')
+    parser.add_argument('--results', default='sweep_results.csv', help='CSV file of the results table.')
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = client_from_token_file("../Lamar/tokens/tokens.json", os.getenv('api_key'), os.getenv('app_secret'))
+
+    # Same split as TrainShortBot
+    testing_start = datetime.datetime.now()
+    validating_start = testing_start - datetime.timedelta(days=100)
+    training_start = validating_start - datetime.timedelta(days=3000)
+    symbol = 'TSLA'
+
+    candle_store = CandleStore('candle_store')
+    def fetch(symbol, start_datetime, end_datetime):
+        return fetch_daily_data(symbol, start_datetime, end_datetime, client)
+
+    training_data = candle_store.sync(symbol, fetch, training_start, validating_start)
+    validating_data = candle_store.sync(symbol, fetch, validating_start, testing_start)
+
+    if args.trials is None:
+        configurations = grid_configurations(SEARCH_SPACE)
+    else:
+        configurations = random_configurations(SEARCH_SPACE, args.trials, seed=0)
+    print(f"Running {len(configurations)} trials")
+
+    with HyperparameterSweep(training_data, validating_data, configurations) as sweep:
+        results = sweep.run(total_timesteps=args.timesteps, eval_freq=args.eval_freq, n_workers=args.workers,
+                            threads_per_trial=args.threads, metric=args.metric,
+                            pruner=False if args.no_pruning else MedianPruner(), results_path=args.results)
+    print(results.head(10).to_string())
+
+
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(script_dir)
+    main()
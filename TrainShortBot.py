@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import numpy as np
 import os
@@ -10,10 +11,21 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from schwab.auth import client_from_token_file
 from stable_baselines3 import PPO, A2C
-from ReinforcementLearning.ShortEnvironment import TradingEnv
-from ReinforcementLearning.EarlyStopping import EarlyStoppingCallback
-from Preprocessing.FeatureEngineering import calculate_macd, calculate_rsi,\
-calculate_cci, calculate_adx, calculate_moving_velocity_acceleration
+from stable_baselines3.common.callbacks import CallbackList
+from ReinforcementLearning.GymnasiumEnvironment import GymnasiumTradingEnv
+from ReinforcementLearning.AsyncEvaluation import AsyncEvaluationCallback
+from ReinforcementLearning.ProfilingCallback import ProfilingCallback
+from ReinforcementLearning.ParallelEnvironments import SharedMarketData
+from ReinforcementLearning.Backtest import backtest
+from ReinforcementLearning.IncrementalRetrain import IncrementalFeatureStore, incremental_retrain
+from ReinforcementLearning.Checkpointing import TrainingCheckpointCallback, latest_checkpoint, list_checkpoints, \
+    load_checkpoint_model, remaining_timesteps
+from MarketData.CandleStore import CandleStore
+from Preprocessing.FeatureEngineering import FEATURE_COLUMNS
+from Preprocessing.FeaturePipeline import FeaturePipeline
+from Preprocessing.FeatureCache import FeatureCache
+from Preprocessing.WindowDataset import WindowDataset, write_window_dataset
+from Preprocessing.Precision import resolve_dtype, scale_features
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 
 
@@ -89,127 +101,215 @@ def fetch_daily_data(symbol, start_datetime, end_datetime, client):
     return df
 
 
-load_dotenv()
-api_key = os.getenv('api_key')
-app_secret = os.getenv('app_secret')
-account_id = os.getenv('account_id')
-token_path = "../Lamar/tokens/tokens.json"
-
-client = client_from_token_file(token_path, api_key, app_secret)
-
-testing_start = datetime.datetime.now()
-validating_start = testing_start - datetime.timedelta(days=100)
-training_start = validating_start - datetime.timedelta(days=3000)
-print(f"Testing from {testing_start} to {datetime.datetime.now()}")
-print(f"Validating from {validating_start} to {testing_start}")
-print(f"Training from {training_start} to {validating_start}")
-
-# Define backtest parameters
-symbol = 'TSLA'  # Example stock symbol
-
-# Fetch data for the symbol
-training_data = fetch_daily_data(symbol, training_start, validating_start, client)
-print(f"Training from {training_start} to {validating_start}")
-
-end = datetime.datetime.now()
-start = datetime.datetime.now() - datetime.timedelta(days=1)
-fetch_daily_data("TSLA", start, end, client)
-# Feature Engineering
-training_data = calculate_macd(training_data)
-training_data = calculate_rsi(training_data)
-training_data = calculate_cci(training_data)
-training_data = calculate_adx(training_data)
-training_data = calculate_moving_velocity_acceleration(training_data)
-training_data = training_data.fillna(0)
-
-# Handle missing values and scale features
-scaler = StandardScaler()
-scaler.fit(training_data[['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration']])
-# Save the scaler
-with open('trading_scaler.pkl', 'wb') as f:
-    pickle.dump(scaler, f)
-training_scaled_features = scaler.transform(training_data[['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration']])
-training_scaled_features = pd.DataFrame(training_scaled_features, columns = ['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration'])
-from Preprocessing.CreateTensors import create_moving_windows
-
-window_size = 15  # 30 minutes
-stride = 1  # Move by 1 minute
-
-# Apply the moving window function to your data
-training_windows = create_moving_windows(training_scaled_features, window_size, stride)
-
-# Convert numpy arrays to DataFrames
-training_X_windows = np.array(training_windows)
-
-# Print shapes to verify
-print(f"Shape of X_windows: {training_X_windows.shape}")
-training_prices = training_data['close']
-
-training_data = []
-for x in training_X_windows:
-    training_flattened = x.flatten()
-    training_data.append(training_flattened)
-
-
-# Create the environment
-training_env = TradingEnv(training_data, training_prices, window_size)
-
-
-# Instantiate the model with the custom policy
-training_model = PPO("MlpPolicy", training_env, verbose=0)
-
-
-# Create an early stopping callback
-early_stopping_callback = EarlyStoppingCallback(patience=100000)
-
-
-# Train the model
-training_model.learn(total_timesteps=10000, callback=early_stopping_callback)
-
-# Save the model
-training_model.save("ppo_trading_model_short")
-
-# Fetch data for the symbol
-validating_data = fetch_daily_data(symbol, validating_start, testing_start, client)
-print(f"Validating from {validating_start} to {testing_start}")
-
-# Feature Eng
-validating_data = calculate_macd(validating_data)
-validating_data = calculate_rsi(validating_data)
-validating_data = calculate_cci(validating_data)
-validating_data = calculate_adx(validating_data)
-validating_data = calculate_moving_velocity_acceleration(validating_data)
-validating_data = validating_data.fillna(0)
-validating_scaled_features = scaler.transform(validating_data[['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration']])
-validating_scaled_features = pd.DataFrame(validating_scaled_features, columns = ['close', 'high', 'low', 'volume', 'MACD', 'rsi', 'cci', 'adx', 'velocity', 'acceleration'])
-
-# Apply the moving window function to your data
-validating_windows = create_moving_windows(validating_scaled_features, window_size, stride)
-# Convert numpy arrays to DataFrames
-validating_X_windows = np.array(validating_windows)
-validating_prices = validating_data['close']
-
-validating_data = []
-for x in validating_X_windows:
-    validating_flattened = x.flatten()
-    validating_data.append(validating_flattened)
-
-# Load the previously saved model
-validating_model = PPO.load("ppo_trading_model_short")
-
-# Create the updated environment
-validating_env = TradingEnv(validating_data, validating_prices, window_size)
-
-# Create an early stopping callback
-early_stopping_callback = EarlyStoppingCallback(patience=10000)
-
-# Continue training the model
-validating_model.set_env(validating_env)
-validating_model.learn(total_timesteps=10000000, callback=early_stopping_callback, reset_num_timesteps=False)
-
-# Save the model again
-validating_model.save("ppo_trading_model_short")
-
+def main():
+    parser = argparse.ArgumentParser(description='Train, validate and backtest the short trading bot.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the validation training from the latest checkpoint in checkpoints/.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Fine-tune the saved model on the candles since the last run instead of retraining.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Rollout worker processes, each steps a TradingEnv over its own date shard of the '
+                             'training data.')
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers must be at least 1.')
+
+    # Checkpoint to continue from, a new run starts without the checkpoints of earlier runs
+    checkpoint = latest_checkpoint('checkpoints') if args.resume else None
+    if args.resume and checkpoint is None:
+        print("No checkpoint to resume from, starting a new run")
+    if checkpoint is None and not args.incremental:
+        for path in list_checkpoints('checkpoints'):
+            os.remove(path)
+
+    load_dotenv()
+    api_key = os.getenv('api_key')
+    app_secret = os.getenv('app_secret')
+    account_id = os.getenv('account_id')
+    token_path = "../Lamar/tokens/tokens.json"
+
+    client = client_from_token_file(token_path, api_key, app_secret)
+
+    # A resumed run uses the dates of the checkpointed run, so it trains on the same data
+    testing_start = checkpoint['extra_state']['testing_start'] if checkpoint is not None else datetime.datetime.now()
+    validating_start = testing_start - datetime.timedelta(days=100)
+    training_start = validating_start - datetime.timedelta(days=3000)
+    print(f"Testing from {testing_start} to {datetime.datetime.now()}")
+    print(f"Validating from {validating_start} to {testing_start}")
+    print(f"Training from {training_start} to {validating_start}")
+
+    # Define backtest parameters
+    symbol = 'TSLA'  # Example stock symbol
+
+    # Candles are kept locally, only the ones newer than the last stored candle are downloaded
+    candle_store = CandleStore('candle_store')
+    def fetch(symbol, start_datetime, end_datetime):
+        return fetch_daily_data(symbol, start_datetime, end_datetime, client)
+
+    if args.incremental:
+        # Nightly mode: only the new candles are downloaded and featurized, scaled with the saved scaler
+        with open('trading_scaler.pkl', 'rb') as f:
+            scaler = pickle.load(f)
+        # Candles after the data of the last full run count as new, even if they arrived before this first run
+        trained_until = None
+        if os.path.exists('trading_model_info.pkl'):
+            with open('trading_model_info.pkl', 'rb') as f:
+                trained_until = pickle.load(f)['trained_until']
+        feature_store = IncrementalFeatureStore('incremental_data', scaler, 'float32', trained_until)
+        new_candles = candle_store.sync(symbol, fetch, feature_store.last_timestamp or training_start, testing_start)
+        new_rows = feature_store.update(new_candles)
+        print(f"{new_rows} new rows, {feature_store.pending_rows} not trained on, {feature_store.rows} in total")
+        # Fine-tune for a bounded budget on a replay of the rows not trained on and older episodes, keep it only
+        # if it does better on the latest of those rows, held out from the fine-tuning
+        result = incremental_retrain(feature_store, "ppo_trading_model_short", window_size=15)
+        summary = "\n".join(f"{name}: {value}" for name, value in result.items())
+        send_email(subject="Incremental Retrain Complete",
+                   body="The PPO trading model has been fine-tuned on the new data.\n\n" + summary)
+        return
 
-send_email(subject="Model Validation Complete", body="The PPO trading model has finished validating and has been saved.")
-print("Done Training")
\ No newline at end of file
+    # Fetch data for the symbol
+    training_data = candle_store.sync(symbol, fetch, training_start, validating_start)
+    print(f"Training from {training_start} to {validating_start}")
+
+    # Feature Engineering, only the columns used by the scaler are computed
+    feature_pipeline = FeaturePipeline(FEATURE_COLUMNS)
+    feature_cache = FeatureCache('feature_cache')
+    training_data = feature_cache.get_or_compute(feature_pipeline, training_data, symbol,
+                                                 training_start.date(), validating_start.date(), verbose=True)
+
+    # Handle missing values and scale features, with the scaler of the checkpointed run when resuming
+    if checkpoint is not None:
+        scaler = checkpoint['extra_state']['scaler']
+    else:
+        scaler = StandardScaler()
+        scaler.fit(training_data[FEATURE_COLUMNS])
+    # Save the scaler
+    with open('trading_scaler.pkl', 'wb') as f:
+        pickle.dump(scaler, f)
+    window_size = 15  # 30 minutes
+    dtype = resolve_dtype('float32')  # Storage dtype of scaled features and windows, prices stay in float64
+    n_workers = args.workers
+
+    training_scaled_features = scale_features(scaler, training_data[FEATURE_COLUMNS], dtype)
+
+    # Write the scaled features once, the environment reads its windows from the memory map
+    write_window_dataset('window_data/training', training_scaled_features, training_data['close'], dtype)
+    training_dataset = WindowDataset('window_data/training', window_size)
+
+    # Print shapes to verify
+    print(f"Shape of X_windows: {training_dataset.shape}")
+
+
+    # Fetch data for the symbol
+    validating_data = candle_store.sync(symbol, fetch, validating_start, testing_start)
+    print(f"Validating from {validating_start} to {testing_start}")
+
+    # Feature Eng
+    validating_data = feature_cache.get_or_compute(feature_pipeline, validating_data, symbol,
+                                                   validating_start.date(), testing_start.date(), verbose=True)
+    validating_scaled_features = scale_features(scaler, validating_data[FEATURE_COLUMNS], dtype)
+
+    write_window_dataset('window_data/validating', validating_scaled_features, validating_data['close'], dtype)
+    validating_dataset = WindowDataset('window_data/validating', window_size)
+
+    # The initial training is already done when resuming the validation training from a checkpoint
+    if checkpoint is None:
+        # Create the environment
+        if n_workers > 1:
+            # Features and prices are placed in shared memory once and every worker builds its windows over them
+            shared_training_data = SharedMarketData(training_dataset.features, training_dataset.prices, window_size, dtype)
+            training_env = shared_training_data.make_vec_env(n_workers)
+        else:
+            training_env = GymnasiumTradingEnv(training_dataset, training_dataset.prices, window_size, dtype)
+
+
+        # Instantiate the model with the custom policy
+        training_model = PPO("MlpPolicy", training_env, verbose=0)
+
+
+        # Evaluate on the held-out validation data in the background, keep the best checkpoint and stop
+        # after 5 evaluations without improvement. A best model left by an earlier run is removed first, so
+        # only one saved by this run is loaded below
+        if os.path.exists("ppo_trading_model_short_best.zip"):
+            os.remove("ppo_trading_model_short_best.zip")
+        evaluation_callback = AsyncEvaluationCallback(validating_dataset, validating_dataset.prices, window_size, dtype,
+                                                      eval_freq=1000, patience=5,
+                                                      best_model_path="ppo_trading_model_short_best")
+
+
+        # Train the model
+        # Throughput, rollout/update times and memory are logged per iteration to logs/
+        training_model.learn(total_timesteps=10000, callback=CallbackList([
+            evaluation_callback, ProfilingCallback('logs/training_profile.jsonl')]))
+
+        # Save the model
+        training_model.save("ppo_trading_model_short")
+        if n_workers > 1:
+            training_env.close()
+            shared_training_data.close()
+
+    # The validation training runs on the validation data up to its last candles, which are held out to
+    # evaluate it. The held-out windows start window_size rows earlier so every held-out candle is traded
+    holdout_rows = 20
+    holdout_split = len(validating_dataset.features) - holdout_rows
+    tuning_dataset = WindowDataset('window_data/validating', window_size, stop=holdout_split)
+    holdout_dataset = WindowDataset('window_data/validating', window_size, start=holdout_split - window_size)
+
+    # Create the updated environment
+    validating_env = GymnasiumTradingEnv(tuning_dataset, tuning_dataset.prices, window_size, dtype)
+
+    if checkpoint is not None:
+        # The checkpointed model, with its optimizer state and timestep counter
+        validating_model = load_checkpoint_model(PPO, checkpoint, validating_env)
+        total_timesteps = remaining_timesteps(checkpoint)
+    else:
+        # Load the best checkpoint of this run's held-out evaluation, or the last model if none was saved,
+        # passing the environment since it may differ in number from the training workers
+        best_model_path = "ppo_trading_model_short_best.zip"
+        validating_model = PPO.load(best_model_path if os.path.exists(best_model_path) else "ppo_trading_model_short",
+                                    env=validating_env)
+        total_timesteps = 10000000
+
+    # Evaluate on the held-out candles in the background every 10000 steps, keep the best model and stop after
+    # 10 evaluations without improvement. A best model of an earlier run is removed, a resumed run keeps its own
+    validated_best_path = "ppo_trading_model_short_validated_best"
+    if checkpoint is None and os.path.exists(validated_best_path + ".zip"):
+        os.remove(validated_best_path + ".zip")
+    validation_evaluation_callback = AsyncEvaluationCallback(holdout_dataset, holdout_dataset.prices, window_size,
+                                                             dtype, eval_freq=10000, patience=10,
+                                                             best_model_path=validated_best_path)
+
+    # Checkpoint every 100000 steps in the background, a run resumed with --resume continues exactly where
+    # the checkpoint was taken
+    checkpoint_callback = TrainingCheckpointCallback('checkpoints', save_freq=100000,
+                                                     callbacks=[validation_evaluation_callback],
+                                                     extra_state={'scaler': scaler, 'testing_start': testing_start},
+                                                     resume_from=checkpoint)
+
+    # Continue training the model
+    validating_model.learn(total_timesteps=total_timesteps, callback=CallbackList([
+        checkpoint_callback, validation_evaluation_callback, ProfilingCallback('logs/validation_profile.jsonl')]),
+        reset_num_timesteps=False)
+
+    # Save the best model of the held-out evaluation, or the last one if none was saved
+    if os.path.exists(validated_best_path + ".zip"):
+        validating_model = PPO.load(validated_best_path, env=validating_env)
+    validating_model.save("ppo_trading_model_short")
+    # The model was trained on the candles before the held-out ones, later ones are new to --incremental
+    with open('trading_model_info.pkl', 'wb') as f:
+        pickle.dump({'trained_until': validating_data.index[holdout_split]}, f)
+
+    # Backtest the saved model over the held-out validation candles with batched policy inference
+    results = backtest(validating_model, holdout_dataset, holdout_dataset.prices, window_size, dtype)
+    summary = "\n".join(f"{name}: {results[name]:.4f}"
+                        for name in ['total_return', 'sharpe', 'max_drawdown', 'turnover', 'n_trades'])
+    print(summary)
+
+
+    send_email(subject="Model Validation Complete",
+               body="The PPO trading model has finished validating and has been saved.\n\n" + summary)
+    print("Done Training")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import datetime
+import os
+
+from dotenv import load_dotenv
+from schwab.auth import client_from_token_file
+
+from MarketData.CandleStore import CandleStore
+from ReinforcementLearning.WalkForward import walk_forward, walk_forward_folds
+from TrainShortBot import fetch_daily_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward out-of-sample evaluation of the short trading bot.')
+    parser.add_argument('--days', type=int, default=3100, help='Days of history to evaluate over.')
+    parser.add_argument('--train-size', type=int, default=1000, help='Training candles of each fold.')
+    parser.add_argument('--test-size', type=int, default=70, help='Out-of-sample test candles of each fold.')
+    parser.add_argument('--step', type=int, default=None, help='Candles between folds, default the test size.')
+    parser.add_argument('--expanding', action='store_true', help='Train every fold from the start of the history.')
+    parser.add_argument('--timesteps', type=int, default=10000, help='Training steps of each fold.')
+    parser.add_argument('--workers', type=int, default=None, help='Folds run at once, default one per CPU.')
+    parser.add_argument('--results', default='logs/walk_forward.csv', help='CSV file of the per-fold metrics.')
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = client_from_token_file("../Lamar/tokens/tokens.json", os.getenv('api_key'), os.getenv('app_secret'))
+
+    end = datetime.datetime.now()
+    start = end - datetime.timedelta(days=args.days)
+    symbol = 'TSLA'
+    candle_store = CandleStore('candle_store')
+    data = candle_store.sync(symbol, lambda symbol, a, b: fetch_daily_data(symbol, a, b, client), start, end)
+
+    folds = walk_forward_folds(len(data), args.train_size, args.test_size, args.step, args.expanding)
+    print(f"{len(folds)} folds over {len(data)} candles from {data.index[0]} to {data.index[-1]}")
+    results, wall_time = walk_forward(data, folds, total_timesteps=args.timesteps, n_workers=args.workers)
+
+    # Dates of each fold's test window, for reading the table
+    results.insert(1, 'test_from', data.index[results['test_start']])
+    results.insert(2, 'test_to', data.index[results['test_end'] - 1])
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+    results.to_csv(args.results, index=False)
+    print(results.to_string())
+    print(f"Total wall time {wall_time:.1f}s")
+
+
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(script_dir)
+    main()